@@ -0,0 +1,291 @@
+"""
+Asyncio network loader.
+TusNetLoader blocks a thread per request, updates are parallelized by pools of 20 threads which mostly sleep in the
+token bucket or wait for the response. TusAioLoader has the set_* methods of TusNetLoader as coroutines, requests are
+posted to the tushare pro HTTP API by asyncio streams, at most `concurrency` requests in flight, the budget of each
+endpoint(TUS_API_LIMITS) is waited on awaitable token buckets.
+
+aio_update runs the updates of XcDBUpdater(update_price_daily, ...) by a few coroutines: the network requests the
+update steps yield are awaited on the loader, the steps between them(checks of the cache database, encoding and
+commits) run in a thread pool, the loop thread never waits for LMDB or the write queue. Start the write-behind queue of
+the updater(start_write_behind) first, the commits of the pool threads are batched then.
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from ._passwd import TUS_TOKEN
+from .layout import *
+from .proloader import TUS_API_LIMITS, index_info_of, stock_info_of, fund_info_of, minute_bars_of
+from .utils.qos import AsyncTokenBucket, RateLimiters, SharedRateLimiters
+from .utils.xcutils import *
+
+log = logbook.Logger('aio')
+
+TUS_API_URL = 'http://api.waditu.com/dataapi'
+# requests in flight
+AIO_CONCURRENCY = 8
+# coroutines of aio_update
+AIO_WORKERS = 16
+# seconds of a request
+AIO_TIMEOUT = 30
+# retries of a failed request, after AIO_BACKOFF * 2 ** n seconds
+AIO_RETRIES = 3
+AIO_BACKOFF = 1.0
+# errors of a request retried: connection, timeout, http status(IOError), truncated or malformed response
+AIO_RETRY_ERRORS = (OSError, EOFError, ValueError, IndexError, asyncio.TimeoutError)
+
+# pro_bar daily api of the asset type
+PRO_BAR_DAILY = {'E': 'daily', 'I': 'index_daily', 'FD': 'fund_daily'}
+
+
+class TusAioApi(object):
+    """
+    client of the tushare pro HTTP API, like tushare.pro.client.DataApi.
+    """
+
+    def __init__(self, token, url=TUS_API_URL, timeout=AIO_TIMEOUT):
+        parts = urlsplit(url)
+        self.token = token
+        self.host = parts.hostname
+        self.ssl = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.path = parts.path
+        self.timeout = timeout
+
+    async def query(self, api_name, fields='', **kwargs):
+        """
+        :return: DataFrame
+        """
+        body = json.dumps({'api_name': api_name, 'token': self.token, 'params': kwargs, 'fields': fields}).encode()
+        status, payload = await asyncio.wait_for(self._post('{}/{}'.format(self.path, api_name), body), self.timeout)
+        if status != 200:
+            raise IOError('{}: http status {}'.format(api_name, status))
+        result = json.loads(payload.decode('utf-8'))
+        if result['code'] != 0:
+            raise Exception(result['msg'])
+        data = result['data']
+        return pd.DataFrame(data['items'], columns=data['fields'])
+
+    async def _post(self, path, body):
+        """
+        :return: status, response body
+        """
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=True if self.ssl else None)
+        try:
+            head = 'POST {} HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n' \
+                   'Connection: close\r\n\r\n'.format(path, self.host, len(body))
+            writer.write(head.encode('latin-1') + body)
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                kk, vv = line.decode('latin-1').split(':', 1)
+                headers[kk.strip().lower()] = vv.strip()
+
+            if headers.get('transfer-encoding', '').lower() == 'chunked':
+                payload = bytearray()
+                while True:
+                    size = int((await reader.readline()).split(b';')[0], 16)
+                    if size == 0:
+                        break
+                    payload += await reader.readexactly(size)
+                    await reader.readline()
+            elif 'content-length' in headers:
+                payload = await reader.readexactly(int(headers['content-length']))
+            else:
+                payload = await reader.read()
+        finally:
+            writer.close()
+        return status, bytes(payload)
+
+
+class TusAioLoader(object):
+    """
+    set_* of TusNetLoader as coroutines.
+    """
+
+    def __init__(self, token=TUS_TOKEN, url=TUS_API_URL, concurrency=AIO_CONCURRENCY, qos_path=None,
+                 retries=AIO_RETRIES, backoff=AIO_BACKOFF):
+        """
+        :param qos_path: state file of the rate limiters shared with other processes, see TusNetLoader
+        :param retries: retries of a request failed by AIO_RETRY_ERRORS, the errors of the API(code != 0) are raised
+        :param backoff: seconds before the first retry, doubled by each retry
+        """
+        self.api = TusAioApi(token, url)
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        # budgets of the endpoints, see TUS_API_LIMITS
+        if qos_path is None:
+            self.limiters = RateLimiters(TUS_API_LIMITS, AsyncTokenBucket)
+        else:
+            self.limiters = SharedRateLimiters(qos_path, TUS_API_LIMITS, AsyncTokenBucket)
+        self._sem = None
+        self._loop = None
+
+    async def query(self, api_name, fields='', **kwargs):
+        """
+        wait for the budget of the endpoint, then for a free request slot. a retry takes the budget again.
+        """
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            self._sem = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        for n in range(self.retries + 1):
+            await self.limiters.get(api_name).consume()
+            try:
+                async with self._sem:
+                    return await self.api.query(api_name, fields, **kwargs)
+            except AIO_RETRY_ERRORS as e:
+                if n == self.retries:
+                    raise
+                delay = self.backoff * 2 ** n
+                log.info('{} failed: {!r}, retry in {:.1f}s'.format(api_name, e, delay))
+                await asyncio.sleep(delay)
+
+    async def set_trade_cal(self):
+        info = await self.query('trade_cal')
+        return info[info['is_open'] == 1].loc[:, 'cal_date']
+
+    async def set_index_info(self):
+        fields = INDEX_INFO_META['columns']
+        info1, info2 = await asyncio.gather(self.query('index_basic', market='SSE', fields=fields),
+                                            self.query('index_basic', market='SZSE', fields=fields))
+        info1.loc[:, 'exchange'] = 'SSE'
+        info2.loc[:, 'exchange'] = 'SZSE'
+        return index_info_of(info1, info2)
+
+    async def set_stock_info(self):
+        fields = STOCK_INFO_META['columns']
+        infos = await asyncio.gather(*[self.query('stock_basic', list_status=ss, fields=fields) for ss in 'LDP'])
+        return stock_info_of(*infos)
+
+    async def set_fund_info(self):
+        info = await self.query('fund_basic', market='E', fields=FUND_INFO_META['columns'])
+        return fund_info_of(info)
+
+    async def set_index_classify(self, level, src='SW'):
+        return await self.query('index_classify', level=level.upper(), src=src)
+
+    async def set_price_daily(self, code, start, end, astype='E'):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        data = await self.query(PRO_BAR_DAILY[astype], ts_code=code, start_date=start.strftime(DATE_FORMAT),
+                                end_date=end.strftime(DATE_FORMAT))
+        return data.rename(columns={'vol': 'volume'})
+
+    async def set_price_minute(self, code, start, end, freq='1min', astype='E', merge_first=True):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        data = await self.query('stk_mins', ts_code=code, freq=freq, start_date=start.strftime(DATETIME_FORMAT),
+                                end_date=(end + pd.Timedelta(hours=17)).strftime(DATETIME_FORMAT))
+        return minute_bars_of(data, code, start, end, freq, merge_first)
+
+    async def set_stock_daily_info(self, code, start, end):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        # 每分钟最多访问该接口700次
+        return await self.query('daily_basic', ts_code=code, start_date=start.strftime(DATE_FORMAT),
+                                end_date=end.strftime(DATE_FORMAT),
+                                fields=STOCK_DAILY_INFO_META['columns'] + ['trade_date'])
+
+    async def set_stock_adjfactor(self, code, start, end):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        return await self.query('adj_factor', ts_code=code, start_date=start.strftime(DATE_FORMAT),
+                                end_date=end.strftime(DATE_FORMAT),
+                                fields=STOCK_ADJFACTOR_META['columns'] + ['trade_date'])
+
+    async def set_suspend_d(self, date):
+        date = pd.Timestamp(date)
+        return await self.query('suspend_d', trade_date=date.strftime(DATE_FORMAT),
+                                fields=SUSPEND_D_META['columns'])
+
+    async def set_stock_xdxr(self, code):
+        return await self.query('dividend', ts_code=code)
+
+
+def _advance(steps, data):
+    """
+    run the steps to the next network request.
+    :return: (request, None), or (None, result of the update) when the steps are done.
+    """
+    try:
+        return steps.send(data), None
+    except StopIteration as e:
+        # StopIteration can't be set to a future
+        return None, e.value
+
+
+async def run_steps(loader, steps, executor=None):
+    """
+    async XcDBUpdater.run_steps, network requests of the steps are awaited on loader.
+    :param executor: the steps between the requests(database and encoding) run in it, None for the default executor
+    of the loop.
+    """
+    loop = asyncio.get_event_loop()
+    req, out = await loop.run_in_executor(executor, _advance, steps, None)
+    while req is not None:
+        data = await getattr(loader, req[0])(*req[1])
+        req, out = await loop.run_in_executor(executor, _advance, steps, data)
+    return out
+
+
+async def _update_all(updater, method, tasks, loader, workers, executor):
+    pending = list(reversed(tasks))
+    out = {}
+
+    async def _worker():
+        while pending:
+            args = pending.pop()
+            try:
+                out[args[0]] = await run_steps(loader, getattr(updater, 'steps' + method[len('update'):])(*args),
+                                               executor)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # one code never aborts the others
+                log.error('{} {} failed: {!r}'.format(method, args[0], e))
+
+    await asyncio.gather(*[_worker() for _ in range(min(workers, len(tasks)))])
+    return out
+
+
+def _cancel_all(loop):
+    """
+    cancel the tasks left in loop and wait for them, before the loop is closed.
+    """
+    all_tasks = getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks
+    tasks = [tt for tt in all_tasks(loop) if not tt.done()]
+    for tt in tasks:
+        tt.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    loop.run_until_complete(loop.shutdown_asyncgens())
+
+
+def aio_update(updater, method, tasks, loader=None, workers=AIO_WORKERS):
+    """
+    run the updates by coroutines.
+    :param updater: XcDBUpdater
+    :param method: update_price_daily, update_price_minute, update_stock_adjfactor, update_stock_dayinfo
+    :param tasks: list of args of the method, code first.
+    :param loader: TusAioLoader
+    :param workers: number of coroutines
+    :return: {code: result of the update}, the codes failed are logged and left out.
+    """
+    if loader is None:
+        loader = TusAioLoader()
+    loop = asyncio.new_event_loop()
+    # one thread per coroutine, a step never waits for a thread
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks))))
+    try:
+        return loop.run_until_complete(_update_all(updater, method, tasks, loader, workers, executor))
+    finally:
+        try:
+            _cancel_all(loop)
+        finally:
+            loop.close()
+            executor.shutdown()
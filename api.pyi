@@ -66,7 +66,7 @@ def get_suspend_d(start='20100101', end='21000101', flag=IOFLAG.READ_XC):
     """
 
 
-def get_price_daily(code, start: str, end: str, astype=None, flag=IOFLAG.READ_XC):
+def get_price_daily(code, start: str, end: str, astype=None, flag=IOFLAG.READ_XC, fields=None, copy=True):
     """
 
     :param code:
@@ -74,11 +74,14 @@ def get_price_daily(code, start: str, end: str, astype=None, flag=IOFLAG.READ_XC
     :param end:
     :param astype:
     :param flag:
+    :param fields: columns to read, None for all.
+    :param copy: False to share the cached rows(zero copy), the DataFrame is readonly then.
     :return:
     """
 
 
-def get_price_minute(code, start, end, freq='1min', astype='E', resample=False, flag=IOFLAG.READ_XC):
+def get_price_minute(code, start, end, freq='1min', astype='E', resample=False, flag=IOFLAG.READ_XC, fields=None,
+                     copy=True):
     """
 
     :param code:
@@ -88,14 +91,71 @@ def get_price_minute(code, start, end, freq='1min', astype='E', resample=False,
     :param astype:
     :param resample:
     :param flag:
+    :param fields: columns to read, None for all.
+    :param copy: False to share the cached rows(zero copy), the DataFrame is readonly then.
     :return:
     """
 
 
-def get_stock_daily_info(code, start, end, flag=IOFLAG.READ_XC):
+def get_stock_daily_info(code, start, end, flag=IOFLAG.READ_XC, fields=None, copy=True):
     """"""
 
 
+def get_cross_section(date, fields=None):
+    """
+
+    :param date:
+    :param fields: columns to read, None for all.
+    :return: DataFrame of all stocks, index is ts_code.
+    """
+
+
+def export_panel(dataset, start, end, path, codes=None):
+    """
+
+    :param dataset: 'daily_price', 'adj_factor', 'daily_info'
+    :param start:
+    :param end:
+    :param path: directory of the panel files, load them by panel.load_panel
+    :param codes: default all stocks.
+    :return: file path of the panel data.
+    """
+
+
+def get_price_daily_panel(codes, start, end, fields=None, astype='E'):
+    """
+
+    :param codes: None for all codes of astype
+    :param start:
+    :param end:
+    :param fields: columns to read, None for all.
+    :param astype:
+    :return: XcPanel, data[day, code, field] aligned to trade_cal.
+    """
+
+
+def get_stock_daily_info_panel(codes, start, end, fields=None):
+    """"""
+
+
+def get_stock_adjfactor_panel(codes, start, end):
+    """"""
+
+
+def get_price_universe(codes, start, end, freq='1D', fields=None, astype='E', workers=None):
+    """
+
+    :param codes: None for all codes of astype
+    :param start:
+    :param end:
+    :param freq: '1D' or minute freq of XTUS_FREQS
+    :param fields: columns to read, None for all columns of the META
+    :param astype: 'E', 'I', 'FD'
+    :param workers: number of processes, default cpu count.
+    :return: XcPanel, NaN if no data. None if no trading days.
+    """
+
+
 def get_stock_adjfactor(code, start: str, end: str, flag=IOFLAG.READ_XC):
     """"""
 
@@ -11,6 +11,8 @@ from boost_tushare.utils.parallelize import parallelize
 from boost_tushare import *
 from boost_tushare.xupdater import *
 from boost_tushare.xchecker import *
+from boost_tushare.aioloader import TusAioLoader, aio_update
+from boost_tushare.proloader import qos_file
 
 log = logbook.Logger('cli')
 
@@ -43,7 +45,7 @@ def cntus_update_basic():
     return
 
 
-def cntus_update_stock_day(start_date='20150101', type='L'):
+def cntus_update_stock_day(start_date='20150101', type='L', aio=False):
     updater = tusupdater_init()
 
     df_stock = updater.get_stock_info()
@@ -78,16 +80,31 @@ def cntus_update_stock_day(start_date='20150101', type='L'):
 
     batch_size = 60
     all_result = {}
-    for idx in range(0, len(all_symbols), batch_size):
-        progress_bar(idx, len(all_symbols))
-        symbol_batch = all_symbols[idx:idx + batch_size]
-
-        # result = _fetch_day(symbol_batch)
-        result = parallelize(_fetch_day, workers=20, splitlen=3)(symbol_batch)
-        all_result.update(result)
+    # one loader, the token bucket is shared by the batches
+    aloader = TusAioLoader(qos_path=qos_file(updater.master_db.name)) if aio else None
+    # parallel updates queue their writes to one writer thread
+    updater.start_write_behind()
+    try:
+        for idx in range(0, len(all_symbols), batch_size):
+            progress_bar(idx, len(all_symbols))
+            symbol_batch = all_symbols[idx:idx + batch_size]
+
+            if aio:
+                result = aio_update(updater, 'update_price_daily',
+                                    [(ss['code'], ss['start_date'], ss['end_date'], ss['astype']) for ss in symbol_batch],
+                                    aloader)
+            else:
+                # result = _fetch_day(symbol_batch)
+                result = parallelize(_fetch_day, workers=20, splitlen=3)(symbol_batch)
+            all_result.update(result)
+    finally:
+        updater.stop_write_behind()
     sys.stdout.write('\n')
     log.info('Total units: {}'.format(np.sum(list(all_result.values()))))
 
+    log.info('Building cross sections: {}-{}'.format(start_date, end_date))
+    log.info('Total dates: {}'.format(updater.update_cross_section(start_date, end_date)))
+
 
 def cntus_update_stock_xdxr(start_date='20150101', type='L'):
     updater = tusupdater_init()
@@ -121,13 +138,18 @@ def cntus_update_stock_xdxr(start_date='20150101', type='L'):
 
     batch_size = 60
     all_result = {}
-    for idx in range(0, len(all_symbols), batch_size):
-        progress_bar(idx, len(all_symbols))
-        symbol_batch = all_symbols[idx:idx + batch_size]
-
-        # result = _fetch_day(symbol_batch)
-        result = parallelize(_fetch_day, workers=20, splitlen=3)(symbol_batch)
-        all_result.update(result)
+    # parallel updates queue their writes to one writer thread
+    updater.start_write_behind()
+    try:
+        for idx in range(0, len(all_symbols), batch_size):
+            progress_bar(idx, len(all_symbols))
+            symbol_batch = all_symbols[idx:idx + batch_size]
+
+            # result = _fetch_day(symbol_batch)
+            result = parallelize(_fetch_day, workers=20, splitlen=3)(symbol_batch)
+            all_result.update(result)
+    finally:
+        updater.stop_write_behind()
     sys.stdout.write('\n')
     log.info('Total units: {}'.format(np.sum(list(all_result.values()))))
 
@@ -164,16 +186,21 @@ def cntus_update_stock_day_ext(start_date='20150101', type='L'):
     log.info('Downloading stocks extension(xdxr, dayinfo) data: {}, {}-{}'.format(len(df_stock), start_date, end_date))
 
     all_result = {}
-    for idx in range(0, len(all_symbols), batch_size):
-        progress_bar(idx, len(all_symbols))
-        symbol_batch = all_symbols[idx:idx + batch_size]
-        result = parallelize(_fetch_stock_ext, workers=20, splitlen=3)(symbol_batch)
-        all_result.update(result)
+    # parallel updates queue their writes to one writer thread
+    updater.start_write_behind()
+    try:
+        for idx in range(0, len(all_symbols), batch_size):
+            progress_bar(idx, len(all_symbols))
+            symbol_batch = all_symbols[idx:idx + batch_size]
+            result = parallelize(_fetch_stock_ext, workers=20, splitlen=3)(symbol_batch)
+            all_result.update(result)
+    finally:
+        updater.stop_write_behind()
     sys.stdout.write('\n')
     log.info('Total units: {}'.format(np.sum(list(all_result.values()))))
 
 
-def cntus_update_stock_min(start_date='20190101', type='L', freq='5min'):
+def cntus_update_stock_min(start_date='20190101', type='L', freq='5min', aio=False):
     updater = tusupdater_init()
 
     df_stock = updater.get_stock_info()
@@ -204,14 +231,26 @@ def cntus_update_stock_min(start_date='20190101', type='L', freq='5min'):
 
     batch_size = 60
     all_result = {}
-    for idx in range(0, len(all_symbols), batch_size):
-        progress_bar(idx, len(all_symbols))
-
-        symbol_batch = all_symbols[idx:idx + batch_size]
-
-        # result = _fetch_min(symbol_batch)
-        result = parallelize(_fetch_min, workers=20, splitlen=3)(symbol_batch)
-        all_result.update(result)
+    # one loader, the token bucket is shared by the batches
+    aloader = TusAioLoader(qos_path=qos_file(updater.master_db.name)) if aio else None
+    # parallel updates queue their writes to one writer thread
+    updater.start_write_behind()
+    try:
+        for idx in range(0, len(all_symbols), batch_size):
+            progress_bar(idx, len(all_symbols))
+
+            symbol_batch = all_symbols[idx:idx + batch_size]
+
+            if aio:
+                result = aio_update(updater, 'update_price_minute',
+                                    [(ss['code'], ss['start_date'], ss['end_date'], freq, ss['astype'])
+                                     for ss in symbol_batch], aloader)
+            else:
+                # result = _fetch_min(symbol_batch)
+                result = parallelize(_fetch_min, workers=20, splitlen=3)(symbol_batch)
+            all_result.update(result)
+    finally:
+        updater.stop_write_behind()
     sys.stdout.write('\n')
     log.info('Total units: {}'.format(np.sum(list(all_result.values()))))
 
@@ -242,11 +281,16 @@ def cntus_update_index_day(start_date):
 
     batch_size = 60
     all_result = {}
-    for idx in range(0, len(all_symbols), batch_size):
-        progress_bar(idx, len(all_symbols))
-        symbol_batch = all_symbols[idx:idx + batch_size]
-        result = parallelize(_fetch_day, workers=20, splitlen=3)(symbol_batch)
-        all_result.update(result)
+    # parallel updates queue their writes to one writer thread
+    updater.start_write_behind()
+    try:
+        for idx in range(0, len(all_symbols), batch_size):
+            progress_bar(idx, len(all_symbols))
+            symbol_batch = all_symbols[idx:idx + batch_size]
+            result = parallelize(_fetch_day, workers=20, splitlen=3)(symbol_batch)
+            all_result.update(result)
+    finally:
+        updater.stop_write_behind()
     sys.stdout.write('\n')
     log.info('Total units: {}'.format(np.sum(list(all_result.values()))))
 
@@ -277,13 +321,18 @@ def cntus_update_index_min(start_date='20190101'):
 
     batch_size = 60
     all_result = {}
-    for idx in range(0, len(all_symbols), batch_size):
-        progress_bar(idx, len(all_symbols))
-
-        symbol_batch = all_symbols[idx:idx + batch_size]
-
-        result = parallelize(_fetch_min, workers=20, splitlen=3)(symbol_batch)
-        all_result.update(result)
+    # parallel updates queue their writes to one writer thread
+    updater.start_write_behind()
+    try:
+        for idx in range(0, len(all_symbols), batch_size):
+            progress_bar(idx, len(all_symbols))
+
+            symbol_batch = all_symbols[idx:idx + batch_size]
+
+            result = parallelize(_fetch_min, workers=20, splitlen=3)(symbol_batch)
+            all_result.update(result)
+    finally:
+        updater.stop_write_behind()
     sys.stdout.write('\n')
     log.info('Total units: {}'.format(np.sum(list(all_result.values()))))
     return
@@ -402,6 +451,47 @@ def cntus_check_index_day(start_date='20150101'):
     log.info('Total units: {}'.format(np.sum(list(all_result.values()))))
 
 
+def cntus_migrate_db(prefix='', batch_size=1000):
+    """
+    re-encode values of sub-databases to current format, in place. can be run while readers are working.
+    :param prefix: only migrate sub-databases with the name prefix, e.g. 'ts:daily_price:'
+    :param batch_size: values per write transaction
+    :return:
+    """
+    updater = tusupdater_init()
+    sdbs = [sdb for sdb in updater.master_db.sdb_names() if sdb.startswith(prefix)]
+    log.info('Migrating sub-databases: {}'.format(len(sdbs)))
+
+    total, changed = 0, 0
+    for idx, sdb in enumerate(sdbs):
+        progress_bar(idx, len(sdbs))
+        db = updater.facc(sdb, sdb_meta(sdb))
+        nn, nc = db.migrate(batch_size)
+        db.commit()
+        total += nn
+        changed += nc
+    sys.stdout.write('\n')
+    log.info('Total values: {}, re-encoded: {}'.format(total, changed))
+
+
+def cntus_migrate_keyspace(dest, keyspace=KEYSPACE.KS_TABLE, batch_size=1000):
+    """
+    copy the database to a new database in another keyspace(see KEYSPACE), the database is only read.
+    set LMDB_NAME to dest and LMDB_KEYSPACE to keyspace after it.
+    :param dest: path of the new database
+    :param keyspace: KEYSPACE of the new database
+    :param batch_size: values per write transaction
+    :return:
+    """
+    src = XcLMDB(LMDB_NAME, readonly=True, tables=SDB_TABLES)
+    dst = XcLMDB(dest, readonly=False, keyspace=keyspace, tables=SDB_TABLES)
+    log.info('Copying {}({}) to {}({})'.format(LMDB_NAME, src.keyspace.name, dest, keyspace.name))
+    total = src.copy_to(dst, batch_size)
+    dst.close()
+    src.close()
+    log.info('Total values: {}'.format(total))
+
+
 ####################################################################################
 
 
@@ -421,8 +511,14 @@ class REPL(cmd.Cmd):
 
 
 @click.group(invoke_without_command=True)
+@click.option("--durable/--no-durable", default=True,
+              help='sync every commit of the updater, --no-durable: synced by the write queue and at the end of updates')
+@click.option("--sync-interval", default=None, type=float, help='seconds between syncs of the write queue(--no-durable)')
 @click.pass_context
-def first(ctx):
+def first(ctx, durable, sync_interval):
+    if not durable or sync_interval is not None:
+        # the updater of the commands is created with the options, see tusupdater_init
+        tusupdater_init(durable=durable, sync_interval=sync_interval)
     if ctx.invoked_subcommand is None:
         repl = REPL(ctx)
         repl.cmdloop()
@@ -437,8 +533,19 @@ def update_basic():
 @click.command()
 @click.option("--start", default='20130101', )
 @click.option("--type", default='L', )
-def update_daily(start, type):
-    cntus_update_stock_day(start_date=start, type=type)
+@click.option("--aio", is_flag=True, help='load by asyncio coroutines instead of threads')
+def update_daily(start, type, aio):
+    cntus_update_stock_day(start_date=start, type=type, aio=aio)
+    click.echo('done')
+
+
+@click.command()
+@click.option("--start", default='20130101', )
+@click.option("--rollback", default=3, )
+def update_xsection(start, rollback):
+    updater = tusupdater_init()
+    end = pd.Timestamp.today().strftime('%Y%m%d')
+    updater.update_cross_section(start, end, rollback=rollback)
     click.echo('done')
 
 
@@ -462,8 +569,9 @@ def update_daily_ext(start, type):
 @click.option("--start", default='20170101', )
 @click.option("--type", default='L', )
 @click.option("--freq", default='5min', )
-def update_minute(start, type, freq):
-    cntus_update_stock_min(start_date=start, type=type, freq=freq)
+@click.option("--aio", is_flag=True, help='load by asyncio coroutines instead of threads')
+def update_minute(start, type, freq, aio):
+    cntus_update_stock_min(start_date=start, type=type, freq=freq, aio=aio)
     click.echo('done')
 
 
@@ -557,6 +665,53 @@ def tsshow(days):
     print('-' * 50)
 
 
+@click.command()
+@click.option("--prefix", default='', )
+@click.option("--batch", default=1000, )
+def migrate(prefix, batch):
+    cntus_migrate_db(prefix=prefix, batch_size=batch)
+    click.echo('done')
+
+
+@click.command()
+@click.option("--dest", required=True, help='path of the new database')
+@click.option("--keyspace", default='table', type=click.Choice(['table', 'sdb']))
+@click.option("--batch", default=1000, )
+def migrate_keyspace(dest, keyspace, batch):
+    cntus_migrate_keyspace(dest, {'table': KEYSPACE.KS_TABLE, 'sdb': KEYSPACE.KS_SDB}[keyspace], batch_size=batch)
+    click.echo('done')
+
+
+@click.command()
+@click.option("--dataset", default='daily_price', type=click.Choice(['daily_price', 'adj_factor', 'daily_info']))
+@click.option("--start", default='20150101', )
+@click.option("--end", default=None, )
+@click.option("--path", default='.', )
+def export_panel(dataset, start, end, path):
+    reader = tusbooster_init()
+    if end is None:
+        end = pd.Timestamp.today().strftime('%Y%m%d')
+    click.echo(reader.export_panel(dataset, start, end, path))
+    click.echo('done')
+
+
+@click.command()
+@click.option("--dataset", default='daily_price',
+              type=click.Choice(['daily_price', 'adj_factor', 'daily_info', 'minute_price']))
+@click.option("--start", default='20130101', )
+@click.option("--freq", default='5min', )
+@click.option("--output", default=None, help='csv file of the per stock report')
+def coverage(dataset, start, freq, output):
+    checker = tuschecker_init()
+    end = pd.Timestamp.today().strftime('%Y%m%d')
+    df = checker.coverage(dataset, start, end, freq=freq)
+    click.echo('{}: {} stocks, {}/{} keys valid'.format(dataset, len(df), df['valid'].sum(), df['keys'].sum()))
+    click.echo(df.sort_values('ratio').head(20))
+    if output is not None:
+        df.to_csv(output)
+    click.echo('done')
+
+
 @click.command()
 def dbshow():
     reader = tusbooster_init()
@@ -567,6 +722,7 @@ def dbshow():
 first.add_command(update_basic)
 first.add_command(update_daily)
 first.add_command(update_xdxr)
+first.add_command(update_xsection)
 first.add_command(update_daily_ext)
 first.add_command(update_minute)
 first.add_command(update_index_daily)
@@ -575,6 +731,10 @@ first.add_command(check_daily)
 first.add_command(check_index_daily)
 first.add_command(tsshow)
 first.add_command(dbshow)
+first.add_command(migrate)
+first.add_command(migrate_keyspace)
+first.add_command(export_panel)
+first.add_command(coverage)
 
 if __name__ == "__main__":
     import logbook, sys
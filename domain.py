@@ -5,6 +5,78 @@ from abc import abstractmethod
 log = Logger('xtus')
 
 
+class XcSuspendIndex(object):
+    """
+    停牌信息索引, 按股票代码CSR方式存储, 用于完整性检查时快速查询, 避免每次对suspend_info做pandas过滤:
+        codes: 股票代码(升序), indptr: 每个股票在days中的范围[indptr[n], indptr[n+1])
+        days: 停复牌日在trade_cal中的位置(int32, 每个股票内升序), types: SP_SUSPEND/SP_RESUME
+        full: 是否全天停牌(suspend_timing为空)
+    """
+    SP_SUSPEND = 1
+    SP_RESUME = 2
+
+    def __init__(self, suspend_info, trade_cal):
+        cal = np.asarray(trade_cal).astype('M8[D]')
+        if suspend_info is None or len(suspend_info) == 0:
+            dates, codes = np.empty((0,), dtype='M8[D]'), np.empty((0,), dtype='U9')
+            stype, full = np.empty((0,), dtype='U1'), np.empty((0,), dtype=bool)
+        else:
+            dates = suspend_info.index.get_level_values(0).values.astype('M8[D]')
+            codes = np.array(suspend_info.index.get_level_values(1), dtype='U')
+            stype = np.array(suspend_info['suspend_type'], dtype='U')
+            full = pd.isna(suspend_info['suspend_timing']).values
+
+        # only trading days
+        pos = np.searchsorted(cal, dates)
+        vld = pos < len(cal)
+        vld[vld] = cal[pos[vld]] == dates[vld]
+        pos, codes, stype, full = pos[vld], codes[vld], stype[vld], full[vld]
+
+        # lexsort is stable, records of the same day keep their order.
+        order = np.lexsort((pos, codes))
+        self.codes, starts = np.unique(codes[order], return_index=True)
+        self.indptr = np.append(starts, len(order)).astype(np.int64)
+        self.days = pos[order].astype(np.int32)
+        self.types = np.zeros((len(order),), dtype=np.int8)
+        self.types[stype[order] == 'S'] = self.SP_SUSPEND
+        self.types[stype[order] == 'R'] = self.SP_RESUME
+        self.full = full[order].astype(bool)
+        self._code_map = {cc: n for n, cc in enumerate(self.codes)}
+
+    def __contains__(self, code):
+        return code in self._code_map
+
+    def _range(self, code, ss, ee):
+        """
+        :return: [lo, hi) in days of the code's records within trade_cal positions [ss, ee)
+        """
+        n = self._code_map.get(code)
+        if n is None:
+            return 0, 0
+        start, end = self.indptr[n], self.indptr[n + 1]
+        lo, hi = np.searchsorted(self.days[start:end], [ss, ee])
+        return start + lo, start + hi
+
+    def count_full(self, code, ss, ee):
+        """
+        number of full day suspended days of trade_cal positions [ss, ee)
+        """
+        lo, hi = self._range(code, ss, ee)
+        return int(np.count_nonzero((self.types[lo:hi] == self.SP_SUSPEND) & self.full[lo:hi]))
+
+    def day_status(self, code, pos):
+        """
+        :param code:
+        :param pos: position of the day in trade_cal
+        :return: None if not suspended, True if full day suspended, False if part time suspended.
+        """
+        lo, hi = self._range(code, pos, pos + 1)
+        sel = np.nonzero(self.types[lo:hi] == self.SP_SUSPEND)[0]
+        if len(sel) == 0:
+            return None
+        return bool(self.full[lo + sel[-1]])
+
+
 class XcDomain(object):
     xctus_last_day = None
     xctus_first_day = None
@@ -15,11 +87,14 @@ class XcDomain(object):
     _cal_5min = None
 
     _suspend_info = None
+    _suspend_index = None
     _stock_info = None
     _index_info = None
     _fund_info = None
-    _cal_map_month = None
+    _cal_map_chunk = None
     _cal_map_day = None
+    _cal_offsets_chunk = None  # chunk -> (first chunk month, start offsets, end offsets)
+    _cal_day_d = None  # trade_cal as datetime64[D] ndarray
 
     def __init__(self):
         log.info('Domain Init...')
@@ -38,11 +113,14 @@ class XcDomain(object):
         self._cal_1min = None
         self._cal_5min = None
         self._suspend_info = None
+        self._suspend_index = None
         self._stock_info = None
         self._index_info = None
         self._fund_info = None
-        self._cal_map_month = None
+        self._cal_map_chunk = None
         self._cal_map_day = None
+        self._cal_offsets_chunk = None
+        self._cal_day_d = None
 
     @property
     def trade_cal(self) -> pd.DatetimeIndex:
@@ -67,22 +145,83 @@ class XcDomain(object):
             return self.trade_cal_5min
         return None
 
+    def tcalmap_chunk(self, chunk='M'):
+        """
+        chunk start date -> [start, end) position in trade_cal
+        :param chunk: 'M', 'Q', 'Y'
+        :return: DataFrame
+        """
+        if self._cal_map_chunk is None:
+            self._cal_map_chunk = {}
+        if chunk not in self._cal_map_chunk:
+            m_start, starts, ends = self.tcal_offsets_chunk(chunk)
+            months = m_start + np.arange(len(starts)) * XTUS_CHUNK_MONTHS[chunk]
+            cmap1 = pd.DataFrame({'start': starts, 'end': ends}, index=months.astype('M8[D]').astype('M8[ns]'),
+                                 columns=['start', 'end'])
+            self._cal_map_chunk[chunk] = cmap1
+        return self._cal_map_chunk[chunk]
+
+    @property
+    def trade_cal_d(self):
+        """
+        trade_cal as datetime64[D] ndarray, for searchsorted.
+        """
+        if self._cal_day_d is None:
+            self._cal_day_d = np.asarray(self.trade_cal).astype('M8[D]')
+        return self._cal_day_d
+
+    def tcal_offsets_chunk(self, chunk='M'):
+        """
+        integer offsets of chunks in trade_cal, chunk n starts at month m_start + n * XTUS_CHUNK_MONTHS[chunk],
+        its trading days are trade_cal[starts[n]: ends[n]]
+        :param chunk: 'M', 'Q', 'Y'
+        :return: (m_start, starts, ends), m_start is datetime64[M]
+        """
+        if self._cal_offsets_chunk is None:
+            self._cal_offsets_chunk = {}
+        if chunk not in self._cal_offsets_chunk:
+            nmon = XTUS_CHUNK_MONTHS[chunk]
+            m_start = CHUNK_START(self.xctus_first_day, chunk).astype('M8[M]')
+            m_end = CHUNK_START(self.xctus_last_day, chunk).astype('M8[M]')
+            months = np.arange(m_start, m_end + 1, nmon)
+            cal = self.trade_cal_d
+            starts = np.searchsorted(cal, months.astype('M8[D]')).astype(np.int64)
+            ends = np.searchsorted(cal, (months + nmon).astype('M8[D]')).astype(np.int64)
+            self._cal_offsets_chunk[chunk] = (m_start, starts, ends)
+        return self._cal_offsets_chunk[chunk]
+
+    def chunk_pos(self, key, chunk='M'):
+        """
+        [start, end) position of the chunk in trade_cal, same as tcalmap_chunk(chunk).loc[key] without pandas indexing.
+        :param key: chunk key(chunk start date), datetime64 or str
+        :param chunk:
+        :return: (start, end)
+        """
+        m_start, starts, ends = self.tcal_offsets_chunk(chunk)
+        key = strdt_to_dt64(key)
+        nn = (key.astype('M8[M]') - m_start).astype(np.int64)
+        if nn < 0 or nn % XTUS_CHUNK_MONTHS[chunk] != 0 or nn // XTUS_CHUNK_MONTHS[chunk] >= len(starts):
+            raise KeyError(key)
+        nn = nn // XTUS_CHUNK_MONTHS[chunk]
+        return starts[nn], ends[nn]
+
+    def day_pos(self, dt):
+        """
+        position of the trading day in trade_cal, same as tcalmap_day.loc[dt] without pandas indexing.
+        :param dt: datetime64 or str
+        :return:
+        """
+        cal = self.trade_cal_d
+        dt = strdt_to_dt64(dt)
+        dt = dt.astype('M8[D]')
+        pos = np.searchsorted(cal, dt)
+        if pos >= len(cal) or cal[pos] != dt:
+            raise KeyError(dt)
+        return pos
+
     @property
     def tcalmap_mon(self):
-        if self._cal_map_month is None:
-            tstart = self.xctus_first_day
-            tend = self.xctus_last_day
-            m_start = pd.Timestamp(year=tstart.year, month=tstart.month, day=1)
-            m_end = pd.Timestamp(year=tend.year, month=tend.month, day=tend.days_in_month)
-            mdates = pd.date_range(m_start, m_end, freq='MS').values
-            cmap1 = pd.DataFrame(index=mdates, columns=['start', 'end'], dtype=np.int64)
-            for dd in mdates:
-                stt = np.sum(self.trade_cal < dd)
-                ett = np.sum(self.trade_cal <= MONTH_END(dd))
-                cmap1.loc[dd, 'start'] = stt
-                cmap1.loc[dd, 'end'] = ett
-            self._cal_map_month = cmap1.astype(np.int64)
-        return self._cal_map_month
+        return self.tcalmap_chunk('M')
 
     @property
     def tcalmap_day(self):
@@ -90,6 +229,18 @@ class XcDomain(object):
             self._cal_map_day = pd.Series(data=np.arange(len(self.trade_cal)), index=self.trade_cal, dtype=np.int64)
         return self._cal_map_day
 
+    def key_sealed(self, keys, chunk=None):
+        """
+        if trading days of the keys can't change by the calendar extending, i.e. trading days exist after them.
+        data of unsealed keys should not be marked in validity bitmap.
+        :param keys: chunk keys, or day keys if chunk is None
+        :param chunk: 'M', 'Q', 'Y', None
+        :return: bool ndarray
+        """
+        if chunk is None:
+            return np.array([self.day_pos(kk) < len(self.trade_cal) - 1 for kk in keys], dtype=bool)
+        return np.array([self.chunk_pos(kk, chunk)[1] < len(self.trade_cal) for kk in keys], dtype=bool)
+
     def gen_keys_monthly(self, start_dt, end_dt, code=None, astype='E'):
         """
         根据当前交易品种的有效交易日历， 产生月度keys
@@ -97,6 +248,16 @@ class XcDomain(object):
         :param end_dt:
         :return:
         """
+        return self.gen_keys_chunk(start_dt, end_dt, code, astype, 'M')
+
+    def gen_keys_chunk(self, start_dt, end_dt, code=None, astype='E', chunk='M'):
+        """
+        根据当前交易品种的有效交易日历， 产生月度/季度/年度keys(chunk start date)
+        :param start_dt:
+        :param end_dt:
+        :param chunk: 'M', 'Q', 'Y', see layout META 'chunk'
+        :return:
+        """
         start_dt = strdt_to_dt64(start_dt)
         end_dt = strdt_to_dt64(end_dt)
 
@@ -110,8 +271,8 @@ class XcDomain(object):
                 tstart = max([l_ss, start_dt])
                 tend = min([l_ee, end_dt])
 
-        mm_index = self.tcalmap_mon.index.values
-        mmdts = mm_index[(mm_index >= MONTH_START(tstart)) & (mm_index <= MONTH_END(tend))]
+        mm_index = self.tcalmap_chunk(chunk).index.values
+        mmdts = mm_index[(mm_index >= CHUNK_START(tstart, chunk)) & (mm_index <= CHUNK_END(tend, chunk))]
         if len(mmdts) == 0:
             return None
         return mmdts
@@ -123,8 +284,19 @@ class XcDomain(object):
         :param end_m: end month
         :return:
         """
-        ssc1, ssc2 = self.tcalmap_mon.loc[start_m], self.tcalmap_mon.loc[end_m]
-        alldays = self.trade_cal[ssc1.start: ssc2.end]
+        return self.gen_dindex_chunk(start_m, end_m, 'M')
+
+    def gen_dindex_chunk(self, start_k, end_k, chunk='M'):
+        """
+        generate dayindex by chunk
+        :param start_k: start chunk key, datetime64
+        :param end_k: end chunk key
+        :param chunk: 'M', 'Q', 'Y'
+        :return:
+        """
+        ss, _ = self.chunk_pos(start_k, chunk)
+        _, ee = self.chunk_pos(end_k, chunk)
+        alldays = self.trade_cal[ss: ee]
         return alldays
 
     def gen_keys_daily(self, start_dt, end_dt, code, astype='E'):
@@ -165,7 +337,7 @@ class XcDomain(object):
         """
         periods = XTUS_FREQ_BARS[freq]
         calmins = self.freq_to_cal(freq)
-        ssc1, ssc2 = self.tcalmap_day.loc[start_d], self.tcalmap_day.loc[end_d]
+        ssc1, ssc2 = self.day_pos(start_d), self.day_pos(end_d)
         alldays = calmins[ssc1 * periods: (ssc2 + 1) * periods]
         return alldays
 
@@ -240,21 +412,22 @@ class XcDomain(object):
         end_date = strdt_to_dt64(end_date)
         return start_date, end_date
 
-    def integrity_check_km_vday(self, dt, dtval, code=None, astype='E', check_mode=0):
+    def integrity_check_km_vday(self, dt, dtval, code=None, astype='E', check_mode=0, chunk='M'):
         """
-        monthly key with daily data. use suspend information to check if the data is integrate
+        monthly(chunk) key with daily data. use suspend information to check if the data is integrate
         :param dt: date keys
         :param dtval:  data values, 1d ndarray, [volume]
         :param code:
         :param astype:
         :param check_mode: 0, length check only, other: fully check
+        :param chunk: 'M', 'Q', 'Y'
         :return:
         """
         if dtval is None:
             return False
 
-        trdidx = self.gen_dindex_monthly(dt, dt)
-        nbarsmon = len(trdidx)
+        cm_start, cm_end = self.chunk_pos(dt, chunk)
+        nbarsmon = cm_end - cm_start
 
         # 1. dtval length must equal nbars of the month
         if len(dtval) != nbarsmon:
@@ -265,17 +438,11 @@ class XcDomain(object):
             return True
 
         # 2. dtval valid data length check with suspend info.
-        susp = None
-        if astype == 'E':
-            susp_info = self.stock_suspend(code)
-            if susp_info is None:
-                expect_size = nbarsmon
-                susp = None
-            else:
-                # 股票存在停牌半天的情况，也会被计入suspend列表, 但suspend_timing列有值
-                susp = susp_info[(susp_info.index >= MONTH_START(dt)) & (susp_info.index <= MONTH_END(dt))]
-                susp = susp.loc[(susp['suspend_type'] == 'S') & (susp['suspend_timing'].isna()), :]
-                expect_size = nbarsmon - len(susp)
+        nsusp = None
+        if astype == 'E' and code in self.suspend_index:
+            # 股票存在停牌半天的情况，也会被计入suspend列表, 但suspend_timing列有值
+            nsusp = self.suspend_index.count_full(code, cm_start, cm_end)
+            expect_size = nbarsmon - nsusp
         else:
             expect_size = nbarsmon
 
@@ -284,9 +451,9 @@ class XcDomain(object):
             bvalid = True
         else:
             bvalid = False
-            if susp is not None:
+            if nsusp is not None:
                 if expect_size < vldlen:
-                    log.info('[!KMVDAY]:{}-{}:: t{}-s{}-v{} '.format(code, dt, len(trdidx), len(susp), vldlen))
+                    log.info('[!KMVDAY]:{}-{}:: t{}-s{}-v{} '.format(code, dt, nbarsmon, nsusp, vldlen))
 
         return bvalid
 
@@ -316,26 +483,17 @@ class XcDomain(object):
         # 2. dtval valid data length check with suspend info.
         susp = None
         vldlen = np.sum(~np.isnan(dtval))
-        if astype == 'E':
-            susp_info = self.stock_suspend(code)
-
-            if susp_info is None:
+        if astype == 'E' and code in self.suspend_index:
+            susp = self.suspend_index.day_status(code, self.day_pos(dt))
+            if susp is None or susp:
+                # 当日全天停牌
+                # 部分品种，停牌数据有误。目前发现这种情况存在于退市/暂停上市的股票。
+                # 例如： 300216.SZ， 300431.SZ，这时nbars=vldlen视为有效。
+                # Fixme, 未停牌时如果部分时间没有交易，vldlen可能小于nbars
                 minbars = nbarsday
             else:
-                susp = susp_info.loc[(susp_info['suspend_type'] == 'S') & (susp_info.index == dt), :]
-                if not susp.empty:
-                    timing = susp['suspend_timing'].iloc[-1]
-                    if timing is None:
-                        # 当日全天停牌
-                        # 部分品种，停牌数据有误。目前发现这种情况存在于退市/暂停上市的股票。
-                        # 例如： 300216.SZ， 300431.SZ，这时nbars=vldlen视为有效。
-                        minbars = nbarsday
-                    else:
-                        # 部分时间停牌
-                        minbars = 1
-                else:
-                    minbars = nbarsday
-                    # Fixme, 如果部分时间没有交易，vldlen可能小于nbars
+                # 部分时间停牌
+                minbars = 1
         else:
             minbars = nbarsday
 
@@ -346,9 +504,18 @@ class XcDomain(object):
         if vldlen > 0:
             log.info('[!KDVMIN]-: {}:: {}-{} '.format(code, dt, vldlen))
         if susp is not None and vldlen > 0:
-            log.info(susp)
+            log.info('[!KDVMIN]-: {}:: suspended, full day={}'.format(code, susp))
         return False
 
+    @property
+    def suspend_index(self):
+        """
+        XcSuspendIndex of suspend_info, built when first used.
+        """
+        if self._suspend_index is None:
+            self._suspend_index = XcSuspendIndex(self.suspend_info, self.trade_cal)
+        return self._suspend_index
+
     def stock_suspend(self, code):
         try:
             info = self.suspend_info.loc[pd.IndexSlice[:, code], :]
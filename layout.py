@@ -5,10 +5,22 @@ tpv: value type of the records
 dtype(optional): if record value is Dataframe, and all columns are the same type, we can explict specify the
 dtype, this can enhance the pickle load/dump speed. if not specify dtype, pickle dump/load will treat all data to
 'object' type, which will slow down the speed.
+vlayout(optional): value layout of TPV_DFRAME records, VLAYOUT.VL_ROW(default) store one 2D block per key,
+VLAYOUT.VL_COLUMN store one value per (key, field), so reading a few fields only decode these columns.
+compress(optional): COMPRESS.CP_NONE(default), CP_ZLIB, CP_LZMA, compressor of fixed dtype values.
+shuffle(optional): byte-shuffle before compress. run tests/bench_codec.py to compare size and decode speed.
+chunk(optional): chunk granularity of daily data keyed by date, 'M'(default) one key per month, 'Q' quarter, 'Y' year.
+changing it for an existing database needs to erase the sub-databases (keys of different chunk are not compatible),
+the chunk is recorded with the validity bitmap, accessors of another chunk raise ValueError(see XcAccessor.check_chunk).
+fixed_point(optional): list of (int dtype, scale) of columns, store float columns as delta encoded integers
+value * scale, blocks which can't be represented exactly fall back to raw 'dtype' bytes.
+validity(optional): sub-database path of validity bitmaps, date keyed datasets only. bit of a key is set when its
+value passes the full integrity check, cleared on every save/remove, see XcAccessor.set_validity.
 """
 from enum import Enum
 
-from .xcdb.xcdb import KVTYPE
+from .xcdb.xcdb import KVTYPE, VLAYOUT
+from .xcdb.codec import COMPRESS
 
 
 class TusKeys(Enum):
@@ -50,8 +62,16 @@ class TusSdbs(Enum):
     SDB_STOCK_FIN_INDICATOR = 'ts:stock_finance:indicator:'
     SDB_STOCK_DAILY_MARGIN = 'ts:daily_margin:'
     SDB_STOCK_ADJFACTOR = 'ts:stock_adj_factor:'
+    # date-major cross sections of all stocks, built from SDB_DAILY_PRICE
+    SDB_XSECTION_DAILY = 'ts:xsection:daily_price'
+    SDB_XSECTION_CODES = 'ts:xsection:codes'
+    # validity bitmaps of date keyed sub-databases, keyed by sub-database path
+    SDB_VALIDITY = 'ts:meta:validity'
 
 
+# per code sub-databases, each is one table in KEYSPACE.KS_TABLE
+SDB_TABLES = tuple(sdb.value for sdb in TusSdbs if sdb.value.endswith(':'))
+
 
 ##############################################################
 GENERAL_OBJ_META = {
@@ -185,6 +205,9 @@ STOCK_XDXR_META = {
                 ],
 }
 
+# open/high/low/close in 0.01 yuan ticks, volume(0.01 lot), amount(yuan, tushare amount is in 1000 yuan)
+OHLCV_FIXED_POINT = [('i4', 100)] * 4 + [('i8', 100), ('i8', 1000)]
+
 EQUITY_DAILY_PRICE_META = {
     'tpk': KVTYPE.TPK_DATE,
     'tpv': KVTYPE.TPV_DFRAME,
@@ -198,6 +221,10 @@ EQUITY_DAILY_PRICE_META = {
         'amount',
     ],
     'dtype': 'f8',
+    'vlayout': VLAYOUT.VL_ROW,
+    'fixed_point': OHLCV_FIXED_POINT,
+    'chunk': 'M',
+    'validity': TusSdbs.SDB_VALIDITY.value,
 }
 
 EQUITY_MINUTE_PRICE_META = {
@@ -213,6 +240,26 @@ EQUITY_MINUTE_PRICE_META = {
         'amount',
     ],
     'dtype': 'f8',
+    'vlayout': VLAYOUT.VL_ROW,
+    'compress': COMPRESS.CP_ZLIB,
+    'shuffle': False,
+    'fixed_point': OHLCV_FIXED_POINT,
+    'validity': TusSdbs.SDB_VALIDITY.value,
+}
+
+# one key per trading date, rows of the value are aligned to XSECTION_CODES_META value of the same date.
+XSECTION_DAILY_META = {
+    'tpk': KVTYPE.TPK_DATE,
+    'tpv': KVTYPE.TPV_DFRAME,
+    'columns': EQUITY_DAILY_PRICE_META['columns'],
+    'dtype': 'f8',
+    'vlayout': VLAYOUT.VL_COLUMN,
+}
+
+XSECTION_CODES_META = {
+    'tpk': KVTYPE.TPK_DATE,
+    'tpv': KVTYPE.TPV_INDEX,
+    'dtype': 'U9',
 }
 
 STOCK_ADJFACTOR_META = {
@@ -223,6 +270,8 @@ STOCK_ADJFACTOR_META = {
         'adj_factor',
     ],
     'dtype': 'f8',
+    'chunk': 'M',
+    'validity': TusSdbs.SDB_VALIDITY.value,
 }
 
 STOCK_DAILY_INFO_META = {
@@ -248,6 +297,9 @@ STOCK_DAILY_INFO_META = {
         'circ_mv',
     ],
     'dtype': 'f8',
+    'vlayout': VLAYOUT.VL_ROW,
+    'chunk': 'M',
+    'validity': TusSdbs.SDB_VALIDITY.value,
 }
 
 STOCK_SUSPEND_META = {
@@ -813,3 +865,47 @@ INDEX_DAILY_INFO_META = {
         'exchange',
     ],
 }
+
+
+# bitmap of validity, np.packbits uint8 array, keyed by the data sub-database path.
+# the chunk of the path(uint8 array of the chunk letter) is keyed by the path + xcdb.CHUNK_KEY_SUFFIX.
+VALIDITY_META = {
+    'tpk': KVTYPE.TPK_RAW,
+    'tpv': KVTYPE.TPV_INDEX,
+    'dtype': 'u1',
+}
+
+
+# Sub-databases which hold values of only one META, used to re-encode values with META options when migrating.
+# sub-database not listed here (e.g. SDB_CALENDAR, SDB_ASSET_INFO) can only be migrated to current format by codec.
+SDB_METAS = {
+    TusSdbs.SDB_STOCK_XDXR: STOCK_XDXR_META,
+    TusSdbs.SDB_DAILY_PRICE: EQUITY_DAILY_PRICE_META,
+    TusSdbs.SDB_MINUTE_PRICE: EQUITY_MINUTE_PRICE_META,
+    TusSdbs.SDB_INDEX_WEIGHT: INDEX_WEIGHT_META,
+    TusSdbs.SDB_INDEX_CLASSIFY: INDEX_CLASSIFY_META,
+    TusSdbs.SDB_INDEX_MEMBER: INDEX_MEMBER_META,
+    TusSdbs.SDB_SUSPEND_D: SUSPEND_D_META,
+    TusSdbs.SDB_STOCK_DAILY_INFO: STOCK_DAILY_INFO_META,
+    TusSdbs.SDB_STOCK_SUSPEND: STOCK_SUSPEND_META,
+    TusSdbs.SDB_STOCK_FIN_INCOME: STOCK_FIN_INCOME_META,
+    TusSdbs.SDB_STOCK_FIN_BALANCE: STOCK_FIN_BALANCE_META,
+    TusSdbs.SDB_STOCK_FIN_CASHFLOW: STOCK_FIN_CASHFLOW_META,
+    TusSdbs.SDB_STOCK_FIN_INDICATOR: STOCK_FIN_INDICATOR_META,
+    TusSdbs.SDB_STOCK_ADJFACTOR: STOCK_ADJFACTOR_META,
+    TusSdbs.SDB_XSECTION_DAILY: XSECTION_DAILY_META,
+    TusSdbs.SDB_XSECTION_CODES: XSECTION_CODES_META,
+    TusSdbs.SDB_VALIDITY: VALIDITY_META,
+}
+
+
+def sdb_meta(sdb_path):
+    """
+    META of sub-database path, e.g. 'ts:daily_price:000001.SZ' -> EQUITY_DAILY_PRICE_META
+    :param sdb_path:
+    :return: None if unknown.
+    """
+    for sdb, meta in SDB_METAS.items():
+        if sdb_path == sdb.value or (sdb.value.endswith(':') and sdb_path.startswith(sdb.value)):
+            return meta
+    return None
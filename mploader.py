@@ -0,0 +1,179 @@
+"""
+Multi-process loader of a universe of codes.
+Reading full-market minute prices is CPU bound(decoding, DataFrame construction), the thread pool of
+utils/parallelize does not scale with the GIL. The universe is split into shards of codes, worker processes open the
+LMDB environment readonly, read their shards with get_price_daily/get_price_minute, and write them into one shared
+memory panel(time x codes x fields), which the parent wraps as XcPanel without copying.
+
+Workers are spawned(an LMDB environment must not be used across fork), the main module of the application must be
+guarded by if __name__ == '__main__'.
+Only the database is read(IOFLAG.READ_DBONLY), update the data first.
+Without multiprocessing.shared_memory(python < 3.8), the universe is loaded in process.
+"""
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from logbook import Logger
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+from .layout import *
+from .panel import XcPanel
+from .xcdb.xcdb import *
+
+log = Logger('mploader')
+
+# reader of the worker process
+_reader = None
+
+
+class XcSharedPanel(XcPanel):
+    """
+    panel on a shared memory block, release() it after all views(frame(), ...) are dropped.
+    """
+
+    def __init__(self, shm, data, dates, codes, fields):
+        super(XcSharedPanel, self).__init__(data, dates, codes, fields)
+        self.shm = shm
+
+    def release(self):
+        self.data = None
+        self.shm.close()
+
+
+def _worker_init(db_name, last_day, keyspace):
+    """
+    open the database readonly, load domain data from it.
+    """
+    global _reader
+    from .xbooster import XcTusBooster
+    _reader = XcTusBooster(last_day=last_day, db_name=db_name, readonly=True, keyspace=keyspace)
+    _reader.init_domain()
+
+
+def _fill_shard(reader, data, lo, codes, index, start, end, freq, fields, astype):
+    """
+    read the codes, write them to data[:, lo:lo+len(codes), :].
+    :param index: M8[ns] time index of data
+    :return: number of codes with data, codes failed to read
+    """
+    info = {'E': reader.stock_info, 'I': reader.index_info, 'FD': reader.fund_info}[astype]
+    nfilled, failed = 0, []
+    for n, code in enumerate(codes):
+        if code not in info.index:
+            # not in asset info, no data
+            continue
+        try:
+            if freq == '1D':
+                val = reader.get_price_daily(code, start, end, astype, flag=IOFLAG.READ_DBONLY, fields=fields,
+                                             copy=False)
+            else:
+                val = reader.get_price_minute(code, start, end, freq, astype, flag=IOFLAG.READ_DBONLY, fields=fields,
+                                              copy=False)
+        except ChunkMissingError:
+            # not updated, no data
+            continue
+        except Exception as e:
+            log.error('{} read failed: {!r}'.format(code, e))
+            failed.append(code)
+            continue
+        if val is None or len(val) == 0:
+            continue
+        # chunks may exceed [start, end]
+        tt = val.index.values.astype('M8[ns]')
+        pos = np.searchsorted(index, tt)
+        mask = pos < len(index)
+        mask[mask] = index[pos[mask]] == tt[mask]
+        data[pos[mask], lo + n, :] = val.values[mask]
+        nfilled += 1
+    return nfilled, failed
+
+
+def _load_shard(shm_name, shape, lo, codes, index, start, end, freq, fields, astype):
+    """
+    worker: fill one shard of the shared memory panel.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        data = np.ndarray(shape, dtype='f8', buffer=shm.buf)
+        out = _fill_shard(_reader, data, lo, codes, index, start, end, freq, fields, astype)
+        del data
+    finally:
+        shm.close()
+    return out
+
+
+def load_universe(reader, codes, start, end, freq='1D', fields=None, astype='E', workers=None):
+    """
+    prices of a universe of codes, read by worker processes.
+    :param reader: XcTusBooster(LMDB)
+    :param codes: None for all codes of astype
+    :param start:
+    :param end:
+    :param freq: '1D' or minute freq of XTUS_FREQS
+    :param fields: columns to read, None for all columns of the META
+    :param astype: 'E', 'I', 'FD'
+    :param workers: number of processes, default cpu count. 1 to load in process.
+    :return: XcPanel(XcSharedPanel if loaded by workers), NaN if no data. None if no trading days.
+        codes not updated are no data, the codes failed to read are logged and listed in panel.failed.
+    """
+    if codes is None:
+        codes = {'E': reader.stock_info, 'I': reader.index_info, 'FD': reader.fund_info}[astype].index
+    codes = np.array(codes, dtype='U9')
+    if freq == '1D':
+        meta = EQUITY_DAILY_PRICE_META
+        index = reader.gen_keys_daily(start, end, None, None)
+        if index is None:
+            return None
+        dates = np.asarray(index).astype('M8[D]')
+    else:
+        meta = EQUITY_MINUTE_PRICE_META
+        days = reader.gen_keys_daily(start, end, None, None)
+        if days is None:
+            return None
+        dates = np.asarray(reader.gen_mindex_daily(days[0], days[-1], freq))
+    index = dates.astype('M8[ns]')
+    cols = meta['columns'] if fields is None else fields
+    shape = (len(index), len(codes), len(cols))
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(codes) <= 1 or shared_memory is None:
+        data = np.full(shape, np.nan)
+        _, failed = _fill_shard(reader, data, 0, codes, index, start, end, freq, fields, astype)
+        panel = XcPanel(data, dates, codes, cols)
+        panel.failed = failed
+        return panel
+
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    data = None
+    try:
+        data = np.ndarray(shape, dtype='f8', buffer=shm.buf)
+        data.fill(np.nan)
+        # about 4 shards per worker for load balance
+        step = max(1, -(-len(codes) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_worker_init,
+                                 initargs=(reader.master_db.name, reader.xctus_last_day,
+                                           reader.master_db.keyspace)) as executor:
+            tasks = [executor.submit(_load_shard, shm.name, shape, lo, codes[lo:lo + step], index, start, end, freq,
+                                     fields, astype) for lo in range(0, len(codes), step)]
+            results = [task.result() for task in tasks]
+        nfilled = sum(nn for nn, _ in results)
+        failed = [code for _, codes_failed in results for code in codes_failed]
+        log.info('Universe loaded: {} codes, {} with data, {} failed, {} workers'.format(len(codes), nfilled,
+                                                                                        len(failed), workers))
+    except:
+        data = None
+        shm.close()
+        raise
+    finally:
+        # the name is removed, the mapping of the parent is valid until release()
+        shm.unlink()
+    panel = XcSharedPanel(shm, data, dates, codes, cols)
+    panel.failed = failed
+    return panel
@@ -0,0 +1,97 @@
+"""
+Dense panel files (trading days x codes x fields) exported from the cache database.
+Research notebooks and backtest workers map the files with np.load(mmap_mode='r'), no database reading and decoding,
+the pages are shared by all processes reading the same panel.
+
+Files of a panel in the directory(see XcReaderPrice.export_panel):
+    {name}.{stamp}.npy  f8, shape (days, codes, fields), NaN if no data (suspended, not listed, ...)
+    {name}.npz          index of the panel:
+                            dates   datetime64[D], trading days, aligned to XcDomain.trade_cal
+                            codes   ts_code
+                            fields  field names, columns of the dataset META
+                            data    file name of the data of this export
+An export writes a new data file, then replaces the index, readers always see the index and data of one export.
+The data file of the previous export is kept for the readers which loaded its index just before.
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from .layout import *
+
+# dataset name: (sub-database prefix, META)
+PANEL_DATASETS = {
+    'daily_price': (TusSdbs.SDB_DAILY_PRICE, EQUITY_DAILY_PRICE_META),
+    'adj_factor': (TusSdbs.SDB_STOCK_ADJFACTOR, STOCK_ADJFACTOR_META),
+    'daily_info': (TusSdbs.SDB_STOCK_DAILY_INFO, STOCK_DAILY_INFO_META),
+}
+
+
+def panel_files(path, name, stamp=None):
+    """
+    :param path: directory
+    :param name: panel name, default is the dataset name.
+    :param stamp: version of the data file
+    :return: dict of file paths, index, data(None if stamp is None) and all data files of the panel
+    """
+    prefix = os.path.join(path, name)
+    return {
+        'index': prefix + '.npz',
+        'data': None if stamp is None else '{}.{}.npy'.format(prefix, stamp),
+        'all_data': sorted(glob.glob(glob.escape(prefix) + '.*.npy')),
+    }
+
+
+class XcPanel(object):
+    """
+    memory mapped panel, data is readonly.
+    """
+    # codes failed to read, NaN in the panel, see mploader.load_universe
+    failed = ()
+
+    def __init__(self, data, dates, codes, fields):
+        self.data = data
+        self.dates = dates
+        self.codes = codes
+        self.fields = [str(ff) for ff in fields]
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def frame(self, field, start=None, end=None):
+        """
+        one field as DataFrame, index is trading days, columns are codes.
+        :param field:
+        :param start:
+        :param end:
+        :return:
+        """
+        lo = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), 'D'))
+        hi = len(self.dates) if end is None else \
+            np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end), 'D'), side='right')
+        return pd.DataFrame(data=self.data[lo:hi, :, self.fields.index(field)],
+                            index=pd.DatetimeIndex(self.dates[lo:hi]), columns=self.codes)
+
+
+def load_panel(path, name='daily_price'):
+    """
+    map the panel files exported by export_panel.
+    :param path: directory
+    :param name:
+    :return: XcPanel
+    """
+    files = panel_files(path, name)
+    for retry in range(3):
+        with np.load(files['index']) as index:
+            dates, codes, fields, dfile = index['dates'], index['codes'], index['fields'], str(index['data'])
+        try:
+            data = np.load(os.path.join(path, dfile), mmap_mode='r')
+        except FileNotFoundError:
+            # removed by the exports after the index is read, read the index again.
+            if retry == 2:
+                raise
+            continue
+        return XcPanel(data, dates, codes, fields)
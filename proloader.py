@@ -1,10 +1,106 @@
+import os
+
 import tushare as ts
 
 from ._passwd import TUS_TOKEN
 from .layout import *
-from .utils.qos import ThreadingTokenBucket
+from .utils.qos import RateLimiters, RateLimitedApi, SharedRateLimiters
 from .utils.xcutils import *
 
+# budgets of the tushare pro endpoints, endpoint: (calls per minute, burst calls), None for the other endpoints.
+# 每分钟不超过500次，每秒8次
+TUS_API_LIMITS = {
+    None: (500, 8),
+    # 每分钟最多访问该接口700次
+    'daily_basic': (700, 8),
+}
+# state file of the rate limiters shared by the processes, in the directory of the LMDB environment
+TUS_QOS_FILE = 'tusqos.json'
+# path of the state file if the LMDB directory is readonly(or shared by hosts), e.g. '/tmp/tusqos.json'
+TUS_QOS_PATH = None
+
+
+def index_info_of(info1, info2):
+    """
+    index_basic of SSE and SZSE to INDEX_INFO
+    """
+    info = pd.concat([info1, info2], axis=0)
+    if not info.empty:
+        info.loc[:, 'list_date'].fillna('20000101', inplace=True)
+        info.loc[:, 'exp_date'].fillna('21000101', inplace=True)
+        return info
+    return None
+
+
+def stock_info_of(*infos):
+    """
+    stock_basic of list status L, D, P to STOCK_INFO
+    """
+    info = pd.concat(infos, axis=0)
+    if not info.empty:
+        # info.loc[:, 'ts_code'] = info.loc[:, 'ts_code'].apply(symbol_tus_to_std)
+        info.loc[:, 'delist_date'].fillna('21000101', inplace=True)
+        return info
+    return None
+
+
+def fund_info_of(info):
+    """
+    fund_basic to FUND_INFO
+    """
+    if not info.empty:
+        # info = pd.concat([info1, info2], axis=0)
+        # info.loc[:, 'ts_code'] = info.loc[:, 'ts_code'].apply(symbol_tus_to_std)
+        info.loc[:, 'list_date'].fillna('20000101', inplace=True)
+        info.loc[:, 'delist_date'].fillna('21000101', inplace=True)
+        info.loc[:, 'exchange'] = info.loc[:, 'ts_code'].apply(lambda x: 'SSE' if x.endswith('.SH') else 'SZ')
+
+        return info
+    return None
+
+
+def minute_bars_of(data, code, start, end, freq, merge_first=True):
+    """
+    minute bars of pro_bar to EQUITY_MINUTE_PRICE, see XcNLPrice.set_price_minute.
+    """
+    if data is not None:
+        data = data.rename(columns={'vol': 'volume'})
+        # convert %Y-%m-%d %H:%M:%S to %Y%m%d %H:%M:%S
+        data['trade_time'] = data['trade_time'].apply(lambda x: x.replace('-', ''))
+
+        nbars = XTUS_FREQ_BARS[freq] + 1
+        if len(data) % nbars != 0:
+            """
+             002478.SZ, 2020-07-20 00:00:00-2020-09-24 00:00:00, 2372-49
+             002481.SZ, 2020-07-20 00:00:00-2020-09-24 00:00:00, 2381-49
+            """
+            log.error('min kbar length incorrect: {}, {}-{}, {}-{}'.format(code, start, end, len(data), nbars))
+            return None
+
+        if merge_first:
+            # Handle the first row of every day. (the Kbar at 9:30)
+            # Note : Data from tushare is in reverse order
+            for k in range(len(data) - 1, 0, -nbars):
+                v = data
+                if True:
+                    # open KBar check.
+                    # assert (v.loc[k - 1, 'pre_close'] == v.loc[k, 'close'])  # Only work for Stocks
+                    tt = pd.Timestamp(v.trade_time[k])
+                    assert ((tt.hour == 9) & (tt.minute == 30))
+
+                v.loc[k - 1, 'open'] = v.loc[k, 'open']  # Open
+                v.loc[k - 1, 'high'] = v.loc[(k - 1):k, 'high'].max()  # High
+                v.loc[k - 1, 'low'] = v.loc[(k - 1):k, 'low'].min()  # low
+                v.loc[k - 1, 'volume'] = v.loc[(k - 1):k, 'volume'].sum()  # volume
+                v.loc[k - 1, 'amount'] = v.loc[(k - 1):k, 'amount'].sum()  # amount
+
+            mask = (np.arange(len(data)) % nbars) != (nbars - 1)
+            data = data[mask]
+
+    else:
+        log.error('min data empty: {}, {}-{}'.format(code, start, end))
+    return data
+
 
 class XcNLBasic(object):
     pro_api = None
@@ -32,12 +128,7 @@ class XcNLBasic(object):
         info2 = self.pro_api.index_basic(market='SZSE', fields=fields)
         # info2.loc[:, 'ts_code'] = info2.loc[:, 'ts_code'].apply(conv1, subfix='.XSHE')
         info2.loc[:, 'exchange'] = 'SZSE'
-        info = pd.concat([info1, info2], axis=0)
-        if not info.empty:
-            info.loc[:, 'list_date'].fillna('20000101', inplace=True)
-            info.loc[:, 'exp_date'].fillna('21000101', inplace=True)
-            return info
-        return None
+        return index_info_of(info1, info2)
 
     def set_stock_info(self):
         """
@@ -48,12 +139,7 @@ class XcNLBasic(object):
         info1 = self.pro_api.stock_basic(list_status='L', fields=fields)  # 上市状态： L上市 D退市 P暂停上市
         info2 = self.pro_api.stock_basic(list_status='D', fields=fields)
         info3 = self.pro_api.stock_basic(list_status='P', fields=fields)
-        info = pd.concat([info1, info2, info3], axis=0)
-        if not info.empty:
-            # info.loc[:, 'ts_code'] = info.loc[:, 'ts_code'].apply(symbol_tus_to_std)
-            info.loc[:, 'delist_date'].fillna('21000101', inplace=True)
-            return info
-        return None
+        return stock_info_of(info1, info2, info3)
 
     def set_fund_info(self):
         """
@@ -62,21 +148,12 @@ class XcNLBasic(object):
         """
         fields = FUND_INFO_META['columns']
         info = self.pro_api.fund_basic(market='E', fields=fields)  # 交易市场: E场内 O场外（默认E）
-        if not info.empty:
-            # info2 = self.pro_api.fund_basic(market='O', fields=fields)
-            # info = pd.concat([info1, info2], axis=0)
-            # info.loc[:, 'ts_code'] = info.loc[:, 'ts_code'].apply(symbol_tus_to_std)
-            info.loc[:, 'list_date'].fillna('20000101', inplace=True)
-            info.loc[:, 'delist_date'].fillna('21000101', inplace=True)
-            info.loc[:, 'exchange'] = info.loc[:, 'ts_code'].apply(lambda x: 'SSE' if x.endswith('.SH') else 'SZ')
-
-            return info
-        return None
+        # info2 = self.pro_api.fund_basic(market='O', fields=fields)
+        return fund_info_of(info)
 
 
 class XcNLPrice(object):
     pro_api = None
-    ts_token = None
 
     def set_price_daily(self, code, start, end, astype='E'):
         """
@@ -91,8 +168,7 @@ class XcNLPrice(object):
         start_raw = start.strftime(DATE_FORMAT)
         end_raw = end.strftime(DATE_FORMAT)
 
-        self.ts_token.block_consume(5)
-        data = ts.pro_bar(code, asset=astype, start_date=start_raw, end_date=end_raw, freq='D')
+        data = ts.pro_bar(code, api=self.pro_api, asset=astype, start_date=start_raw, end_date=end_raw, freq='D')
         if data is not None:
             data = data.rename(columns={'vol': 'volume'})
         return data
@@ -117,44 +193,8 @@ class XcNLPrice(object):
         start_raw = start.strftime(DATETIME_FORMAT)
         end_raw = (end + pd.Timedelta(hours=17)).strftime(DATETIME_FORMAT)
 
-        self.ts_token.block_consume(10)
-        data = ts.pro_bar(code, asset=astype, start_date=start_raw, end_date=end_raw, freq=freq)
-        if data is not None:
-            data = data.rename(columns={'vol': 'volume'})
-            # convert %Y-%m-%d %H:%M:%S to %Y%m%d %H:%M:%S
-            data['trade_time'] = data['trade_time'].apply(lambda x: x.replace('-', ''))
-
-            nbars = XTUS_FREQ_BARS[freq] + 1
-            if len(data) % nbars != 0:
-                """
-                 002478.SZ, 2020-07-20 00:00:00-2020-09-24 00:00:00, 2372-49
-                 002481.SZ, 2020-07-20 00:00:00-2020-09-24 00:00:00, 2381-49
-                """
-                log.error('min kbar length incorrect: {}, {}-{}, {}-{}'.format(code, start, end, len(data), nbars))
-                return None
-
-            if merge_first:
-                # Handle the first row of every day. (the Kbar at 9:30)
-                # Note : Data from tushare is in reverse order
-                for k in range(len(data) - 1, 0, -nbars):
-                    v = data
-                    if True:
-                        # open KBar check.
-                        # assert (v.loc[k - 1, 'pre_close'] == v.loc[k, 'close'])  # Only work for Stocks
-                        tt = pd.Timestamp(v.trade_time[k])
-                        assert ((tt.hour == 9) & (tt.minute == 30))
-
-                    v.loc[k - 1, 'open'] = v.loc[k, 'open']  # Open
-                    v.loc[k - 1, 'high'] = v.loc[(k - 1):k, 'high'].max()  # High
-                    v.loc[k - 1, 'low'] = v.loc[(k - 1):k, 'low'].min()  # low
-                    v.loc[k - 1, 'volume'] = v.loc[(k - 1):k, 'volume'].sum()  # volume
-                    v.loc[k - 1, 'amount'] = v.loc[(k - 1):k, 'amount'].sum()  # amount
-
-                mask = (np.arange(len(data)) % nbars) != (nbars - 1)
-                data = data[mask]
-
-        else:
-            log.error('min data empty: {}, {}-{}'.format(code, start_raw, end_raw))
+        data = ts.pro_bar(code, api=self.pro_api, asset=astype, start_date=start_raw, end_date=end_raw, freq=freq)
+        data = minute_bars_of(data, code, start, end, freq, merge_first)
         return data
 
     def set_stock_daily_info(self, code, start, end):
@@ -173,7 +213,6 @@ class XcNLPrice(object):
         start_raw = start.strftime(DATE_FORMAT)
         end_raw = end.strftime(DATE_FORMAT)
 
-        self.ts_token.block_consume(7)
         # 每分钟最多访问该接口700次
         data = self.pro_api.daily_basic(ts_code=code, start_date=start_raw, end_date=end_raw,
                                         fields=fcols + ['trade_date'])
@@ -193,7 +232,6 @@ class XcNLPrice(object):
         fcols = STOCK_ADJFACTOR_META['columns']
         start_raw = start.strftime(DATE_FORMAT)
         end_raw = end.strftime(DATE_FORMAT)
-        self.ts_token.block_consume(1)
         data = self.pro_api.adj_factor(ts_code=code, start_date=start_raw, end_date=end_raw,
                                        fields=fcols + ['trade_date'])
 
@@ -212,7 +250,6 @@ class XcNLPrice(object):
         # fcols = STOCK_ADJFACTOR_META['columns']
         start_raw = start.strftime(DATE_FORMAT)
         end_raw = end.strftime(DATE_FORMAT)
-        self.ts_token.block_consume(1)
         data = self.pro_api.moneyflow(ts_code=code, start_date=start_raw, end_date=end_raw)
 
         return data
@@ -229,7 +266,6 @@ class XcNLPrice(object):
 
         start_raw = start.strftime(DATE_FORMAT)
         end_raw = end.strftime(DATE_FORMAT)
-        self.ts_token.block_consume(1)
         data = self.pro_api.bak_daily(ts_code=code, start_date=start_raw, end_date=end_raw)
 
         return data
@@ -246,7 +282,6 @@ class XcNLPrice(object):
 
         start_raw = start.strftime(DATE_FORMAT)
         end_raw = end.strftime(DATE_FORMAT)
-        self.ts_token.block_consume(1)
         data = self.pro_api.margin_detail(ts_code=code, start_date=start_raw, end_date=end_raw)
 
         return data
@@ -265,7 +300,6 @@ class XcNLPrice(object):
 
         start_raw = start.strftime(DATE_FORMAT)
         end_raw = end.strftime(DATE_FORMAT)
-        self.ts_token.block_consume(1)
         data = self.pro_api.suspend_d(ts_code=code, start_date=start_raw, end_date=end_raw, fields=fcols)
 
         return data
@@ -282,7 +316,6 @@ class XcNLPrice(object):
             date = pd.Timestamp(date)
         start_raw = date.strftime(DATE_FORMAT)
 
-        self.ts_token.block_consume(1)
         data = self.pro_api.suspend_d(trade_date=start_raw, fields=fcols)
 
         return data
@@ -293,7 +326,6 @@ class XcNLPrice(object):
         :param code:
         :return:
         """
-        self.ts_token.block_consume(10)
         info = self.pro_api.dividend(ts_code=code)
         # fcols = STOCK_XDXR_META['columns']
         # info_to_db = info_to_db.iloc[::-1]
@@ -340,7 +372,6 @@ class XcNLFinance(object):
 
 class XcNLIndex(object):
     pro_api = None
-    ts_token = None
 
     def set_index_weight(self, index_symbol, date):
         """
@@ -403,7 +434,6 @@ class XcNLIndex(object):
 
         start_raw = start.strftime(DATE_FORMAT)
         end_raw = end.strftime(DATE_FORMAT)
-        self.ts_token.block_consume(1)
         data = self.pro_api.index_dailybasic(ts_code=code, start_date=start_raw, end_date=end_raw)
 
         return data
@@ -418,7 +448,6 @@ class XcNLIndex(object):
             date = pd.Timestamp(date)
 
         start_raw = date.strftime(DATE_FORMAT)
-        self.ts_token.block_consume(1)
         data = self.pro_api.daily_info(trade_date=start_raw, exchange='SZ,SH', fields=INDEX_DAILY_INFO_META['columns'])
 
         return data
@@ -426,14 +455,12 @@ class XcNLIndex(object):
 
 class XcNLFund(object):
     pro_api = None
-    ts_token = None
 
     def set_fund_portfolio(self, code, date):
         if not isinstance(date, pd.Timestamp):
             date = pd.Timestamp(date)
 
         start_raw = date.strftime(DATE_FORMAT)
-        self.ts_token.block_consume(1)
         data = self.pro_api.fund_portfolio(ts_code=code, )
 
         return data
@@ -441,12 +468,10 @@ class XcNLFund(object):
 
 class XcNLFuture(object):
     pro_api = None
-    ts_token = None
 
 
 class XcNLOption(object):
     pro_api = None
-    ts_token = None
 
 
 class XcNLCoBond(object):
@@ -454,12 +479,10 @@ class XcNLCoBond(object):
     convertible bond
     """
     pro_api = None
-    ts_token = None
 
 
 class XcNLForex(object):
     pro_api = None
-    ts_token = None
 
 
 #####################################################################
@@ -467,17 +490,19 @@ class XcNLForex(object):
 #####################################################################
 class TusNetLoader(XcNLBasic, XcNLFinance, XcNLPrice, XcNLIndex, XcNLFund):
 
-    def __init__(self):
+    def __init__(self, qos_path=None):
         """
-        :param last_day: Tushare last date with data available,
-                            we assume yesterday's data is available in today.
+        :param qos_path: state file of the rate limiters shared with other processes(see qos_file), None to limit
+                            the calls of this process only.
         """
         # self.calendar = get_calendar('XSHG')
         ts.set_token(TUS_TOKEN)
-        self.pro_api = ts.pro_api()
-
-        # 每分钟不超过500次，每秒8次，同时api调用不超过300个。
-        self.ts_token = ThreadingTokenBucket(80, 300)
+        # every call waits for the budget of its endpoint, see TUS_API_LIMITS
+        if qos_path is None:
+            self.limiters = RateLimiters(TUS_API_LIMITS)
+        else:
+            self.limiters = SharedRateLimiters(qos_path, TUS_API_LIMITS)
+        self.pro_api = RateLimitedApi(ts.pro_api(), self.limiters)
 
         super(TusNetLoader, self).__init__()
 
@@ -485,8 +510,29 @@ class TusNetLoader(XcNLBasic, XcNLFinance, XcNLPrice, XcNLIndex, XcNLFund):
 gnetloader: TusNetLoader = None
 
 
-def netloader_init() -> TusNetLoader:
+def qos_file(db_path):
+    """
+    :param db_path: path of the LMDB environment(directory)
+    :return: state file of the shared rate limiters, TUS_QOS_PATH or TUS_QOS_FILE in db_path.
+             None(limit the calls of this process only) if db_path is None, or the file can't be written.
+    """
+    if TUS_QOS_PATH is not None:
+        path = TUS_QOS_PATH
+    elif db_path is not None:
+        path = os.path.join(db_path, TUS_QOS_FILE)
+    else:
+        return None
+    if not os.access(path if os.path.exists(path) else os.path.dirname(os.path.abspath(path)), os.W_OK):
+        log.info('qos state file not writable: {}, the quota is not shared with other processes'.format(path))
+        return None
+    return path
+
+
+def netloader_init(db_path=None) -> TusNetLoader:
+    """
+    :param db_path: path of the LMDB environment, the processes using it share the tushare quota.
+    """
     global gnetloader
     if gnetloader is None:
-        gnetloader = TusNetLoader()
+        gnetloader = TusNetLoader(qos_file(db_path))
     return gnetloader
@@ -38,7 +38,7 @@ class XcReaderBasic(XcDomain):
 
         log.info('Domain calendar:{}, {}'.format(first_date, current_date))
 
-        db = self.facc(TusSdbs.SDB_CALENDAR.value, CALENDAR_DTIDX_META)
+        db = self.facc(TusSdbs.SDB_CALENDAR.value, CALENDAR_DTIDX_META, readonly=True)
         self._cal_day = db.load(TusKeys.CAL_INDEX_DAY.value)
         self._cal_1min = db.load(TusKeys.CAL_INDEX_1MIN.value)
         self._cal_5min = db.load(TusKeys.CAL_INDEX_5MIN.value)
@@ -74,7 +74,7 @@ class XcReaderBasic(XcDomain):
         self.xctus_first_day = db_first_day
         self.xctus_last_day = db_last_day
 
-        db = self.facc(TusSdbs.SDB_CALENDAR.value, GENERAL_OBJ_META)
+        db = self.facc(TusSdbs.SDB_CALENDAR.value, GENERAL_OBJ_META, readonly=True)
         b_need_update = True
         first_date = db.load(TusKeys.CAL_FIRST_DATE.value)
         current_date = db.load(TusKeys.CAL_CURRENT_DATE.value)
@@ -118,7 +118,7 @@ class XcReaderBasic(XcDomain):
     @api_call
     def get_trade_cal(self, flag=IOFLAG.READ_XC):
 
-        db = self.facc(TusSdbs.SDB_CALENDAR.value, CALENDAR_RAW_META)
+        db = self.facc(TusSdbs.SDB_CALENDAR.value, CALENDAR_RAW_META, readonly=True)
 
         kk = TusKeys.CAL_RAW.value
 
@@ -128,7 +128,7 @@ class XcReaderBasic(XcDomain):
                 return val
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_trade_cal()
-            return db.save(kk, info)
+            return db.save_through(kk, info)
         return
 
     @api_call
@@ -137,7 +137,7 @@ class XcReaderBasic(XcDomain):
         get index information
         :return:
         """
-        db = self.facc(TusSdbs.SDB_ASSET_INFO.value, INDEX_INFO_META)
+        db = self.facc(TusSdbs.SDB_ASSET_INFO.value, INDEX_INFO_META, readonly=True)
         kk = TusKeys.INDEX_INFO.value
 
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
@@ -146,13 +146,13 @@ class XcReaderBasic(XcDomain):
                 return val
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_index_info()
-            return db.save(kk, info)
+            return db.save_through(kk, info)
         return
 
     @api_call
     def get_stock_info(self, flag=IOFLAG.READ_XC):
         """"""
-        db = self.facc(TusSdbs.SDB_ASSET_INFO.value, STOCK_INFO_META)
+        db = self.facc(TusSdbs.SDB_ASSET_INFO.value, STOCK_INFO_META, readonly=True)
         kk = TusKeys.STOCK_INFO.value
 
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
@@ -161,7 +161,7 @@ class XcReaderBasic(XcDomain):
                 return val
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_stock_info()
-            return db.save(kk, info)
+            return db.save_through(kk, info)
 
         return
 
@@ -171,7 +171,7 @@ class XcReaderBasic(XcDomain):
 
         :return:
         """
-        db = self.facc(TusSdbs.SDB_ASSET_INFO.value, FUND_INFO_META)
+        db = self.facc(TusSdbs.SDB_ASSET_INFO.value, FUND_INFO_META, readonly=True)
         kk = TusKeys.FUND_INFO.value
 
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
@@ -180,7 +180,7 @@ class XcReaderBasic(XcDomain):
                 return val
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_fund_info()
-            return db.save(kk, info)
+            return db.save_through(kk, info)
 
         return
 
@@ -206,14 +206,14 @@ class XcReaderBasic(XcDomain):
 
         dtkey = dt64_to_strdt(tdday)
 
-        db = self.facc((TusSdbs.SDB_INDEX_WEIGHT.value + index_symbol), INDEX_WEIGHT_META)
+        db = self.facc((TusSdbs.SDB_INDEX_WEIGHT.value + index_symbol), INDEX_WEIGHT_META, readonly=True)
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
             val = db.load(dtkey)
             if val is not None:
                 return val
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_index_weight(index_symbol, tdday)
-            return db.save(dtkey, info)
+            return db.save_through(dtkey, info)
 
         return
 
@@ -226,7 +226,7 @@ class XcReaderBasic(XcDomain):
         描述：获取申万行业分类，包括申万28个一级分类，104个二级分类，227个三级分类的列表信息
         :return:
         """
-        db = self.facc(TusSdbs.SDB_INDEX_CLASSIFY.value, INDEX_CLASSIFY_META)
+        db = self.facc(TusSdbs.SDB_INDEX_CLASSIFY.value, INDEX_CLASSIFY_META, readonly=True)
 
         kk = level.upper()
 
@@ -236,7 +236,7 @@ class XcReaderBasic(XcDomain):
                 return val
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_index_classify(level, src)
-            return db.save(kk, info)
+            return db.save_through(kk, info)
 
         return
 
@@ -247,7 +247,7 @@ class XcReaderBasic(XcDomain):
         :param index_code:
         :return:
         """
-        db = self.facc(TusSdbs.SDB_INDEX_MEMBER.value, INDEX_MEMBER_META)
+        db = self.facc(TusSdbs.SDB_INDEX_MEMBER.value, INDEX_MEMBER_META, readonly=True)
 
         kk = index_code.upper()
 
@@ -257,7 +257,7 @@ class XcReaderBasic(XcDomain):
                 return val
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_index_member(index_code)
-            return db.save(kk, info)
+            return db.save_through(kk, info)
 
         return
 
@@ -273,22 +273,22 @@ class XcReaderBasic(XcDomain):
         if mmdts is None:
             return
 
-        db = self.facc(TusSdbs.SDB_SUSPEND_D.value, SUSPEND_D_META)
-        out = {}
-        for dd in mmdts:
-            dtkey = dt64_to_strdt(dd)
-            if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
-                val = db.load(dtkey, raw_mode=True)
-                if val is not None:
-                    out[dtkey] = val
-                    continue
-            if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
+        db = self.facc(TusSdbs.SDB_SUSPEND_D.value, SUSPEND_D_META, readonly=True)
+        keys = [dt64_to_strdt(dd) for dd in mmdts]
+        if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
+            out = db.load_many(keys, raw_mode=True)
+        else:
+            out = [None] * len(keys)
+        if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
+            # only the missed keys fall through to network
+            for n in [n for n, vv in enumerate(out) if vv is None]:
+                dd, dtkey = mmdts[n], keys[n]
                 ii = self.netloader.set_suspend_d(dd)
-                out[dtkey] = db.save(dtkey, ii, raw_mode=True)
+                out[n] = db.save_through(dtkey, ii, raw_mode=True)
+        # copy out of the read transaction before commit
+        out = np.vstack([vv for vv in out if vv is not None])
         db.commit()
 
-        out = list(out.values())
-        out = np.vstack(out)
         all_out = pd.DataFrame(data=out, columns=SUSPEND_D_META['columns'])
         all_out['suspend_type'] = all_out['suspend_type'].astype(str)
         # all_out['suspend_timing'] = all_out['suspend_timing'].astype(str)
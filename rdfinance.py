@@ -32,7 +32,7 @@ class XcReaderFinance(XcDomain):
         report_date = QUARTER_END(tperiod)
         dtkey = report_date.strftime(DATE_FORMAT)
 
-        db = self.facc((TusSdbs.SDB_STOCK_FIN_INCOME.value + code), STOCK_FIN_INCOME_META)
+        db = self.facc((TusSdbs.SDB_STOCK_FIN_INCOME.value + code), STOCK_FIN_INCOME_META, readonly=True)
         if flag == IOFLAG.READ_DBONLY:
             val = db.load(dtkey)
             return val
@@ -41,11 +41,11 @@ class XcReaderFinance(XcDomain):
             if val is not None:
                 return val
             info = self.netloader.set_income(code, dtkey)
-            val = db.save(dtkey, info)
+            val = db.save_through(dtkey, info)
             return val
         elif flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_income(code, dtkey)
-            val = db.save(dtkey, info)
+            val = db.save_through(dtkey, info)
             return val
         return
 
@@ -55,7 +55,7 @@ class XcReaderFinance(XcDomain):
         report_date = QUARTER_END(tperiod)
         dtkey = report_date.strftime(DATE_FORMAT)
 
-        db = self.facc((TusSdbs.SDB_STOCK_FIN_BALANCE.value + code), STOCK_FIN_BALANCE_META)
+        db = self.facc((TusSdbs.SDB_STOCK_FIN_BALANCE.value + code), STOCK_FIN_BALANCE_META, readonly=True)
         if flag == IOFLAG.READ_DBONLY:
             val = db.load(dtkey)
             return val
@@ -64,11 +64,11 @@ class XcReaderFinance(XcDomain):
             if val is not None:
                 return val
             info = self.netloader.set_balancesheet(code, dtkey)
-            val = db.save(dtkey, info)
+            val = db.save_through(dtkey, info)
             return val
         elif flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_balancesheet(code, dtkey)
-            val = db.save(dtkey, info)
+            val = db.save_through(dtkey, info)
             return val
         return
 
@@ -78,7 +78,7 @@ class XcReaderFinance(XcDomain):
         report_date = QUARTER_END(tperiod)
         dtkey = report_date.strftime(DATE_FORMAT)
 
-        db = self.facc((TusSdbs.SDB_STOCK_FIN_CASHFLOW.value + code), STOCK_FIN_CASHFLOW_META)
+        db = self.facc((TusSdbs.SDB_STOCK_FIN_CASHFLOW.value + code), STOCK_FIN_CASHFLOW_META, readonly=True)
         if flag == IOFLAG.READ_DBONLY:
             val = db.load(dtkey)
             return val
@@ -87,11 +87,11 @@ class XcReaderFinance(XcDomain):
             if val is not None:
                 return val
             info = self.netloader.set_cashflow(code, dtkey)
-            val = db.save(dtkey, info)
+            val = db.save_through(dtkey, info)
             return val
         elif flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_cashflow(code, dtkey)
-            val = db.save(dtkey, info)
+            val = db.save_through(dtkey, info)
             return val
         return
 
@@ -110,7 +110,7 @@ class XcReaderFinance(XcDomain):
         dtkey = report_date.strftime(DATE_FORMAT)
 
         db = self.facc((TusSdbs.SDB_STOCK_FIN_INDICATOR.value + code),
-                       STOCK_FIN_INDICATOR_META)
+                       STOCK_FIN_INDICATOR_META, readonly=True)
         if flag == IOFLAG.READ_DBONLY:
             val = db.load(dtkey)
             return val
@@ -119,10 +119,10 @@ class XcReaderFinance(XcDomain):
             if val is not None:
                 return val
             info = self.netloader.set_fina_indicator(code, dtkey)
-            val = db.save(dtkey, info)
+            val = db.save_through(dtkey, info)
             return val
         elif flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_fina_indicator(code, dtkey)
-            val = db.save(dtkey, info)
+            val = db.save_through(dtkey, info)
             return val
         return
@@ -2,12 +2,21 @@
 行情数据，每日更新
 """
 
+import os
+import time
+from functools import partial
+
 from .apiwrapper import api_call
 from .proloader import TusNetLoader
 from .layout import *
+from .panel import PANEL_DATASETS, XcPanel, panel_files
+from .mploader import load_universe
+from .utils.paths import ensure_directory
 from .utils.xcutils import *
 # from .utils.memoize import lazyval
 from .xcdb.xcdb import *
+from .xcdb.chunkcache import result_cache
+from .xcdb.singleflight import single_flight
 from .domain import XcDomain
 
 
@@ -23,10 +32,140 @@ class XcReaderPrice(XcDomain):
     def __init__(self):
         super(XcReaderPrice, self).__init__()
 
+    def _read_chunks(self, sdb, meta, keys, spans, flag, fields, fetch, copy=True):
+        """
+        rows of the chunks, through the result cache(see xcdb/chunkcache.py):
+        the rows of the widest range read so far are kept, a sub-range is served as a slice of them, a wider range
+        only reads the chunks out of the cached rows.
+        :param sdb: sub-database path
+        :param meta:
+        :param keys: chunk keys, str
+        :param spans: [start, end) positions of the chunks in the calendar(trade_cal, trade_cal_1min, ...), contiguous.
+        :param flag:
+        :param fields: None for all columns
+        :param fetch: fetch(idx), DataFrames of [keys[n] for n in idx] from network, see _fetch_runs.
+        :param copy: False to return the cached rows without copy(readonly), the caller must not modify them.
+        :return: ndarray of rows [spans[0][0], spans[-1][1])
+        :raise ChunkMissingError: if chunks are not stored, read with IOFLAG.READ_DBONLY
+        """
+        cols = meta['columns'] if fields is None else fields
+        lo, hi = spans[0][0], spans[-1][1]
+        cache = result_cache()
+        ckey = (self.master_db.name, sdb, tuple(cols))
+        gen = cache.generation
+        entry = None if flag == IOFLAG.READ_NETDB else cache.get(ckey)
+        if entry is not None:
+            p0, rows = entry
+            if p0 <= lo and hi <= p0 + len(rows):
+                return rows[lo - p0:hi - p0].copy() if copy else rows[lo - p0:hi - p0]
+            if hi < p0 or lo > p0 + len(rows):
+                # not contiguous with the cached rows
+                entry = None
+        if entry is None:
+            todo = list(range(len(keys)))
+        else:
+            todo = [n for n, (ss, ee) in enumerate(spans) if ss < p0 or ee > p0 + len(rows)]
+
+        db = self.facc(sdb, meta, readonly=True)
+        db.check_chunk()
+        fidx = db.field_index(cols)
+        tkeys = [keys[n] for n in todo]
+        if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
+            vals = db.load_many(tkeys, raw_mode=True, fields=fields)
+        else:
+            vals = [None] * len(tkeys)
+        if flag == IOFLAG.READ_DBONLY and any(vv is None for vv in vals):
+            db.commit()
+            raise ChunkMissingError('{}: {} chunks not stored, e.g. {}'.format(
+                sdb, sum(vv is None for vv in vals), next(kk for kk, vv in zip(tkeys, vals) if vv is None)))
+        if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
+            # only the missed keys fall through to network
+            miss = [m for m, vv in enumerate(vals) if vv is None]
+            for m, vv in zip(miss, self._fetch_through(db, sdb, [tkeys[m] for m in miss],
+                                                       lambda idx: fetch([todo[miss[i]] for i in idx]))):
+                vals[m] = vv[:, fidx]
+
+        parts = dict(zip(todo, vals))
+        complete = all(vv is not None and len(vv) == spans[n][1] - spans[n][0] for n, vv in parts.items())
+        if complete and entry is not None:
+            # extend the cached rows
+            head = [parts[n] for n in todo if spans[n][0] < p0]
+            tail = [parts[n] for n in todo if spans[n][0] >= p0]
+            rows = np.vstack(head + [rows] + tail)
+            p0 = min(p0, lo)
+        else:
+            if entry is not None:
+                parts.update({n: rows[ss - p0:ee - p0] for n, (ss, ee) in enumerate(spans) if n not in parts})
+            rows = np.vstack([parts[n] for n in range(len(keys)) if parts[n] is not None])
+            p0 = lo
+        db.commit()
+        if complete:
+            rows.flags.writeable = False
+            cache.put(ckey, (p0, rows), gen)
+            if copy:
+                return rows[lo - p0:hi - p0].copy()
+        return rows[lo - p0:hi - p0]
+
+    def _fetch_through(self, db, sdb, keys, fetch):
+        """
+        fetch the missed chunks from network and save them by facc in one write transaction(queued to the writer
+        thread of the updater in write-behind mode), readers missing the same chunks at the same time share one fetch,
+        see xcdb/singleflight.py
+        :param db: readonly accessor of sdb
+        :param sdb: sub-database path
+        :param keys: missed chunk keys
+        :param fetch: fetch(idx), DataFrames of [keys[n] for n in idx]
+        :return: saved values(all columns) of keys
+        """
+        if not keys:
+            return []
+
+        def _save(idx):
+            wdb = self.facc(sdb, db.metadata)
+            vals = wdb.save_many([(keys[n], vv) for n, vv in zip(idx, fetch(idx))], raw_mode=True)
+            wdb.commit()
+            return vals
+
+        return single_flight().run(sdb, keys, _save)
+
+    @staticmethod
+    def _fetch_runs(mmdts, idx, max_units, load, split):
+        """
+        plan the requests of the missed chunks like the updater: each contiguous run of them is loaded in one request
+        of at most max_units chunks(see nadata_iter), then split into chunks.
+        :param mmdts: chunk dates
+        :param idx: positions of the missed chunks in mmdts
+        :param max_units: chunks of a request, by the row limit of the api
+        :param load: load(first chunk date, last chunk date), DataFrame indexed by time, None if no data.
+        :param split: split(data, chunk date), DataFrame of the chunk, data is None if no data.
+        :return: DataFrames of the chunks of idx
+        """
+        flags = np.ones(len(mmdts), dtype=bool)
+        flags[idx] = False
+        out = {}
+        need_update = nadata_iter(flags, max_units)
+        while True:
+            tstart, tend = next(need_update)
+            if tstart is None:
+                break
+            data = load(mmdts[tstart], mmdts[tend])
+            for n in range(tstart, tend + 1):
+                out[n] = split(data, mmdts[n])
+        return [out[n] for n in idx]
+
+    def _split_days(self, data, dd, meta):
+        """
+        split of _fetch_runs, rows of the trading days of the chunk.
+        """
+        dayindex = self.gen_dindex_chunk(dd, dd, meta['chunk'])
+        if data is None:
+            return pd.DataFrame(index=dayindex, columns=meta['columns'], dtype='f8')
+        return data.reindex(index=dayindex)
+
     @api_call
     def get_price_daily(self, code, start: [str or pd.Timestamp or np.datetime64],
                         end: [str or pd.Timestamp or np.datetime64],
-                        astype='E', flag=IOFLAG.READ_XC):
+                        astype='E', flag=IOFLAG.READ_XC, fields=None, copy=True):
         """
         按月存取股票的日线数据
         1. 如当月停牌无交易，则存入空数据(或0)
@@ -42,48 +181,44 @@ class XcReaderPrice(XcDomain):
         :param end:
         :param astype:
         :param flag:
+        :param fields: columns to read, None for all columns of EQUITY_DAILY_PRICE_META
+        :param copy: False to share the cached rows(zero copy), the values of the DataFrame are readonly then.
         :return:
         """
         if astype is None:
             astype = self.asset_type(code)
 
-        mmdts = self.gen_keys_monthly(start, end, code, astype)
+        chunk = EQUITY_DAILY_PRICE_META['chunk']
+        mmdts = self.gen_keys_chunk(start, end, code, astype, chunk)
         if mmdts is None:
             return
 
-        db = self.facc(TusSdbs.SDB_DAILY_PRICE.value + code, EQUITY_DAILY_PRICE_META)
-        out = {}
-        for dd in mmdts:
-            dtkey = dt64_to_strdt(dd)
-            if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
-                val = db.load(dtkey, raw_mode=True)
-                if val is not None:
-                    out[dtkey] = val
-                    continue
-            if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
-                ii = self.netloader.set_price_daily(code, MONTH_START(dd), MONTH_END(dd), astype)
-                dayindex = self.gen_dindex_monthly(dd, dd)
-                if ii is None:
-                    ii = pd.DataFrame(index=dayindex, columns=EQUITY_DAILY_PRICE_META['columns'], dtype='f8')
-                else:
-                    ii = ii.set_index('trade_date', drop=True)
-                    ii.index = pd.to_datetime(ii.index, format=DATE_FORMAT)
-                    ii = ii.reindex(index=dayindex)
-                out[dtkey] = db.save(dtkey, ii, raw_mode=True)
-
-        db.commit()
+        cols = EQUITY_DAILY_PRICE_META['columns'] if fields is None else fields
+        keys = [dt64_to_strdt(dd) for dd in mmdts]
+        spans = [self.chunk_pos(dd, chunk) for dd in mmdts]
 
-        out = list(out.values())
-        out = np.vstack(out)
-        all_out = pd.DataFrame(data=out, columns=EQUITY_DAILY_PRICE_META['columns'])
+        def load(d0, d1):
+            ii = self.netloader.set_price_daily(code, CHUNK_START(d0, chunk), CHUNK_END(d1, chunk), astype)
+            if ii is None:
+                return None
+            ii = ii.set_index('trade_date', drop=True)
+            ii.index = pd.to_datetime(ii.index, format=DATE_FORMAT)
+            return ii
 
-        alldays = self.gen_dindex_monthly(mmdts[0], mmdts[-1])
-        all_out = all_out.set_index(alldays)
+        # 每次最大获取5000条记录
+        max_units = 4700 // XTUS_CHUNK_DAYS[chunk]
+        fetch = partial(self._fetch_runs, mmdts, max_units=max_units, load=load,
+                        split=partial(self._split_days, meta=EQUITY_DAILY_PRICE_META))
+        out = self._read_chunks(TusSdbs.SDB_DAILY_PRICE.value + code, EQUITY_DAILY_PRICE_META, keys, spans, flag,
+                                fields, fetch, copy)
+        alldays = self.trade_cal[spans[0][0]:spans[-1][1]]
+        all_out = pd.DataFrame(data=out, index=alldays, columns=cols)
         # all_out = all_out[(all_out.index >= tstart) & (all_out.index <= tend)]
         return all_out
 
     @api_call
-    def get_price_minute(self, code, start, end, freq='5min', astype='E', flag=IOFLAG.READ_XC):
+    def get_price_minute(self, code, start, end, freq='5min', astype='E', flag=IOFLAG.READ_XC, fields=None,
+                         copy=True):
         """
         按日存取股票的分钟线数据
         Note: 停牌时，pro_bar对于分钟K线，仍然能取到数据，返回的OHLC是pre_close值， vol值为0.
@@ -103,6 +238,8 @@ class XcReaderPrice(XcDomain):
         :param freq:
         :param astype: asset type. 'E' for stock, 'I' for index, 'FD' for fund.
         :param flag:
+        :param fields: columns to read, None for all columns of EQUITY_MINUTE_PRICE_META
+        :param copy: False to share the cached rows(zero copy), the values of the DataFrame are readonly then.
         :return:
         """
         if freq not in XTUS_FREQS:
@@ -111,35 +248,36 @@ class XcReaderPrice(XcDomain):
         if mmdts is None:
             return
 
-        db = self.facc((TusSdbs.SDB_MINUTE_PRICE.value + code + freq), EQUITY_MINUTE_PRICE_META)
-        out = {}
-        for dd in mmdts:
-            dtkey = dt64_to_strdt(dd)
-            if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
-                val = db.load(dtkey, raw_mode=True)
-                if val is not None:
-                    out[dtkey] = val
-                    continue
-            if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
-                ii = self.netloader.set_price_minute(code, dd, dd, freq, astype)
-                minindex = self.gen_mindex_daily(dd, dd, freq)
-                if ii is None:
-                    ii = pd.DataFrame(index=minindex, columns=EQUITY_MINUTE_PRICE_META['columns'], dtype='f8')
-                else:
-                    ii = ii.set_index('trade_time', drop=True)
-                    ii.index = pd.to_datetime(ii.index, format=DATETIME_FORMAT)
-                    ii = ii.reindex(index=minindex)
-                    if (ii.volume == 0.0).all():
-                        # 如果全天无交易，vol == 0, 则清空df.
-                        ii.loc[:, :] = np.nan
-                out[dtkey] = db.save(dtkey, ii, raw_mode=True)
-        db.commit()
+        cols = EQUITY_MINUTE_PRICE_META['columns'] if fields is None else fields
+        keys = [dt64_to_strdt(dd) for dd in mmdts]
+        bars = XTUS_FREQ_BARS[freq]
+        spans = [(pos * bars, (pos + 1) * bars) for pos in (self.day_pos(dd) for dd in mmdts)]
 
-        out = list(out.values())
-        out = np.vstack(out)
-        all_out = pd.DataFrame(data=out, columns=EQUITY_MINUTE_PRICE_META['columns'])
-        allmins = self.gen_mindex_daily(mmdts[0], mmdts[-1], freq)
-        all_out = all_out.set_index(allmins)
+        def load(d0, d1):
+            ii = self.netloader.set_price_minute(code, d0, d1, freq, astype)
+            if ii is None:
+                return None
+            ii = ii.set_index('trade_time', drop=True)
+            ii.index = pd.to_datetime(ii.index, format=DATETIME_FORMAT)
+            return ii
+
+        def split(data, dd):
+            minindex = self.gen_mindex_daily(dd, dd, freq)
+            if data is None:
+                return pd.DataFrame(index=minindex, columns=EQUITY_MINUTE_PRICE_META['columns'], dtype='f8')
+            ii = data.reindex(index=minindex)
+            if (ii.volume == 0.0).all():
+                # 如果全天无交易，vol == 0, 则清空df.
+                ii.loc[:, :] = np.nan
+            return ii
+
+        # 每次最大获取8000条记录
+        max_units = 6000 // (bars + 1)
+        fetch = partial(self._fetch_runs, mmdts, max_units=max_units, load=load, split=split)
+        out = self._read_chunks(TusSdbs.SDB_MINUTE_PRICE.value + code + freq, EQUITY_MINUTE_PRICE_META, keys, spans,
+                                flag, fields, fetch, copy)
+        allmins = self.freq_to_cal(freq)[spans[0][0]:spans[-1][1]]
+        all_out = pd.DataFrame(data=out, index=allmins, columns=cols)
 
         # if resample:
         #     periods = cc[freq]
@@ -158,48 +296,229 @@ class XcReaderPrice(XcDomain):
         return all_out
 
     @api_call
-    def get_stock_daily_info(self, code, start, end, flag=IOFLAG.READ_XC):
+    def get_stock_daily_info(self, code, start, end, flag=IOFLAG.READ_XC, fields=None, copy=True):
         """
         Get stock daily information.
         :param code:
         :param start:
         :param end:
+        :param fields: columns to read, None for all columns of STOCK_DAILY_INFO_META
+        :param copy: False to share the cached rows(zero copy), the values of the DataFrame are readonly then.
         :return:
         """
-        mmdts = self.gen_keys_monthly(start, end, code, 'E')
+        chunk = STOCK_DAILY_INFO_META['chunk']
+        mmdts = self.gen_keys_chunk(start, end, code, 'E', chunk)
         if mmdts is None:
             return
 
-        db = self.facc(TusSdbs.SDB_STOCK_DAILY_INFO.value + code, STOCK_DAILY_INFO_META)
-        out = {}
-        for dd in mmdts:
-            dtkey = dt64_to_strdt(dd)
-            if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
-                val = db.load(dtkey, raw_mode=True)
-                if val is not None:
-                    out[dtkey] = val
-                    continue
-            if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
-                ii = self.netloader.set_stock_daily_info(code, MONTH_START(dd), MONTH_END(dd))
-                dayindex = self.gen_dindex_monthly(dd, dd)
-                if ii is None:
-                    ii = pd.DataFrame(index=dayindex, columns=STOCK_DAILY_INFO_META['columns'], dtype='f8')
-                else:
-                    ii = ii.set_index('trade_date', drop=True)
-                    ii.index = pd.to_datetime(ii.index, format=DATE_FORMAT)
-                    ii = ii.reindex(index=dayindex)
-                out[dtkey] = db.save(dtkey, ii, raw_mode=True)
+        cols = STOCK_DAILY_INFO_META['columns'] if fields is None else fields
+        keys = [dt64_to_strdt(dd) for dd in mmdts]
+        spans = [self.chunk_pos(dd, chunk) for dd in mmdts]
 
-        db.commit()
-        out = list(out.values())
-        out = np.concatenate(out)
+        def load(d0, d1):
+            ii = self.netloader.set_stock_daily_info(code, CHUNK_START(d0, chunk), CHUNK_END(d1, chunk))
+            if ii is None:
+                return None
+            ii = ii.set_index('trade_date', drop=True)
+            ii.index = pd.to_datetime(ii.index, format=DATE_FORMAT)
+            return ii
 
-        all_out = pd.DataFrame(data=out, columns=STOCK_DAILY_INFO_META['columns'])
-        alldays = self.gen_dindex_monthly(mmdts[0], mmdts[-1])
-        all_out = all_out.set_index(alldays)
+        # 每次最大获取5000条记录
+        max_units = 4700 // XTUS_CHUNK_DAYS[chunk]
+        fetch = partial(self._fetch_runs, mmdts, max_units=max_units, load=load,
+                        split=partial(self._split_days, meta=STOCK_DAILY_INFO_META))
+        out = self._read_chunks(TusSdbs.SDB_STOCK_DAILY_INFO.value + code, STOCK_DAILY_INFO_META, keys, spans, flag,
+                                fields, fetch, copy)
+        alldays = self.trade_cal[spans[0][0]:spans[-1][1]]
+        all_out = pd.DataFrame(data=out, index=alldays, columns=cols)
         # all_out = all_out[(all_out.index >= tstart) & (all_out.index <= tend)]
         return all_out
 
+    @api_call
+    def get_cross_section(self, date, fields=None):
+        """
+        所有股票某一交易日的日线数据(截面)，从按日期存储的截面数据库读取，只需一次读取。
+        截面数据由updater(update_cross_section)从按股票存储的日线数据生成，不从网络下载。
+        :param date: trading date
+        :param fields: columns to read, None for all columns of XSECTION_DAILY_META
+        :return: DataFrame, index is ts_code, None if the cross section is not built.
+        """
+        dtkey = dt64_to_strdt(strdt_to_dt64(date))
+        db = self.facc(TusSdbs.SDB_XSECTION_CODES.value, XSECTION_CODES_META, readonly=True)
+        codes = db.load(dtkey)
+        db.commit()
+        if codes is None:
+            return None
+
+        cols = XSECTION_DAILY_META['columns'] if fields is None else fields
+        db = self.facc(TusSdbs.SDB_XSECTION_DAILY.value, XSECTION_DAILY_META, readonly=True)
+        val = db.load(dtkey, raw_mode=True, fields=cols)
+        if val is not None:
+            # copy out of the read transaction before commit
+            val = np.array(val)
+        db.commit()
+        if val is None:
+            return None
+        return pd.DataFrame(data=val, index=pd.Index(codes, name='ts_code'), columns=cols)
+
+    @api_call
+    def export_panel(self, dataset, start, end, path, codes=None):
+        """
+        从缓存数据库导出(交易日 x 股票 x 字段)的稠密面板数据文件, 用panel.load_panel以mmap方式读取, 见panel.py
+        只读取数据库, 不从网络下载, 需先更新数据.
+        :param dataset: 'daily_price', 'adj_factor', 'daily_info'
+        :param start:
+        :param end:
+        :param path: directory of the panel files
+        :param codes: default all stocks of stock_info
+        :return: file path of the panel data, None if no trading days.
+        """
+        sdb, meta = PANEL_DATASETS[dataset]
+        if codes is None:
+            codes = self.stock_info.index
+        codes = np.array(codes, dtype='U9')
+        cols = meta['columns']
+        plan = self._panel_dates(meta, start, end)
+        if plan is None:
+            return None
+        mmdts, offsets, dates = plan
+
+        ensure_directory(path)
+        old = panel_files(path, dataset)['all_data']
+        files = panel_files(path, dataset, '{:d}'.format(int(time.time() * 1e6)))
+        data = np.lib.format.open_memmap(files['data'], mode='w+', dtype='f8',
+                                         shape=(len(dates), len(codes), len(cols)))
+        data[:] = np.nan
+        self._fill_panel(data, sdb.value, meta, codes, mmdts, offsets)
+        data.flush()
+        del data
+
+        # the index is replaced at last, it switches the readers to the new data file in one step,
+        # workers mapping the old file keep their view.
+        tmpfile = files['index'] + '.tmp.npz'
+        np.savez(tmpfile, dates=dates, codes=codes, fields=np.array(cols), data=os.path.basename(files['data']))
+        os.replace(tmpfile, files['index'])
+        # keep the data file of the previous export for readers which just read the old index
+        for ff in old[:-1]:
+            try:
+                os.remove(ff)
+            except OSError:
+                pass
+        return files['data']
+
+    def _panel_dates(self, meta, start, end):
+        """
+        trading days of [start, end] and the chunks covering them.
+        :param meta: META of the dataset
+        :param start:
+        :param end:
+        :return: chunk keys, [start, end) offsets of the chunks in dates(may exceed the dates at head and tail), dates.
+                None if no trading days.
+        """
+        chunk = meta['chunk']
+        mmdts = self.gen_keys_chunk(start, end, None, None, chunk)
+        if mmdts is None:
+            return None
+        # chunks cover whole months/years, only keep [start, end]
+        alldays = self.gen_dindex_chunk(mmdts[0], mmdts[-1], chunk)
+        lo = np.searchsorted(alldays, strdt_to_dt64(start))
+        hi = np.searchsorted(alldays, strdt_to_dt64(end), side='right')
+        if lo >= hi:
+            return None
+        base = self.chunk_pos(mmdts[0], chunk)[0] + lo
+        offsets = [(ss - base, ee - base) for ss, ee in (self.chunk_pos(dd, chunk) for dd in mmdts)]
+        return mmdts, offsets, alldays[lo:hi].astype('M8[D]')
+
+    def _fill_panel(self, out, sdb, meta, codes, mmdts, offsets, fields=None):
+        """
+        read chunks of the codes in one read transaction, write them to out[day, code, field].
+        :param out: 3D ndarray, filled with NaN
+        :param sdb: sub-database prefix
+        :param meta:
+        :param codes:
+        :param mmdts: chunk keys, see _panel_dates
+        :param offsets:
+        :param fields: None for all columns
+        :return:
+        """
+        keys = [dt64_to_strdt(dd) for dd in mmdts]
+        ndays = out.shape[0]
+        db = None
+        for n, code in enumerate(codes):
+            if db is None:
+                db = self.facc(sdb + code, meta, readonly=True)
+            elif not db.select(sdb + code):
+                continue
+            for (ss, ee), val in zip(offsets, db.load_many(keys, raw_mode=True, fields=fields)):
+                if val is None or len(val) != ee - ss:
+                    continue
+                vs, ve = max(ss, 0), min(ee, ndays)
+                if vs < ve:
+                    out[vs:ve, n, :] = val[vs - ss:ve - ss]
+        if db is not None:
+            db.commit()
+
+    def _read_panel(self, sdb, meta, codes, start, end, fields=None, astype='E'):
+        """
+        :return: XcPanel, None if no trading days.
+        """
+        if codes is None:
+            codes = {'E': self.stock_info, 'I': self.index_info, 'FD': self.fund_info}[astype].index
+        codes = np.array(codes, dtype='U9')
+        cols = meta['columns'] if fields is None else fields
+        plan = self._panel_dates(meta, start, end)
+        if plan is None:
+            return None
+        mmdts, offsets, dates = plan
+        data = np.full((len(dates), len(codes), len(cols)), np.nan)
+        self._fill_panel(data, sdb, meta, codes, mmdts, offsets, fields)
+        return XcPanel(data, dates, codes, cols)
+
+    @api_call
+    def get_price_daily_panel(self, codes, start, end, fields=None, astype='E'):
+        """
+        多个股票的日线数据面板(交易日 x 股票 x 字段)，一次读事务读取所有股票，直接写入预分配的数组。
+        只读取数据库, 不从网络下载, 需先更新数据.
+        :param codes: None for all codes of astype
+        :param start:
+        :param end:
+        :param fields: columns to read, None for all columns of EQUITY_DAILY_PRICE_META
+        :param astype: 'E', 'I', 'FD'
+        :return: XcPanel, data aligned to trade_cal, NaN if no data. None if no trading days.
+        """
+        return self._read_panel(TusSdbs.SDB_DAILY_PRICE.value, EQUITY_DAILY_PRICE_META, codes, start, end, fields,
+                                astype)
+
+    @api_call
+    def get_stock_daily_info_panel(self, codes, start, end, fields=None):
+        """
+        多个股票的DailyInfo面板, 见get_price_daily_panel
+        """
+        return self._read_panel(TusSdbs.SDB_STOCK_DAILY_INFO.value, STOCK_DAILY_INFO_META, codes, start, end, fields)
+
+    @api_call
+    def get_stock_adjfactor_panel(self, codes, start, end):
+        """
+        多个股票的复权因子面板, 见get_price_daily_panel
+        """
+        return self._read_panel(TusSdbs.SDB_STOCK_ADJFACTOR.value, STOCK_ADJFACTOR_META, codes, start, end)
+
+    @api_call
+    def get_price_universe(self, codes, start, end, freq='1D', fields=None, astype='E', workers=None):
+        """
+        多个股票的日线/分钟线面板(时间 x 股票 x 字段)，由多个进程分片读取，写入共享内存, 见mploader.py
+        只读取数据库, 不从网络下载, 需先更新数据.
+        :param codes: None for all codes of astype
+        :param start:
+        :param end:
+        :param freq: '1D' or minute freq of XTUS_FREQS
+        :param fields: columns to read, None for all columns of the META
+        :param astype: 'E', 'I', 'FD'
+        :param workers: number of processes, default cpu count.
+        :return: XcPanel, NaN if no data. None if no trading days. codes failed to read are listed in panel.failed
+        """
+        return load_universe(self, codes, start, end, freq, fields, astype, workers)
+
     @api_call
     def get_stock_adjfactor(self, code, start: str, end: str, flag=IOFLAG.READ_XC):
         """
@@ -213,35 +532,42 @@ class XcReaderPrice(XcDomain):
         :param end:
         :return:
         """
-        mmdts = self.gen_keys_monthly(start, end, code, 'E')
+        chunk = STOCK_ADJFACTOR_META['chunk']
+        mmdts = self.gen_keys_chunk(start, end, code, 'E', chunk)
         if mmdts is None:
             return
 
-        db = self.facc(TusSdbs.SDB_STOCK_ADJFACTOR.value + code, STOCK_ADJFACTOR_META)
-        out = {}
-        for dd in mmdts:
-            dtkey = dt64_to_strdt(dd)
-            if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
-                val = db.load(dtkey, raw_mode=True)
-                if val is not None:
-                    out[dtkey] = val
-                    continue
-            if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
-                ii = self.netloader.set_stock_adjfactor(code, MONTH_START(dd), MONTH_END(dd))
-                dayindex = self.gen_dindex_monthly(dd, dd)
+        sdb = TusSdbs.SDB_STOCK_ADJFACTOR.value + code
+        db = self.facc(sdb, STOCK_ADJFACTOR_META, readonly=True)
+        keys = [dt64_to_strdt(dd) for dd in mmdts]
+        if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
+            out = db.load_many(keys, raw_mode=True)
+        else:
+            out = [None] * len(keys)
+        if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
+            # only the missed keys fall through to network
+            miss = [n for n, vv in enumerate(out) if vv is None]
+
+            def load(d0, d1):
+                ii = self.netloader.set_stock_adjfactor(code, CHUNK_START(d0, chunk), CHUNK_END(d1, chunk))
                 if ii is None:
-                    ii = pd.DataFrame(index=dayindex, columns=STOCK_ADJFACTOR_META['columns'], dtype='f8')
-                else:
-                    ii = ii.set_index('trade_date', drop=True)
-                    ii.index = pd.to_datetime(ii.index, format=DATE_FORMAT)
-                    ii = ii.reindex(index=dayindex)
-                out[dtkey] = db.save(dtkey, ii, raw_mode=True)
+                    return None
+                ii = ii.set_index('trade_date', drop=True)
+                ii.index = pd.to_datetime(ii.index, format=DATE_FORMAT)
+                return ii
+
+            # 每次最大获取5000条记录
+            max_units = 4000 // XTUS_CHUNK_DAYS[chunk]
+            split = partial(self._split_days, meta=STOCK_ADJFACTOR_META)
+            fetch = partial(self._fetch_runs, mmdts, max_units=max_units, load=load, split=split)
+            for n, vv in zip(miss, self._fetch_through(db, sdb, [keys[n] for n in miss],
+                                                       lambda idx: fetch([miss[i] for i in idx]))):
+                out[n] = vv
+        out = np.concatenate([vv for vv in out if vv is not None])
         db.commit()
-        out = list(out.values())
-        out = np.concatenate(out)
         all_out = pd.DataFrame(data=out, columns=STOCK_ADJFACTOR_META['columns'])
 
-        alldays = self.gen_dindex_monthly(mmdts[0], mmdts[-1])
+        alldays = self.gen_dindex_chunk(mmdts[0], mmdts[-1], chunk)
         all_out = all_out.set_index(alldays)
         # all_out = all_out[(all_out.index >= tstart) & (all_out.index <= tend)]
         return all_out
@@ -253,7 +579,7 @@ class XcReaderPrice(XcDomain):
         :param code:
         :return:
         """
-        db = self.facc(TusSdbs.SDB_STOCK_XDXR.value, STOCK_XDXR_META)
+        db = self.facc(TusSdbs.SDB_STOCK_XDXR.value, STOCK_XDXR_META, readonly=True)
 
         kk = code
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
@@ -264,7 +590,7 @@ class XcReaderPrice(XcDomain):
             log.info('!!! xdxr info not exist, please use updater to download it first.')
             info = self.netloader.set_stock_xdxr(code)
             if info is not None:
-                val = db.save(kk, info)
+                val = db.save_through(kk, info)
                 return val
         return
 
@@ -276,7 +602,7 @@ class XcReaderPrice(XcDomain):
         :param code:
         :return:
         """
-        db = self.facc(TusSdbs.SDB_STOCK_SUSPEND.value, STOCK_SUSPEND_META)
+        db = self.facc(TusSdbs.SDB_STOCK_SUSPEND.value, STOCK_SUSPEND_META, readonly=True)
 
         kk = code
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_DBONLY:
@@ -287,6 +613,6 @@ class XcReaderPrice(XcDomain):
         if flag == IOFLAG.READ_XC or flag == IOFLAG.READ_NETDB:
             info = self.netloader.set_stock_suspend(code)
             if info is not None:
-                return db.save(kk, info)
+                return db.save_through(kk, info)
 
         return
@@ -0,0 +1,65 @@
+"""
+Benchmark of value codecs: size versus decode speed on synthetic price data.
+    python -m boost_tushare.tests.bench_codec
+"""
+import pickle
+import timeit
+
+import numpy as np
+
+from boost_tushare.xcdb.codec import *
+from boost_tushare.layout import OHLCV_FIXED_POINT
+
+
+def synthetic_price(nbars, seed=0):
+    """
+    OHLCV block like EQUITY_DAILY_PRICE_META/EQUITY_MINUTE_PRICE_META, f8, price quoted to 0.01.
+    """
+    rs = np.random.RandomState(seed)
+    close = np.round(10.0 * np.exp(np.cumsum(rs.normal(0, 0.002, nbars))), 2)
+    open_ = np.round(close * (1 + rs.normal(0, 0.001, nbars)), 2)
+    high = np.round(np.maximum(open_, close) + rs.uniform(0, 0.05, nbars), 2)
+    low = np.round(np.minimum(open_, close) - rs.uniform(0, 0.05, nbars), 2)
+    volume = np.round(rs.lognormal(8, 1, nbars))
+    amount = np.round(volume * close * 100 / 1000, 3)
+    out = np.column_stack([open_, high, low, close, volume, amount]).astype('f8')
+    out[rs.uniform(size=nbars) < 0.02, :] = np.nan  # suspended bars
+    return out
+
+
+CODECS = [
+    ('pickle', None),
+    ('raw', dict()),
+    ('zlib', dict(compress=COMPRESS.CP_ZLIB)),
+    ('zlib+shuffle', dict(compress=COMPRESS.CP_ZLIB, shuffle=True)),
+    ('lzma', dict(compress=COMPRESS.CP_LZMA)),
+    ('lzma+shuffle', dict(compress=COMPRESS.CP_LZMA, shuffle=True)),
+    ('fixed', dict(fixed=OHLCV_FIXED_POINT)),
+    ('fixed+zlib', dict(compress=COMPRESS.CP_ZLIB, fixed=OHLCV_FIXED_POINT)),
+]
+
+
+def bench(name, data, number=200):
+    print('{}: shape={}, raw size={}B'.format(name, data.shape, data.nbytes))
+    print('{:<14}{:>10}{:>8}{:>14}{:>14}'.format('codec', 'size(B)', 'ratio', 'encode(us)', 'decode(us)'))
+    for cname, kwargs in CODECS:
+        if kwargs is None:
+            enc = lambda: pickle.dumps(data)
+            dec = pickle.loads
+        else:
+            enc = lambda: pack_array(data, **kwargs)
+            dec = unpack_value
+        buf = enc()
+        np.testing.assert_array_equal(dec(buf), data)
+        t_enc = timeit.Timer(enc).timeit(number) / number * 1e6
+        t_dec = timeit.Timer(lambda: dec(buf)).timeit(number) / number * 1e6
+        print('{:<14}{:>10}{:>8.2f}{:>14.1f}{:>14.1f}'.format(
+            cname, len(buf), data.nbytes / len(buf), t_enc, t_dec))
+    print()
+
+
+if __name__ == '__main__':
+    bench('daily price, one month', synthetic_price(23))
+    bench('daily price, one year', synthetic_price(244))
+    bench('minute price 5min, one day', synthetic_price(48))
+    bench('minute price 1min, one day', synthetic_price(240))
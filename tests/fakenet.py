@@ -0,0 +1,100 @@
+"""
+offline netloader of the tests: synthetic trade_cal, stock/index/fund info, suspensions and bars, values are a
+function of the date(time) so any range request returns the same rows for a day.
+"""
+import sys
+import tempfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from boost_tushare.layout import *
+from boost_tushare.xcdb.chunkcache import chunk_cache, result_cache
+from boost_tushare.utils.xcutils import DATE_FORMAT, DATETIME_FORMAT, session_day_to_min_tus
+
+# business days of 2018-2020 without the national day holidays
+DAYS = pd.bdate_range('20180101', '20201231')
+DAYS = DAYS[~((DAYS.month == 10) & (DAYS.day <= 7))]
+LAST_DAY = pd.Timestamp('20201231')
+# (code, day) suspended the whole day
+SUSPENDED = [('000001.SZ', pd.Timestamp('20190312'))]
+
+
+class FakeNetLoader(object):
+    def __init__(self):
+        self.calls = []
+
+    def set_trade_cal(self):
+        return pd.Series([dd.strftime(DATE_FORMAT) for dd in DAYS])
+
+    def set_index_info(self):
+        return pd.DataFrame({'ts_code': ['000001.SH'], 'name': ['SH'], 'list_date': ['19910715'],
+                             'exp_date': ['21000101']})
+
+    def set_stock_info(self):
+        return pd.DataFrame({'ts_code': ['000001.SZ', '000002.SZ'], 'name': ['a', 'b'],
+                             'list_date': ['19910403', '20190315'], 'delist_date': ['21000101', '21000101'],
+                             'list_status': ['L', 'L']})
+
+    def set_fund_info(self):
+        return pd.DataFrame({'ts_code': ['510300.SH'], 'name': ['f'], 'list_date': ['20120101'],
+                             'delist_date': ['21000101']})
+
+    def set_index_classify(self, level, src='SW'):
+        return pd.DataFrame({'index_code': ['x'], 'industry_name': ['y'], 'level': [level]})
+
+    def set_suspend_d(self, date):
+        date = pd.Timestamp(date)
+        codes = [code for code, dd in SUSPENDED if dd == date]
+        if not codes:
+            return pd.DataFrame(columns=SUSPEND_D_META['columns'])
+        return pd.DataFrame({'ts_code': codes, 'trade_date': date.strftime(DATE_FORMAT), 'suspend_timing': None,
+                             'suspend_type': 'S'})
+
+    def _daily(self, code, start, end, cols):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        days = DAYS[(DAYS >= start) & (DAYS <= end)]
+        days = days[~days.isin([dd for cc, dd in SUSPENDED if cc == code])]
+        base = (days.values.astype('M8[D]').astype('i8') % 1000).astype('f8')
+        df = pd.DataFrame({col: np.round(base / 10.0 + n, 2) for n, col in enumerate(cols)})
+        df['trade_date'] = [dd.strftime(DATE_FORMAT) for dd in days]
+        return df
+
+    def set_price_daily(self, code, start, end, astype='E'):
+        self.calls.append(('daily', code, start, end))
+        return self._daily(code, start, end, EQUITY_DAILY_PRICE_META['columns'])
+
+    def set_stock_daily_info(self, code, start, end):
+        self.calls.append(('info', code, start, end))
+        return self._daily(code, start, end, STOCK_DAILY_INFO_META['columns'])
+
+    def set_stock_adjfactor(self, code, start, end):
+        self.calls.append(('adj', code, start, end))
+        return self._daily(code, start, end, STOCK_ADJFACTOR_META['columns'])
+
+    def set_price_minute(self, code, start, end, freq='1min', astype='E'):
+        self.calls.append(('min', code, start, end))
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        mins = session_day_to_min_tus(DAYS[(DAYS >= start) & (DAYS <= end)], freq)
+        base = (mins.values.astype('M8[m]').astype('i8') % 100000).astype('f8')
+        df = pd.DataFrame({col: base + n * 0.01 + 1 for n, col in enumerate(EQUITY_MINUTE_PRICE_META['columns'])})
+        df['trade_time'] = [mm.strftime(DATETIME_FORMAT) for mm in mins]
+        return df
+
+
+def make_reader(cls, path=None, **kwargs):
+    """
+    :param cls: XcTusBooster or XcDBUpdater, the netloader is replaced by FakeNetLoader.
+    :param path: LMDB environment, default a new temp directory
+    :return: reader with domain initialized, path
+    """
+    # the caches of the process outlive the databases of other tests, start with empty ones.
+    chunk_cache().clear()
+    result_cache().clear()
+    path = path or tempfile.mkdtemp()
+    reader_cls = type('Fake' + cls.__name__, (cls,), {'netloader': FakeNetLoader()})
+    with mock.patch.object(sys.modules[cls.__module__], 'LMDB_NAME', path):
+        reader = reader_cls(last_day=LAST_DAY, **kwargs)
+    reader.init_domain()
+    return reader, path
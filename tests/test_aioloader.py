@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pandas as pd
+
+from boost_tushare.aioloader import TusAioLoader, _cancel_all, aio_update
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """
+    tushare pro API stub, daily bars of the business days requested.
+    """
+    requests = []
+    active = []
+    # ts_code: number of requests answered by http 500, -1 for all
+    fails = {}
+
+    def do_POST(self):
+        req = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        self.active.append(1)
+        self.requests.append((req['api_name'], len(self.active)))
+        time.sleep(0.02)
+        params = req['params']
+        nfail = self.fails.get(params['ts_code'], 0)
+        if nfail != 0:
+            self.fails[params['ts_code']] = nfail - 1
+            self.active.pop()
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        days = pd.bdate_range(params['start_date'], params['end_date'])[::-1]
+        items = [[params['ts_code'], dd.strftime('%Y%m%d'), 10.0, 100.0 + n] for n, dd in enumerate(days)]
+        body = json.dumps({'code': 0, 'msg': '', 'data': {'fields': ['ts_code', 'trade_date', 'close', 'vol'],
+                                                           'items': items}}).encode()
+        self.active.pop()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAioLoader(unittest.TestCase):
+    def setUp(self):
+        server_cls = type('StubServer', (ThreadingMixIn, HTTPServer), {'daemon_threads': True})
+        self.server = server_cls(('127.0.0.1', 0), _StubHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        _StubHandler.requests = []
+        _StubHandler.fails = {}
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_price_daily(self):
+        url = 'http://127.0.0.1:{}/dataapi'.format(self.server.server_address[1])
+        loader = TusAioLoader('token', url, concurrency=2)
+        codes = ['{:06d}.SZ'.format(n) for n in range(1, 9)]
+
+        async def _load():
+            return await asyncio.gather(*[loader.set_price_daily(code, '20200106', '20200117') for code in codes])
+
+        loop = asyncio.new_event_loop()
+        try:
+            out = loop.run_until_complete(_load())
+        finally:
+            loop.close()
+        self.assertEqual([df['ts_code'].iloc[0] for df in out], codes)
+        self.assertEqual(list(out[0].columns), ['ts_code', 'trade_date', 'close', 'volume'])
+        self.assertEqual(len(out[0]), 10)
+        self.assertEqual(len(_StubHandler.requests), len(codes))
+        self.assertEqual(max(nn for _, nn in _StubHandler.requests), 2)
+
+    def test_retry(self):
+        url = 'http://127.0.0.1:{}/dataapi'.format(self.server.server_address[1])
+        loader = TusAioLoader('token', url, concurrency=2, retries=2, backoff=0.01)
+        codes = ['{:06d}.SZ'.format(n) for n in range(1, 9)]
+        _StubHandler.fails = {'000001.SZ': 2, '000002.SZ': 1, '000003.SZ': -1}
+
+        class _Updater(object):
+            def steps_price_daily(self, code, start, end):
+                data = yield ('set_price_daily', (code, start, end))
+                return len(data)
+
+        out = aio_update(_Updater(), 'update_price_daily', [(code, '20200106', '20200117') for code in codes],
+                         loader, workers=4)
+        # the code failed after the retries is left out, the others are updated
+        self.assertEqual(out, {code: 10 for code in codes if code != '000003.SZ'})
+        self.assertEqual(len(_StubHandler.requests), len(codes) + 2 + 1 + 2)
+        self.assertEqual(_StubHandler.fails['000003.SZ'], -4)
+
+    def test_steps_off_loop(self):
+        # the database parts of the steps never run in the loop thread
+        url = 'http://127.0.0.1:{}/dataapi'.format(self.server.server_address[1])
+        loader = TusAioLoader('token', url, concurrency=2)
+        threads = set()
+
+        class _Updater(object):
+            def steps_price_daily(self, code, start, end):
+                threads.add(threading.current_thread())
+                data = yield ('set_price_daily', (code, start, end))
+                threads.add(threading.current_thread())
+                return len(data)
+
+        codes = ['{:06d}.SZ'.format(n) for n in range(1, 5)]
+        out = aio_update(_Updater(), 'update_price_daily', [(code, '20200106', '20200117') for code in codes],
+                         loader, workers=2)
+        self.assertEqual(out, {code: 10 for code in codes})
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_cancel_left(self):
+        # a batch aborted(e.g. KeyboardInterrupt) leaves the other coroutines pending
+        done = []
+
+        async def _sleep():
+            try:
+                await asyncio.sleep(60)
+            finally:
+                done.append(1)
+
+        loop = asyncio.new_event_loop()
+        task = loop.create_task(_sleep())
+        loop.run_until_complete(asyncio.sleep(0.01))
+        _cancel_all(loop)
+        loop.close()
+        self.assertTrue(task.cancelled())
+        self.assertEqual(done, [1])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from boost_tushare.xcdb.zlmdb import XcLMDB, XcLMDBAccessor
+from boost_tushare.xcdb.chunkcache import CHUNK_CACHE_SIZE, chunk_cache, result_cache
+from boost_tushare.layout import EQUITY_DAILY_PRICE_META
+
+
+class TestChunkCache(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.master = XcLMDB(self.path, readonly=False)
+
+    def tearDown(self):
+        self.master.close()
+        shutil.rmtree(self.path)
+
+    def test_chunk_cache(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        sdb = 'ts:daily_price:000001.SZ'
+        cache = chunk_cache()
+        cache.clear()
+        v1 = pd.DataFrame(np.random.rand(21, len(cols)), columns=cols)
+        v2 = pd.DataFrame(np.random.rand(22, len(cols)), columns=cols)
+        db = XcLMDBAccessor(self.master, sdb, EQUITY_DAILY_PRICE_META)
+        db.save('2020-01-01', v1)
+        db.commit()
+        hits = cache.hits
+        for n in range(2):
+            db = XcLMDBAccessor(self.master, sdb, EQUITY_DAILY_PRICE_META, readonly=True)
+            val = db.load('2020-01-01', raw_mode=True)
+            np.testing.assert_array_equal(val, v1.values)
+            self.assertFalse(val.flags.writeable)
+            self.assertTrue(db.load('2020-01-01', fields=['close']).equals(v1[['close']]))
+            db.commit()
+        self.assertEqual(cache.hits, hits + 3)
+        # read transaction begun before the write, not cached
+        rdb = XcLMDBAccessor(self.master, sdb, EQUITY_DAILY_PRICE_META, readonly=True)
+        db = XcLMDBAccessor(self.master, sdb, EQUITY_DAILY_PRICE_META)
+        db.save('2020-01-01', v2)
+        db.commit()
+        np.testing.assert_array_equal(rdb.load('2020-01-01', raw_mode=True), v1.values)
+        rdb.commit()
+        db = XcLMDBAccessor(self.master, sdb, EQUITY_DAILY_PRICE_META, readonly=True)
+        np.testing.assert_array_equal(db.load('2020-01-01', raw_mode=True), v2.values)
+        db.commit()
+        cache.resize(v2.values.nbytes - 1)
+        self.assertEqual(cache.stats()['entries'], 0)
+        cache.resize(CHUNK_CACHE_SIZE)
+
+    def test_two_databases(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        sdb = 'ts:daily_price:000001.SZ'
+        path = tempfile.mkdtemp()
+        other = XcLMDB(path, readonly=False)
+        try:
+            for master, val in [(self.master, 1.0), (other, 2.0)]:
+                db = XcLMDBAccessor(master, sdb, EQUITY_DAILY_PRICE_META)
+                db.save('2020-01-01', pd.DataFrame(np.full((21, len(cols)), val), columns=cols))
+                db.commit()
+            for n in range(2):
+                for master, val in [(self.master, 1.0), (other, 2.0)]:
+                    db = XcLMDBAccessor(master, sdb, EQUITY_DAILY_PRICE_META, readonly=True)
+                    self.assertTrue((db.load_many(['2020-01-01'], raw_mode=True)[0] == val).all())
+                    db.commit()
+            # the entries of a closed database are dropped
+            entries = chunk_cache().stats()['entries']
+            other.close()
+            self.assertEqual(chunk_cache().stats()['entries'], entries - 1)
+        finally:
+            other.close()
+            shutil.rmtree(path)
+
+    def test_result_cache_invalidate(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        sdb = 'ts:daily_price:000002.SZ'
+        cache = result_cache()
+        rows = np.random.rand(5, len(cols))
+        cache.put((self.path, sdb, tuple(cols)), (0, rows), cache.generation)
+        self.assertEqual(cache.get((self.path, sdb, tuple(cols)))[0], 0)
+        db = XcLMDBAccessor(self.master, sdb, EQUITY_DAILY_PRICE_META)
+        db.save('2020-01-01', pd.DataFrame(rows, columns=cols))
+        db.commit()
+        self.assertIsNone(cache.get((self.path, sdb, tuple(cols))))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,114 @@
+import pickle
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from boost_tushare.xcdb.codec import *
+from boost_tushare.xcdb.xcdb import XcAccessor, NOT_EXIST
+from boost_tushare.layout import EQUITY_DAILY_PRICE_META, CALENDAR_DTIDX_META, SUSPEND_D_META
+
+
+class TestCodec(unittest.TestCase):
+    def test_raw_roundtrip(self):
+        for arr in [np.random.rand(23, 6),
+                    np.arange(10, dtype='i4'),
+                    np.array(['20200101', '20200102'], dtype='U8'),
+                    pd.date_range('20200101', periods=5).values.astype('M8[m]')]:
+            buf = pack_array(arr)
+            self.assertTrue(is_coded(buf))
+            out = unpack_value(buf)
+            self.assertEqual(out.dtype, arr.dtype)
+            np.testing.assert_array_equal(out, arr)
+
+    def test_zero_copy(self):
+        arr = np.random.rand(20, 6)
+        buf = memoryview(pack_array(arr))
+        out = unpack_value(buf)
+        self.assertFalse(out.flags.writeable)
+        self.assertFalse(out.flags.owndata)
+        out = unpack_value(buf, copy=True)
+        self.assertTrue(out.flags.owndata)
+
+    def test_compress(self):
+        arr = np.round(np.random.rand(240, 6) * 100, 2)
+        arr[3, :] = np.nan
+        for compress in [COMPRESS.CP_ZLIB, COMPRESS.CP_LZMA]:
+            for shuffle in [False, True]:
+                buf = pack_array(arr, compress, shuffle)
+                out = unpack_value(memoryview(buf), copy=True)
+                np.testing.assert_array_equal(out, arr)
+                self.assertTrue(out.flags.writeable)
+
+    def test_object_fallback(self):
+        arr = np.array([['a', 1], ['b', None]], dtype=object)
+        buf = pack_array(arr)
+        self.assertEqual(buf[4], CODEC.CD_PICKLE)
+        np.testing.assert_array_equal(unpack_value(buf), arr)
+        # values written by older version
+        arr = np.random.rand(3, 6)
+        np.testing.assert_array_equal(unpack_value(pickle.dumps(arr)), arr)
+
+    def test_versions(self):
+        self.assertEqual(value_version(pickle.dumps(1)), 0)
+        for buf in [pack_object({'a': 1}), pack_array(np.arange(3)), NOT_EXIST]:
+            self.assertEqual(value_version(buf), CODEC_VERSION)
+        self.assertTrue(is_na(NOT_EXIST) and is_na(b'NA'))
+        self.assertIsNone(unpack_value(NOT_EXIST))
+        self.assertEqual(unpack_value(memoryview(pack_object('20200101'))), '20200101')
+        self.assertIsNone(repack_value(NOT_EXIST))
+        self.assertEqual(repack_value(b'NA'), NOT_EXIST)
+        buf = repack_value(pickle.dumps(np.arange(3)))
+        self.assertTrue(is_coded(buf))
+        np.testing.assert_array_equal(unpack_value(buf), np.arange(3))
+        self.assertEqual(unpack_value(repack_value(pickle.dumps({'a': 1}))), {'a': 1})
+
+    def test_fixed_point(self):
+        spec = EQUITY_DAILY_PRICE_META['fixed_point']
+        arr = np.round(np.random.rand(240, 6) * 100, 2)
+        arr[:, 4] = np.round(arr[:, 4] * 1e4)
+        arr[:, 5] = np.round(arr[:, 5] * 1e3, 3)
+        arr[3, :] = np.nan
+        arr[7, 2] = np.nan
+        for compress in [COMPRESS.CP_NONE, COMPRESS.CP_ZLIB]:
+            buf = pack_array(arr, compress, fixed=spec)
+            self.assertTrue(is_coded(buf))
+            self.assertIsNotNone(encode_fixed(arr, spec, compress))
+            out = unpack_value(memoryview(buf))
+            self.assertEqual(out.dtype, arr.dtype)
+            np.testing.assert_array_equal(out, arr)
+            self.assertTrue(out.flags.writeable)
+        np.testing.assert_array_equal(unpack_value(pack_array(arr[:, 3], fixed=spec[3:4])), arr[:, 3])
+        # not exact, fall back to raw codec
+        arr[0, 0] = 1.234
+        self.assertIsNone(encode_fixed(arr, spec))
+        np.testing.assert_array_equal(unpack_value(pack_array(arr, fixed=spec)), arr)
+        arr[0, 0] = 1e20
+        self.assertIsNone(encode_fixed(arr, spec))
+
+    def test_accessor(self):
+        acc = XcAccessor()
+        acc.metadata = EQUITY_DAILY_PRICE_META
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        df = pd.DataFrame(np.random.rand(21, len(cols)), columns=cols)
+        dbval, appval = acc.to_val_in(df, raw_mode=True)
+        self.assertTrue(is_coded(dbval))
+        np.testing.assert_array_equal(acc.to_val_out(dbval, raw_mode=True), df.values)
+        out = acc.to_val_out(dbval)
+        self.assertTrue(np.all(out.values == df.values))
+        dbval, appval = acc.to_val_in(df.iloc[0:0], raw_mode=True)
+        self.assertEqual(dbval, NOT_EXIST)
+
+        acc.metadata = CALENDAR_DTIDX_META
+        tcal = pd.date_range('20200101', periods=5)
+        dbval, appval = acc.to_val_in(tcal)
+        np.testing.assert_array_equal(acc.to_val_out(dbval), tcal.values.astype('M8[m]'))
+
+        acc.metadata = SUSPEND_D_META
+        df = pd.DataFrame([['000001.SZ', '20200101', None, 'S']], columns=SUSPEND_D_META['columns'])
+        dbval, appval = acc.to_val_in(df, raw_mode=True)
+        self.assertEqual(dbval[4], CODEC.CD_PICKLE)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
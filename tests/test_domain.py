@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from boost_tushare.domain import XcDomain
+from boost_tushare.utils.xcutils import CHUNK_START, CHUNK_END, XTUS_CHUNK_MONTHS
+
+
+def make_domain(seed=7):
+    """
+    XcDomain of a synthetic calendar(business days, some holidays removed, starts after xctus_first_day) and
+    random suspensions of a few codes.
+    """
+    rng = np.random.RandomState(seed)
+    days = pd.bdate_range('20100315', '20201231')
+    days = days[rng.rand(len(days)) > 0.03]
+    dom = XcDomain()
+    dom.xctus_first_day = pd.Timestamp('20100101')
+    dom.xctus_last_day = pd.Timestamp('20201231')
+    dom._cal_day = days
+
+    records = []
+    for code in ['000001.SZ', '000002.SZ', '600000.SH']:
+        for pos in sorted(rng.choice(len(days), 60, replace=False)):
+            stype = 'S' if rng.rand() < 0.8 else 'R'
+            timing = None if rng.rand() < 0.7 else '09:30-10:30'
+            records.append((days[pos], code, stype, timing))
+    # records of the same day, the last one decides
+    records.append((days[100], '000001.SZ', 'S', '13:00-15:00'))
+    records.append((days[100], '000001.SZ', 'S', None))
+    info = pd.DataFrame(records, columns=['trade_date', 'ts_code', 'suspend_type', 'suspend_timing'])
+    dom._suspend_info = info.set_index(['trade_date', 'ts_code']).sort_index(level=0, sort_remaining=False)
+    return dom
+
+
+class TestChunkOffsets(unittest.TestCase):
+    def test_offsets(self):
+        dom = make_domain()
+        cal = dom.trade_cal
+        for chunk in XTUS_CHUNK_MONTHS:
+            cmap = dom.tcalmap_chunk(chunk)
+            self.assertEqual(cmap.index[0], pd.Timestamp('20100101'))
+            self.assertEqual(cmap.index[-1], pd.Timestamp(CHUNK_START('20201231', chunk)))
+            for key, (ss, ee) in zip(cmap.index, cmap[['start', 'end']].values):
+                days = cal[(cal >= CHUNK_START(key, chunk)) & (cal <= CHUNK_END(key, chunk))]
+                self.assertTrue(cal[ss:ee].equals(days), (chunk, key))
+                self.assertEqual(dom.chunk_pos(key.to_datetime64(), chunk), (ss, ee))
+                if len(days):
+                    self.assertTrue(dom.gen_dindex_chunk(key.to_datetime64(), key.to_datetime64(), chunk).equals(days))
+        # chunks before the calendar are empty
+        self.assertEqual(dom.chunk_pos('2010-02-01', 'M'), (0, 0))
+        with self.assertRaises(KeyError):
+            dom.chunk_pos('2019-02-01', 'Q')
+        with self.assertRaises(KeyError):
+            dom.chunk_pos('2021-01-01', 'M')
+
+
+class TestSuspendIndex(unittest.TestCase):
+    def test_pandas_filter(self):
+        # XcSuspendIndex gives the results of the pandas filters of suspend_info it replaced
+        dom = make_domain()
+        cal = dom.trade_cal
+        index = dom.suspend_index
+        for code in ['000001.SZ', '000002.SZ', '600000.SH', '000003.SZ']:
+            info = dom.stock_suspend(code)
+            self.assertEqual(code in index, info is not None)
+            for key in dom.tcalmap_chunk('M').index[::7]:
+                ss, ee = dom.chunk_pos(key.to_datetime64(), 'M')
+                expect = 0
+                if info is not None:
+                    susp = info[(info.index >= CHUNK_START(key)) & (info.index <= CHUNK_END(key))]
+                    expect = len(susp.loc[(susp['suspend_type'] == 'S') & (susp['suspend_timing'].isna()), :])
+                self.assertEqual(index.count_full(code, ss, ee), expect, (code, key))
+            for pos in range(0, len(cal), 3):
+                expect = None
+                if info is not None:
+                    susp = info.loc[(info['suspend_type'] == 'S') & (info.index == cal[pos]), :]
+                    if not susp.empty:
+                        expect = bool(pd.isna(susp['suspend_timing'].iloc[-1]))
+                self.assertEqual(index.day_status(code, pos), expect, (code, cal[pos]))
+        self.assertTrue(index.day_status('000001.SZ', 100))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
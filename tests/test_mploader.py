@@ -0,0 +1,44 @@
+import shutil
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from boost_tushare.xupdater import XcDBUpdater
+
+from fakenet import make_reader
+
+
+class TestLoadUniverse(unittest.TestCase):
+    def setUp(self):
+        self.updater, self.path = make_reader(XcDBUpdater)
+        self.updater.update_price_daily('000001.SZ', '20190101', '20191231', 'E')
+
+    def tearDown(self):
+        self.updater.master_db.close()
+        shutil.rmtree(self.path)
+
+    def test_failed(self):
+        u = self.updater
+        # 000002.SZ not updated, 000003.SZ not in asset info: no data, not failed
+        codes = ['000001.SZ', '000002.SZ', '000003.SZ']
+        panel = u.get_price_universe(codes, '20190301', '20190630', workers=1)
+        self.assertFalse(np.isnan(panel.data[:, 0, :]).all())
+        self.assertTrue(np.isnan(panel.data[:, 1:, :]).all())
+        self.assertEqual(list(panel.failed), [])
+
+        read = u.get_price_daily
+
+        def _broken(code, *args, **kwargs):
+            if code == '000001.SZ':
+                raise ValueError('broken chunk')
+            return read(code, *args, **kwargs)
+
+        with mock.patch.object(u, 'get_price_daily', _broken):
+            panel = u.get_price_universe(codes, '20190301', '20190630', workers=1)
+        self.assertEqual(list(panel.failed), ['000001.SZ'])
+        self.assertTrue(np.isnan(panel.data).all())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
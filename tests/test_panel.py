@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from boost_tushare.panel import load_panel, panel_files
+from boost_tushare.xupdater import XcDBUpdater
+
+from fakenet import DAYS, make_reader
+
+
+class TestExportPanel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.updater, cls.path = make_reader(XcDBUpdater)
+        cls.codes = ['000001.SZ', '000002.SZ']
+        for code in cls.codes:
+            cls.updater.update_price_daily(code, '20190101', '20191231', 'E')
+            cls.updater.update_stock_adjfactor(code, '20190101', '20191231')
+            cls.updater.update_price_minute(code, '20190311', '20190322', '5min', 'E')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.updater.master_db.close()
+        shutil.rmtree(cls.path)
+
+    def setUp(self):
+        self.out = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.out)
+
+    def test_roundtrip(self):
+        # start/end inside the head and tail chunks
+        start, end = '20190312', '20190920'
+        self.updater.export_panel('daily_price', start, end, self.out)
+        panel = load_panel(self.out)
+        days = DAYS[(DAYS >= start) & (DAYS <= end)]
+        np.testing.assert_array_equal(panel.dates, days.values.astype('M8[D]'))
+        self.assertEqual(list(panel.codes), self.codes)
+        self.assertEqual(panel.shape, (len(days), len(self.codes), len(panel.fields)))
+        self.assertFalse(panel.data.flags.writeable)
+        for code in self.codes:
+            price = self.updater.get_price_daily(code, start, end, 'E').reindex(days)
+            for field in ['open', 'close', 'volume']:
+                np.testing.assert_array_equal(panel.frame(field)[code].values, price[field].values)
+        # suspended
+        self.assertTrue(np.isnan(panel.frame('close', start, start)['000001.SZ'].values[0]))
+        self.assertEqual(len(panel.frame('close', '20190401', '20190405')), 5)
+
+    def test_reexport(self):
+        self.updater.export_panel('daily_price', '20190101', '20190331', self.out)
+        old = load_panel(self.out)
+        for end in ['20190630', '20190930']:
+            self.updater.export_panel('daily_price', '20190101', end, self.out)
+        panel = load_panel(self.out)
+        self.assertEqual(panel.dates[-1], np.datetime64('2019-09-30'))
+        self.assertEqual(panel.shape[0], len(panel.dates))
+        # the previous data file is kept, the older ones removed, mapped views are still valid.
+        self.assertEqual(len(panel_files(self.out, 'daily_price')['all_data']), 2)
+        self.assertEqual(old.shape[0], len(old.dates))
+        self.assertEqual(old.dates[-1], np.datetime64('2019-03-29'))
+        self.assertFalse([ff for ff in os.listdir(self.out) if 'tmp' in ff])
+
+    def test_panel_readers(self):
+        start, end = '20190312', '20190920'
+        self.updater.export_panel('daily_price', start, end, self.out)
+        exported = load_panel(self.out)
+        panel = self.updater.get_price_daily_panel(self.codes, start, end)
+        np.testing.assert_array_equal(panel.dates, exported.dates)
+        np.testing.assert_array_equal(panel.data, exported.data)
+        panel = self.updater.get_price_daily_panel(None, start, end, fields=['close'])
+        self.assertEqual(panel.fields, ['close'])
+        np.testing.assert_array_equal(panel.data[..., 0], exported.frame('close').values)
+
+        panel = self.updater.get_stock_adjfactor_panel(self.codes, start, end)
+        for n, code in enumerate(self.codes):
+            adj = self.updater.get_stock_adjfactor(code, start, end).loc[start:end]
+            np.testing.assert_array_equal(panel.data[:, n, :], adj.values)
+        self.assertIsNone(self.updater.get_price_daily_panel(self.codes, '20190105', '20190106'))
+
+    def test_universe(self):
+        # in process and by 2 spawned workers on the same database
+        for freq, start, end in [('1D', '20190312', '20190920'), ('5min', '20190311', '20190322')]:
+            local = self.updater.get_price_universe(self.codes, start, end, freq, workers=1)
+            shared = self.updater.get_price_universe(self.codes, start, end, freq, workers=2)
+            try:
+                np.testing.assert_array_equal(shared.dates, local.dates)
+                np.testing.assert_array_equal(shared.data, local.data)
+                self.assertEqual(local.shape[1:], (2, len(local.fields)))
+                self.assertFalse(np.isnan(local.data).all(axis=(0, 2)).any())
+            finally:
+                if hasattr(shared, 'release'):
+                    shared.release()
+        price = self.updater.get_price_daily(self.codes[1], '20190401', '20190430', 'E')
+        panel = self.updater.get_price_universe(self.codes, '20190401', '20190430', '1D', ['close'], workers=1)
+        np.testing.assert_array_equal(panel.frame('close')[self.codes[1]].values, price['close'].values)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from boost_tushare import proloader
+from boost_tushare.utils.qos import ThreadingTokenBucket, AsyncTokenBucket, RateLimiters, RateLimitedApi, \
+    SharedRateLimiters, QuotaExceededError
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket(self):
+        bucket = ThreadingTokenBucket(100, 2)
+        t0 = time.monotonic()
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(lambda _: bucket.block_consume(1), range(22)))
+        # 2 in the burst, 20 refilled at 100 per second
+        self.assertTrue(0.18 < time.monotonic() - t0 < 0.4)
+        self.assertFalse(bucket.block_consume(1, timeout=0.001))
+
+    def test_registry(self):
+        class Api(object):
+            def daily(self, code):
+                return code
+
+        limiters = RateLimiters({None: (60, 1), 'daily': (6000, 5)})
+        api = RateLimitedApi(Api(), limiters)
+        t0 = time.monotonic()
+        self.assertEqual([api.daily(n) for n in range(10)], list(range(10)))
+        self.assertTrue(time.monotonic() - t0 < 0.2)
+        self.assertIs(limiters.get('daily'), limiters.get('daily'))
+        self.assertTrue(limiters.get('trade_cal').consume())
+        self.assertFalse(limiters.get('trade_cal').consume())
+        self.assertTrue(limiters.get('index_basic').consume())
+
+    def test_shared(self):
+        path = tempfile.mkdtemp()
+        try:
+            limits = {None: (60, 3), 'daily': (60, 2, 3)}
+            # e.g. the limiters of two processes on the same file
+            lim1 = SharedRateLimiters(path + '/qos.json', limits)
+            lim2 = SharedRateLimiters(path + '/qos.json', limits)
+            self.assertTrue(lim1.get('trade_cal').consume())
+            self.assertTrue(lim2.get('trade_cal').consume())
+            self.assertTrue(lim1.get('trade_cal').consume())
+            self.assertFalse(lim2.get('trade_cal').consume())
+            self.assertTrue(0.5 < lim2.get('trade_cal').delay() <= 1)
+
+            self.assertTrue(lim1.get('daily').consume())
+            self.assertTrue(lim2.get('daily').consume())
+            self.assertEqual(lim1.ledger(), {'trade_cal': 3, 'daily': 2})
+            self.assertTrue(lim2.get('daily').block_consume(1, timeout=2))
+            with self.assertRaises(QuotaExceededError):
+                lim1.get('daily').consume()
+            lim1.close()
+            lim2.close()
+        finally:
+            shutil.rmtree(path)
+
+    def test_shared_async(self):
+        path = tempfile.mkdtemp()
+        limiters = SharedRateLimiters(path + '/qos.json', {None: (600, 2)}, AsyncTokenBucket)
+        take = limiters.take
+        threads = []
+
+        def _take(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return take(*args, **kwargs)
+
+        async def _consume():
+            await asyncio.gather(*[limiters.get('daily').consume() for _ in range(4)])
+
+        loop = asyncio.new_event_loop()
+        try:
+            with mock.patch.object(limiters, 'take', _take):
+                t0 = time.monotonic()
+                loop.run_until_complete(_consume())
+            # 2 in the burst, 2 refilled at 10 per second
+            self.assertTrue(0.15 < time.monotonic() - t0 < 0.5)
+            # the file is locked and read out of the loop thread
+            self.assertNotIn(threading.current_thread(), threads)
+            self.assertEqual(limiters.ledger(), {'daily': 4})
+        finally:
+            loop.close()
+            limiters.close()
+            shutil.rmtree(path)
+
+    def test_qos_file(self):
+        path = tempfile.mkdtemp()
+        try:
+            self.assertEqual(proloader.qos_file(path), os.path.join(path, proloader.TUS_QOS_FILE))
+            self.assertIsNone(proloader.qos_file(None))
+            # not writable, the calls are limited in process
+            self.assertIsNone(proloader.qos_file(os.path.join(path, 'missing')))
+            with mock.patch.object(proloader, 'TUS_QOS_PATH', os.path.join(path, 'qos.json')):
+                self.assertEqual(proloader.qos_file(os.path.join(path, 'missing')), os.path.join(path, 'qos.json'))
+        finally:
+            shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
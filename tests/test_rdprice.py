@@ -0,0 +1,127 @@
+import shutil
+import unittest
+
+import numpy as np
+
+from boost_tushare.layout import EQUITY_DAILY_PRICE_META, TusSdbs
+from boost_tushare.rdprice import XcReaderPrice
+from boost_tushare.xcdb.chunkcache import result_cache
+from boost_tushare.xcdb.xcdb import IOFLAG
+from boost_tushare.xupdater import XcDBUpdater
+
+from fakenet import FakeNetLoader, make_reader
+
+
+class TestReaderPlan(unittest.TestCase):
+    def test_runs(self):
+        # missed chunks are loaded by contiguous runs of at most max_units + 1 chunks(nadata_iter)
+        loads = []
+
+        def load(d0, d1):
+            loads.append((d0, d1))
+            return d0
+
+        out = XcReaderPrice._fetch_runs(list(range(10)), [1, 2, 3, 4, 5, 8, 9], 2, load, lambda data, dd: (data, dd))
+        self.assertEqual(loads, [(1, 3), (4, 5), (8, 9)])
+        self.assertEqual(out, [(1, 1), (1, 2), (1, 3), (4, 4), (4, 5), (8, 8), (8, 9)])
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.updater, self.path = make_reader(XcDBUpdater)
+
+    def tearDown(self):
+        self.updater.master_db.close()
+        shutil.rmtree(self.path)
+
+    def test_mutate(self):
+        u = self.updater
+        u.update_price_daily('000001.SZ', '20190101', '20191231', 'E')
+        u.update_stock_adjfactor('000001.SZ', '20190101', '20191231')
+        # the second read of each range is a cache hit(the whole range, then a sub-range)
+        for start, end in [('20190101', '20191231'), ('20190101', '20191231'), ('20190401', '20190630')]:
+            df = u.get_price_daily('000001.SZ', start, end, 'E')
+            expect = df['close'].values * 2
+            adj = u.get_stock_adjfactor('000001.SZ', start, end)
+            df['close'] *= 2
+            df.loc[:, 'open'] = adj['adj_factor'].reindex(df.index).values
+            np.testing.assert_array_equal(df['close'].values, expect)
+        # the cached rows are intact, and not shared by the frames returned
+        df = u.get_price_daily('000001.SZ', '20190401', '20190630', 'E')
+        np.testing.assert_array_equal(df['close'].values * 2, expect)
+        p0, rows = result_cache().get((self.path, TusSdbs.SDB_DAILY_PRICE.value + '000001.SZ',
+                                       tuple(EQUITY_DAILY_PRICE_META['columns'])))
+        self.assertFalse(np.shares_memory(df.values, rows))
+        shared = u.get_price_daily('000001.SZ', '20190401', '20190630', 'E', copy=False)
+        self.assertFalse(shared.values.flags.writeable)
+        np.testing.assert_array_equal(shared.values, df.values)
+
+
+class ShiftedNetLoader(FakeNetLoader):
+    def _daily(self, code, start, end, cols):
+        df = super(ShiftedNetLoader, self)._daily(code, start, end, cols)
+        df[cols] += 1000
+        return df
+
+
+class TestResultCacheDatabases(unittest.TestCase):
+    def setUp(self):
+        self.first, self.path0 = make_reader(XcDBUpdater)
+        self.second, self.path1 = make_reader(XcDBUpdater)
+        self.second.netloader = ShiftedNetLoader()
+
+    def tearDown(self):
+        for reader, path in [(self.first, self.path0), (self.second, self.path1)]:
+            reader.master_db.close()
+            shutil.rmtree(path)
+
+    def test_isolated(self):
+        # same code and columns in two databases, each reads its own rows
+        for reader in [self.first, self.second]:
+            reader.update_price_daily('000001.SZ', '20190101', '20191231', 'E')
+        for start, end in [('20190101', '20191231'), ('20190401', '20190630')]:
+            df0 = self.first.get_price_daily('000001.SZ', start, end, 'E', flag=IOFLAG.READ_DBONLY)
+            df1 = self.second.get_price_daily('000001.SZ', start, end, 'E', flag=IOFLAG.READ_DBONLY)
+            np.testing.assert_array_equal(df1.values, df0.values + 1000)
+        # closing one database drops its rows only
+        self.second.master_db.close()
+        sdb = TusSdbs.SDB_DAILY_PRICE.value + '000001.SZ'
+        cols = tuple(EQUITY_DAILY_PRICE_META['columns'])
+        self.assertIsNone(result_cache().get((self.path1, sdb, cols)))
+        self.assertIsNotNone(result_cache().get((self.path0, sdb, cols)))
+
+
+class TestCrossSection(unittest.TestCase):
+    def setUp(self):
+        self.updater, self.path = make_reader(XcDBUpdater)
+
+    def tearDown(self):
+        self.updater.master_db.close()
+        shutil.rmtree(self.path)
+
+    def test_rebuild(self):
+        u = self.updater
+        codes = ['000001.SZ', '000002.SZ']
+        for code in codes:
+            u.update_price_daily(code, '20190101', '20191231', 'E')
+        # a chunk failed to download
+        db = u.facc(TusSdbs.SDB_DAILY_PRICE.value + codes[0], EQUITY_DAILY_PRICE_META)
+        db.remove('2019-06-01')
+        db.commit()
+        self.assertEqual(u.update_cross_section('20190101', '20191231', rollback=0), 256)
+        self.assertEqual(list(u.get_cross_section('20190610').index), codes[1:])
+        xs = u.get_cross_section('20190311', fields=['close', 'volume'])
+        self.assertEqual(list(xs.index), codes)
+        price = u.get_price_daily(codes[0], '20190311', '20190311', 'E')
+        np.testing.assert_array_equal(xs.values[0], price.loc['2019-03-11', ['close', 'volume']].values)
+        self.assertEqual(u.update_cross_section('20190101', '20191231', rollback=0), 0)
+
+        # repaired by the next update, the cross sections of the month are rebuilt
+        u.update_price_daily(codes[0], '20190101', '20191231', 'E', rollback=0)
+        self.assertIsNone(u.get_cross_section('20190610'))
+        self.assertEqual(u.update_cross_section('20190101', '20191231', rollback=0), 20)
+        self.assertEqual(list(u.get_cross_section('20190610').index), codes)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,48 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from boost_tushare.xcdb.singleflight import XcSingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_overlap(self):
+        sf = XcSingleFlight()
+        fetched = []
+
+        def run(keys):
+            def fetch(idx):
+                time.sleep(0.05)
+                fetched.extend(keys[n] for n in idx)
+                return [keys[n] * 2 for n in idx]
+            return sf.run('sdb', keys, fetch)
+
+        ranges = [['a', 'b', 'c'], ['b', 'c', 'd'], ['a', 'b', 'c', 'd', 'e']] * 2
+        with ThreadPoolExecutor(6) as executor:
+            outs = list(executor.map(run, ranges))
+        self.assertEqual(outs, [[kk * 2 for kk in keys] for keys in ranges])
+        self.assertEqual(sorted(fetched), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(sf.stats(), dict(leads=5, shared=17, inflight=0))
+
+    def test_error(self):
+        sf = XcSingleFlight()
+        started = threading.Event()
+
+        def fail(idx):
+            started.set()
+            time.sleep(0.05)
+            raise IOError('net')
+
+        with ThreadPoolExecutor(2) as executor:
+            f1 = executor.submit(sf.run, 'sdb', ['a'], fail)
+            started.wait()
+            f2 = executor.submit(sf.run, 'sdb', ['a'], lambda idx: ['a'])
+            self.assertRaises(IOError, f1.result)
+            self.assertRaises(IOError, f2.result)
+        # nothing in flight, fetched again
+        self.assertEqual(sf.run('sdb', ['a'], lambda idx: ['aa']), ['aa'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from boost_tushare.xcdb.zlmdb import XcLMDB
+from boost_tushare.xcdb.writequeue import XcWriteQueue
+from boost_tushare.xcdb.xcdb import IOFLAG
+from boost_tushare.layout import EQUITY_DAILY_PRICE_META
+from boost_tushare.xupdater import XcDBUpdater
+
+from fakenet import make_reader
+
+
+class TestWriteQueue(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.master = XcLMDB(self.path, readonly=False)
+
+    def tearDown(self):
+        self.master.close()
+        shutil.rmtree(self.path)
+
+    def test_write_queue(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        keys = ['2020-{:02d}-01'.format(m) for m in range(1, 13)]
+        codes = ['{:06d}.SZ'.format(n) for n in range(1, 9)]
+        chunks = {kk: pd.DataFrame(np.random.rand(21, len(cols)), columns=cols) for kk in keys}
+        wq = XcWriteQueue(self.master, batch_bytes=0x10000, interval=10)
+
+        def _update(code):
+            db = wq.accessor('ts:daily_price:' + code, EQUITY_DAILY_PRICE_META)
+            db.save_many(chunks, valid=keys[:6])
+            db.commit()
+
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(_update, codes))
+        # batched by size, the rest are committed by flush
+        self.assertTrue(wq.flush())
+        self.assertEqual(wq.stats()['committed'], len(codes))
+        for code in codes:
+            db = wq.accessor('ts:daily_price:' + code, EQUITY_DAILY_PRICE_META, readonly=True)
+            np.testing.assert_array_equal(db.load(keys[3], raw_mode=True), chunks[keys[3]].values)
+            self.assertEqual(list(db.get_validity(keys)), [True] * 6 + [False] * 6)
+            db.commit()
+        db = wq.accessor('ts:daily_price:' + codes[0], EQUITY_DAILY_PRICE_META)
+        db.remove(keys[0])
+        db.commit()
+        wq.close()
+        db = self.master.accessor('ts:daily_price:' + codes[0], EQUITY_DAILY_PRICE_META, readonly=True)
+        self.assertIsNone(db.load(keys[0]))
+        self.assertFalse(db.get_validity(keys[:1])[0])
+        db.commit()
+
+
+class TestUpdaterWriteBehind(unittest.TestCase):
+    def setUp(self):
+        self.updater, self.path = make_reader(XcDBUpdater, durable=False, sync_interval=5)
+
+    def tearDown(self):
+        self.updater.stop_write_behind()
+        self.updater.master_db.close()
+        shutil.rmtree(self.path)
+
+    def test_fetch_through(self):
+        u = self.updater
+        u.start_write_behind(interval=10)
+        self.assertEqual(u.wqueue.sync_interval, 5)
+        # chunks missed by a reader of the update(e.g. update_stock_xdxr) are queued to the writer
+        price = u.get_price_daily('000001.SZ', '20190101', '20190331', 'E')
+        self.assertEqual(u.wqueue.submitted, 1)
+        u.flush_writes()
+        saved = u.get_price_daily('000001.SZ', '20190101', '20190331', 'E', flag=IOFLAG.READ_DBONLY)
+        self.assertTrue(saved.equals(price))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
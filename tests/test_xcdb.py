@@ -0,0 +1,110 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from boost_tushare.xcdb.codec import COMPRESS
+from boost_tushare.xcdb.xcdb import CHUNK_KEY_SUFFIX, XcAccessor, VLAYOUT, validity_seq
+from boost_tushare.layout import EQUITY_DAILY_PRICE_META
+
+
+class XcDictAccessor(XcAccessor):
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.db = {}
+
+    def _db_get(self, key):
+        return self.db.get(key)
+
+    def _db_put(self, key, val):
+        self.db[key] = val
+
+    def _db_delete(self, key):
+        self.db.pop(key, None)
+
+    def _db_empty(self):
+        # metadata is keyed by (sdb, key)
+        return all(isinstance(kk, tuple) for kk in self.db)
+
+    def _meta_get(self, sdb, key):
+        return self.db.get((sdb, key))
+
+    def _meta_put(self, sdb, key, val):
+        self.db[(sdb, key)] = val
+
+
+class TestColumnLayout(unittest.TestCase):
+    def test_fields(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        df = pd.DataFrame(np.random.rand(21, len(cols)), columns=cols)
+        for layout in [VLAYOUT.VL_ROW, VLAYOUT.VL_COLUMN]:
+            meta = dict(EQUITY_DAILY_PRICE_META, vlayout=layout)
+            acc = XcDictAccessor(meta)
+            acc.save('2020-01-01', df)
+            acc.save('2020-02-01', df.iloc[0:0])
+            if layout == VLAYOUT.VL_COLUMN:
+                self.assertEqual(len(acc.db), 2 * len(cols))
+            np.testing.assert_array_equal(acc.load('2020-01-01', raw_mode=True), df.values)
+            val = acc.load('2020-01-01', raw_mode=True, fields=['close', 'open'])
+            np.testing.assert_array_equal(val, df[['close', 'open']].values)
+            val = acc.load('2020-01-01', fields=['volume'])
+            self.assertEqual(list(val.columns), ['volume'])
+            self.assertEqual(acc.load('2020-02-01', raw_mode=True, fields=['close']).shape, (0, 1))
+            acc.remove('2020-01-01')
+            self.assertIsNone(acc.load('2020-01-01', raw_mode=True, fields=['close']))
+
+    def test_save_many(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        meta = dict(EQUITY_DAILY_PRICE_META, compress=COMPRESS.CP_ZLIB, shuffle=True)
+        acc = XcDictAccessor(meta)
+        chunks = {'2020-{:02d}-01'.format(m): pd.DataFrame(np.random.rand(21, len(cols)), columns=cols)
+                  for m in range(1, 13)}
+        acc.save_many(chunks)
+        for kk, vv in chunks.items():
+            np.testing.assert_array_equal(acc.load(kk, raw_mode=True), vv.values)
+
+
+class TestValidity(unittest.TestCase):
+    def test_bitmap(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        acc = XcDictAccessor(EQUITY_DAILY_PRICE_META)
+        acc.sdb_path = 'ts:daily_price:000001.SZ'
+        self.assertTrue(acc.track_validity)
+        keys = ['2020-{:02d}-01'.format(m) for m in range(1, 13)]
+        chunks = {kk: pd.DataFrame(np.random.rand(21, len(cols)), columns=cols) for kk in keys}
+        acc.save_many(chunks, valid=keys[:6])
+        self.assertEqual(list(acc.get_validity(keys)), [True] * 6 + [False] * 6)
+        np.testing.assert_array_equal(acc.get_validity(pd.to_datetime(keys).values), acc.get_validity(keys))
+        acc.set_validity(keys[6:], True)
+        acc.remove(keys[0])
+        acc.save(keys[1], chunks[keys[1]])
+        self.assertEqual(list(acc.get_validity(keys)), [False, False] + [True] * 10)
+        self.assertFalse(acc.get_validity(['1980-01-01', '2030-01-01']).any())
+        self.assertEqual(validity_seq(['1990-02-01'], 'M')[0], 1)
+        self.assertEqual(validity_seq(['1990-02-01'], 'D')[0], 31)
+
+    def test_chunk(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        df = pd.DataFrame(np.random.rand(21, len(cols)), columns=cols)
+        monthly = XcDictAccessor(dict(EQUITY_DAILY_PRICE_META, chunk='M'))
+        monthly.sdb_path = 'ts:daily_price:000001.SZ'
+        # values saved before the chunk is recorded are monthly
+        monthly._db_put(monthly.to_db_key('2020-01-01'), monthly.to_val_in(df)[0])
+        quarterly = XcDictAccessor(dict(EQUITY_DAILY_PRICE_META, chunk='Q'))
+        quarterly.sdb_path = monthly.sdb_path
+        quarterly.db = monthly.db
+        for call in [lambda: quarterly.get_validity(['2020-01-01']), lambda: quarterly.save('2020-01-01', df)]:
+            self.assertRaises(ValueError, call)
+        monthly.save('2020-02-01', df)
+        self.assertIn((monthly.metadata['validity'], b'ts:daily_price:000001.SZ' + CHUNK_KEY_SUFFIX), monthly.db)
+        self.assertRaises(ValueError, quarterly.save_many, [('2020-04-01', df)])
+        # a new sub-database is recorded in the chunk of the first save
+        quarterly.db = {}
+        quarterly.save('2020-01-01', df)
+        quarterly.check_chunk()
+        monthly.db = quarterly.db
+        self.assertRaises(ValueError, monthly.get_validity, ['2020-01-01'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,209 @@
+import pickle
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from boost_tushare.xcdb.codec import CODEC_VERSION, value_version
+from boost_tushare.xcdb.xcdb import VLAYOUT, KEYSPACE, NOT_EXIST
+from boost_tushare.xcdb.zlmdb import XcLMDB, XcLMDBAccessor
+from boost_tushare.xcdb.chunkcache import chunk_cache
+from boost_tushare.layout import EQUITY_DAILY_PRICE_META, GENERAL_OBJ_META, SDB_TABLES, sdb_meta
+
+
+class TestLMDBAccessor(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.master = XcLMDB(self.path, readonly=False)
+        chunk_cache().clear()
+
+    def tearDown(self):
+        self.master.close()
+        shutil.rmtree(self.path)
+
+    def test_migrate(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        sdb = 'ts:daily_price:000001.SZ'
+        self.assertIs(sdb_meta(sdb), EQUITY_DAILY_PRICE_META)
+        arrs = {'2020-{:02d}-01'.format(m): np.round(np.random.rand(21, len(cols)) * 100, 2) for m in range(1, 13)}
+        # legacy values
+        db = XcLMDBAccessor(self.master, sdb, EQUITY_DAILY_PRICE_META)
+        for kk, vv in arrs.items():
+            db.txn.put(kk.encode(), pickle.dumps(vv))
+        db.txn.put(b'2021-01-01', b'NA')
+        db.commit()
+        db = XcLMDBAccessor(self.master, 'ts:calendar:', GENERAL_OBJ_META)
+        db.txn.put(b'first_date', pickle.dumps('20100104'))
+        db.commit()
+
+        for sdb_path in self.master.sdb_names():
+            db = XcLMDBAccessor(self.master, sdb_path, sdb_meta(sdb_path))
+            db.migrate(batch_size=5)
+            db.commit()
+
+        db = XcLMDBAccessor(self.master, sdb, EQUITY_DAILY_PRICE_META)
+        self.assertEqual(db.migrate(batch_size=5), (13, 0))
+        for kk, vv in arrs.items():
+            val = db._db_get(kk.encode())
+            self.assertEqual(value_version(val), CODEC_VERSION)
+            np.testing.assert_array_equal(db.load(kk, raw_mode=True), vv)
+        self.assertEqual(db._db_get(b'2021-01-01'), NOT_EXIST)
+        db.commit()
+        db = XcLMDBAccessor(self.master, 'ts:calendar:', GENERAL_OBJ_META, readonly=True)
+        self.assertEqual(db.load('first_date'), '20100104')
+        db.commit()
+
+    def test_load_many(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        keys = ['2020-{:02d}-01'.format(m) for m in range(1, 13)]
+        chunks = {kk: pd.DataFrame(np.random.rand(21, len(cols)), columns=cols) for kk in keys[1:-1:2]}
+        for layout in [VLAYOUT.VL_ROW, VLAYOUT.VL_COLUMN]:
+            sdb = 'ts:daily_price:00000{}.SZ'.format(int(layout))
+            meta = dict(EQUITY_DAILY_PRICE_META, vlayout=layout)
+            db = XcLMDBAccessor(self.master, sdb, meta)
+            db.save_many(chunks)
+            db.commit()
+            for readonly in [True, False]:
+                db = XcLMDBAccessor(self.master, sdb, meta, readonly=readonly)
+                vals = db.load_many(keys, raw_mode=True, fields=['close', 'open'])
+                for kk, vv in zip(keys, vals):
+                    if kk in chunks:
+                        np.testing.assert_array_equal(vv, chunks[kk][['close', 'open']].values)
+                    else:
+                        self.assertIsNone(vv)
+                vals = db.load_many(list(reversed(keys)) + ['2021-01-01'])
+                self.assertIsNone(vals[-1])
+                self.assertTrue(vals[2].equals(chunks[keys[-3]]))
+                db.commit()
+
+    def test_save_through(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        sdb = 'ts:daily_price:000001.SZ'
+        val = np.round(np.random.rand(21, len(cols)) * 100, 2)
+        # sub-database not created by a readonly accessor
+        db = XcLMDBAccessor(self.master, sdb, EQUITY_DAILY_PRICE_META, readonly=True)
+        self.assertIsNone(db.load('2020-01-01'))
+        self.assertEqual(db.load_many(['2020-01-01']), [None])
+        np.testing.assert_array_equal(db.save_through('2020-01-01', pd.DataFrame(val, columns=cols), raw_mode=True), val)
+        # snapshot of the read transaction
+        self.assertIsNone(db.load('2020-01-01'))
+        db.commit()
+        db = XcLMDBAccessor(self.master, sdb, EQUITY_DAILY_PRICE_META, readonly=True)
+        np.testing.assert_array_equal(db.load('2020-01-01', raw_mode=True), val)
+        db.commit()
+
+    def test_accessor_pool(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        v1 = pd.DataFrame(np.random.rand(21, len(cols)), columns=cols)
+        rdb = self.master.accessor('ts:daily_price:000001.SZ', EQUITY_DAILY_PRICE_META, readonly=True)
+        self.assertIsNone(rdb.db)
+        rdb.commit()
+        db = self.master.accessor('ts:daily_price:000001.SZ', EQUITY_DAILY_PRICE_META)
+        db.save('2020-01-01', v1)
+        db.commit()
+        self.assertIs(self.master.accessor('ts:daily_price:000001.SZ', EQUITY_DAILY_PRICE_META), db)
+        db.commit()
+        # handle registered after the read transaction began
+        rdb = self.master.accessor('ts:daily_price:000002.SZ', EQUITY_DAILY_PRICE_META, readonly=True)
+        db = self.master.accessor('ts:daily_price:000002.SZ', EQUITY_DAILY_PRICE_META)
+        db.save('2020-01-01', v1)
+        db.commit()
+        self.assertTrue(rdb.select('ts:daily_price:000001.SZ'))
+        self.assertTrue(rdb.select('ts:daily_price:000002.SZ'))
+        np.testing.assert_array_equal(rdb.load('2020-01-01', raw_mode=True), v1.values)
+        rdb.commit()
+        self.assertIn('ts:daily_price:000002.SZ', self.master._dbis)
+
+    def test_open_during_write(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        v1 = pd.DataFrame(np.random.rand(21, len(cols)), columns=cols)
+        db = XcLMDBAccessor(self.master, 'ts:daily_price:000001.SZ', EQUITY_DAILY_PRICE_META)
+        db.save('2020-01-01', v1)
+        db.commit()
+        self.master.forget_sdb('ts:daily_price:000001.SZ')
+        # readers of other threads look up handles while a write transaction is pending
+        wdb = XcLMDBAccessor(self.master, 'ts:daily_price:000002.SZ', EQUITY_DAILY_PRICE_META)
+        out = {}
+
+        def read(code):
+            rdb = XcLMDBAccessor(self.master, 'ts:daily_price:' + code, EQUITY_DAILY_PRICE_META, readonly=True)
+            out[code] = None if rdb.db is None else rdb.load('2020-01-01', raw_mode=True).copy()
+            rdb.commit()
+
+        missing = threading.Thread(target=read, args=('000003.SZ',))
+        existing = threading.Thread(target=read, args=('000001.SZ',))
+        existing.start()
+        missing.start()
+        # a sub-database not exist is found without waiting for the writer
+        missing.join(10)
+        self.assertFalse(missing.is_alive())
+        self.assertIsNone(out['000003.SZ'])
+        wdb.save('2020-01-01', v1)
+        wdb.commit()
+        existing.join(10)
+        self.assertFalse(existing.is_alive())
+        np.testing.assert_array_equal(out['000001.SZ'], v1.values)
+        self.assertIn('ts:daily_price:000001.SZ', self.master._dbis)
+        self.assertNotIn('ts:daily_price:000003.SZ', self.master._dbis)
+
+    def test_drop_validity(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        keys = ['2020-{:02d}-01'.format(m) for m in range(1, 4)]
+        path = tempfile.mkdtemp()
+        table = XcLMDB(path, readonly=False, keyspace=KEYSPACE.KS_TABLE, tables=SDB_TABLES)
+        try:
+            for master in [self.master, table]:
+                for code in ['000001.SZ', '000002.SZ']:
+                    db = XcLMDBAccessor(master, 'ts:daily_price:' + code, EQUITY_DAILY_PRICE_META)
+                    db.save_many({kk: pd.DataFrame(np.random.rand(21, len(cols)), columns=cols) for kk in keys})
+                    db.set_validity(keys)
+                    db.commit()
+                db = XcLMDBAccessor(master, 'ts:daily_price:000001.SZ', EQUITY_DAILY_PRICE_META)
+                self.assertTrue(db.get_validity(keys).all())
+                db.drop()
+                db.commit()
+                db = XcLMDBAccessor(master, 'ts:daily_price:000001.SZ', EQUITY_DAILY_PRICE_META, readonly=True)
+                self.assertFalse(db.get_validity(keys).any())
+                self.assertEqual(db.load_many(keys), [None] * len(keys))
+                db.commit()
+                # the bitmap of the other path is kept
+                db = XcLMDBAccessor(master, 'ts:daily_price:000002.SZ', EQUITY_DAILY_PRICE_META, readonly=True)
+                self.assertTrue(db.get_validity(keys).all())
+                db.commit()
+        finally:
+            table.close()
+            shutil.rmtree(path)
+
+    def test_keyspace_table(self):
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        vals = {code: pd.DataFrame(np.random.rand(21, len(cols)), columns=cols) for code in ['000001.SZ', '000002.SZ']}
+        for code, val in vals.items():
+            db = XcLMDBAccessor(self.master, 'ts:daily_price:' + code, EQUITY_DAILY_PRICE_META)
+            db.save('2020-01-01', val)
+            db.commit()
+        path = tempfile.mkdtemp()
+        table = XcLMDB(path, readonly=False, keyspace=KEYSPACE.KS_TABLE, tables=SDB_TABLES)
+        try:
+            # values and the chunk records of the paths
+            self.assertEqual(self.master.copy_to(table), 4)
+            self.assertEqual(sorted(table.sdb_names()), ['ts:daily_price:', 'ts:meta:validity'])
+            db = XcLMDBAccessor(table, 'ts:daily_price:000002.SZ', EQUITY_DAILY_PRICE_META, readonly=True)
+            np.testing.assert_array_equal(db.load('2020-01-01', raw_mode=True), vals['000002.SZ'].values)
+            self.assertIsNone(db.load('2020-02-01'))
+            db.commit()
+            db = XcLMDBAccessor(table, 'ts:daily_price:', EQUITY_DAILY_PRICE_META, readonly=True)
+            self.assertEqual(sorted(db.load_range_all('2020-01-01', '2020-12-01', True)),
+                             ['ts:daily_price:000001.SZ', 'ts:daily_price:000002.SZ'])
+            db.commit()
+            with self.assertRaises(ValueError):
+                XcLMDB(self.path, readonly=False, keyspace=KEYSPACE.KS_TABLE)
+        finally:
+            table.close()
+            shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
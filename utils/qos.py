@@ -1,5 +1,24 @@
+import asyncio
+import json
+import os
 import time
-from threading import Lock
+from functools import partial
+from threading import Condition, Lock
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# days kept in the quota ledger
+LEDGER_DAYS = 7
+
+
+class QuotaExceededError(RuntimeError):
+    """
+    the daily quota of an endpoint is used up.
+    """
 
 
 class TokenBucket(object):
@@ -14,55 +33,331 @@ class TokenBucket(object):
             self._current_amount = capacity
         else:
             self._current_amount = 0
-        self._last_consume_time = time.time()
+        self._last_time = time.monotonic()
+
+    def _refill(self):
+        # 按经过的时间连续补充令牌(含小数部分)，不超过桶的容量
+        now = time.monotonic()
+        self._current_amount = min(self._current_amount + (now - self._last_time) * self._rate, self._capacity)
+        self._last_time = now
 
     def consume(self, token_amount=1):
         """
-        :param token_amount: token amount need take
+        :param token_amount: token amount need take, a request larger than the bucket takes the full bucket.
         :return:
             True  : ok
             False : not ok
         """
-        # 计算从上次发送到这次发送，新发放的令牌数量
-        offset = time.time() - self._last_consume_time
-        incr = int(offset * self._rate) if 1 <= offset else 0
-        # 令牌数量不能超过桶的容量
-        self._current_amount = min(incr + self._current_amount, self._capacity)
-        self._last_consume_time = time.time()
+        self._refill()
+        token_amount = min(token_amount, self._capacity)
         # 如果没有足够的令牌，则不能发送数据
         if token_amount > self._current_amount:
             return False
-        else:
-            self._current_amount -= token_amount
-            return True
+        self._current_amount -= token_amount
+        return True
 
-    def block_consume(self, token_amount=1, interval=5):
+    def delay(self, token_amount=1):
+        """
+        :return: seconds until token_amount is available
+        """
+        self._refill()
+        return max(min(token_amount, self._capacity) - self._current_amount, 0) / self._rate
+
+    def block_consume(self, token_amount=1):
         """
         :param token_amount: token amount need take
-        :param interval: sleep interval (second)
         """
         while not self.consume(token_amount):
-            time.sleep(interval)
+            time.sleep(self.delay(token_amount))
 
 
 class ThreadingTokenBucket(object):
     def __init__(self, rate, capacity, full=True):
         """
         rate_per_min = rate*60
-        e.g for a call which is 500/min limit, the token_amount for the call is rate*60/500
         :param rate: token per second
         :param capacity: bucket capacity
         """
-        self._lock = Lock()
+        self._cond = Condition(Lock())
         self._bucket = TokenBucket(rate, capacity, full)
 
     def consume(self, token_amount=1):
-        self._lock.acquire()
-        try:
+        with self._cond:
             return self._bucket.consume(token_amount)
-        finally:
-            self._lock.release()
 
-    def block_consume(self, token_amount=1, interval=5):
-        while not self.consume(token_amount):
-            time.sleep(interval)
+    def block_consume(self, token_amount=1, timeout=None):
+        """
+        waiters sleep on the condition until the time the tokens are refilled.
+        :param timeout: seconds, None to wait forever
+        :return: False if timed out
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._bucket.consume(token_amount):
+                delay = self._bucket.delay(token_amount)
+                if deadline is not None:
+                    if time.monotonic() + delay > deadline:
+                        return False
+                self._cond.wait(delay)
+        return True
+
+    def reset(self, rate, capacity):
+        """
+        change the budget, waiters recompute their waiting time.
+        """
+        with self._cond:
+            self._bucket = TokenBucket(rate, capacity, full=False)
+            self._cond.notify_all()
+
+
+class AsyncTokenBucket(object):
+    def __init__(self, rate, capacity, full=True):
+        """
+        token bucket of coroutines, consume() sleeps until the tokens are refilled instead of polling.
+        :param rate: token per second
+        :param capacity: bucket capacity
+        """
+        self._bucket = TokenBucket(rate, capacity, full)
+        self._executor = False
+        self._lock = None
+        self._loop = None
+
+    @classmethod
+    def wrap(cls, bucket, executor=False):
+        """
+        :param bucket: bucket with consume() and delay(), e.g. SharedTokenBucket
+        :param executor: bucket.take() blocks(file lock and I/O of SharedTokenBucket), it's called in the default
+                         executor of the loop instead of consume()/delay().
+        """
+        obj = cls.__new__(cls)
+        obj._bucket = bucket
+        obj._executor = executor
+        obj._lock = None
+        obj._loop = None
+        return obj
+
+    async def consume(self, token_amount=1):
+        """
+        wait for the tokens, waiters are served in order.
+        :param token_amount: token amount need take
+        """
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            # the lock is bound to the loop
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            if self._executor:
+                while True:
+                    delay = await loop.run_in_executor(None, self._bucket.take, token_amount)
+                    if delay == 0:
+                        return
+                    await asyncio.sleep(delay)
+            while not self._bucket.consume(token_amount):
+                await asyncio.sleep(self._bucket.delay(token_amount))
+
+
+class RateLimiters(object):
+    """
+    registry of token buckets per endpoint, the budgets are declared in one table, e.g.
+    {None: (500, 8), 'daily_basic': (700, 8, 100000)}, endpoint: (calls per minute, burst calls[, calls per day]),
+    None for other endpoints. calls per day is only checked by SharedRateLimiters.
+    """
+
+    def __init__(self, limits, bucket=ThreadingTokenBucket):
+        """
+        :param limits: budget table
+        :param bucket: ThreadingTokenBucket, or AsyncTokenBucket for coroutines
+        """
+        self.limits = limits
+        self._bucket = bucket
+        self._buckets = {}
+        self._lock = Lock()
+
+    def get(self, endpoint):
+        """
+        :return: bucket of the endpoint, one token per call.
+        """
+        bucket = self._buckets.get(endpoint)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(endpoint)
+                if bucket is None:
+                    bucket = self._buckets[endpoint] = self._create(endpoint)
+        return bucket
+
+    def budget(self, endpoint):
+        """
+        :return: calls per second, burst calls, calls per day(None if unlimited)
+        """
+        limit = self.limits.get(endpoint, self.limits[None])
+        return limit[0] / 60.0, limit[1], limit[2] if len(limit) > 2 else None
+
+    def _create(self, endpoint):
+        rate, burst, _ = self.budget(endpoint)
+        return self._bucket(rate, burst)
+
+    def block_consume(self, endpoint, calls=1):
+        self.get(endpoint).block_consume(calls)
+
+
+class SharedRateLimiters(RateLimiters):
+    """
+    buckets and daily quota ledger of the endpoints in a state file shared by the processes of the host(next to the
+    LMDB environment), so separate updaters and readers share one budget. the file is locked for every call,
+    tokens are refilled by the wall clock.
+    """
+
+    def __init__(self, path, limits, bucket=ThreadingTokenBucket):
+        """
+        :param path: state file, JSON
+        :param bucket: ThreadingTokenBucket(block_consume), or AsyncTokenBucket for coroutines
+        """
+        super(SharedRateLimiters, self).__init__(limits, bucket)
+        self.path = path
+        # the file lock is per process, threads are excluded by the lock
+        self._flock = Lock()
+        self._fd = None
+
+    def _create(self, endpoint):
+        bucket = SharedTokenBucket(self, endpoint)
+        if self._bucket is AsyncTokenBucket:
+            return AsyncTokenBucket.wrap(bucket, executor=True)
+        return bucket
+
+    def _update(self, func):
+        """
+        func(state) under the file lock, state is written back if func returns (result, True).
+        """
+        with self._flock:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+            fd = self._fd
+            os.lseek(fd, 0, os.SEEK_SET)
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            try:
+                data = b''
+                while True:
+                    buf = os.read(fd, 0x10000)
+                    if not buf:
+                        break
+                    data += buf
+                state = json.loads(data.decode()) if data else {}
+                state.setdefault('buckets', {})
+                state.setdefault('ledger', {})
+                out, dirty = func(state)
+                if dirty:
+                    data = json.dumps(state).encode()
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.write(fd, data)
+                    os.ftruncate(fd, len(data))
+            finally:
+                os.lseek(fd, 0, os.SEEK_SET)
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        return out
+
+    def take(self, endpoint, calls=1, peek=False):
+        """
+        :param peek: only compute the delay
+        :return: 0 if the calls are taken, else seconds until the tokens are available
+        """
+        rate, burst, per_day = self.budget(endpoint)
+
+        def _take(state):
+            now = time.time()
+            day = time.strftime('%Y%m%d', time.localtime(now))
+            ledger = state['ledger'].get(day, {})
+            if per_day is not None and ledger.get(endpoint, 0) + calls > per_day:
+                raise QuotaExceededError('daily quota of {} used up: {}/{}'.format(endpoint, ledger.get(endpoint, 0),
+                                                                                   per_day))
+            amount, last = state['buckets'].get(endpoint, (burst, now))
+            # the wall clock may step back
+            amount = min(amount + max(now - last, 0) * rate, burst)
+            need = min(calls, burst)
+            if need > amount:
+                return (need - amount) / rate, False
+            if peek:
+                return 0, False
+            state['buckets'][endpoint] = (amount - need, now)
+            ledger[endpoint] = ledger.get(endpoint, 0) + calls
+            state['ledger'][day] = ledger
+            for dd in sorted(state['ledger'])[:-LEDGER_DAYS]:
+                del state['ledger'][dd]
+            return 0, True
+
+        return self._update(_take)
+
+    def ledger(self, day=None):
+        """
+        :param day: '%Y%m%d', default today
+        :return: {endpoint: calls}
+        """
+        day = day or time.strftime('%Y%m%d')
+        return self._update(lambda state: (state['ledger'].get(day, {}), False))
+
+    def close(self):
+        with self._flock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class SharedTokenBucket(object):
+    """
+    bucket of an endpoint in SharedRateLimiters, interface of ThreadingTokenBucket.
+    """
+
+    def __init__(self, limiters, endpoint):
+        self.limiters = limiters
+        self.endpoint = endpoint
+
+    def take(self, token_amount=1):
+        """
+        :return: 0 if taken, else seconds until the tokens are available
+        """
+        return self.limiters.take(self.endpoint, token_amount)
+
+    def consume(self, token_amount=1):
+        return self.take(token_amount) == 0
+
+    def delay(self, token_amount=1):
+        return self.limiters.take(self.endpoint, token_amount, peek=True)
+
+    def block_consume(self, token_amount=1, timeout=None):
+        """
+        other processes can't notify the waiters, sleep until the tokens are refilled and try again.
+        :return: False if timed out
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.take(token_amount)
+            if delay == 0:
+                return True
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+
+
+class RateLimitedApi(object):
+    """
+    api proxy, every call of api.<endpoint>(...) waits for the budget of the endpoint.
+    """
+
+    def __init__(self, api, limiters):
+        self.api = api
+        self.limiters = limiters
+
+    def _call(self, endpoint, *args, **kwargs):
+        self.limiters.block_consume(endpoint)
+        return getattr(self.api, endpoint)(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return partial(self._call, name)
@@ -12,6 +12,10 @@ XTUS_FREQ_BARS = {'1min': 240, '5min': 48, '15min': 16, '30min': 8, '60min': 4}
 DATE_FORMAT = '%Y%m%d'
 DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+# chunk granularity of daily-keyed datasets (layout META 'chunk'): months per chunk, max trading days per chunk.
+XTUS_CHUNK_MONTHS = {'M': 1, 'Q': 3, 'Y': 12}
+XTUS_CHUNK_DAYS = {'M': 23, 'Q': 66, 'Y': 250}
+
 
 def nadata_iter(ar_flags, max_length):
     """
@@ -168,6 +172,30 @@ def QUARTER_END(date, trade_days=None):
     return None
 
 
+def CHUNK_START(date, chunk='M'):
+    """
+    first day of the chunk(month/quarter/year) which the date belongs to.
+    :param date:
+    :param chunk: 'M', 'Q', 'Y'
+    :return:
+    """
+    dd = pd.Timestamp(date)
+    nmon = XTUS_CHUNK_MONTHS[chunk]
+    mday = pd.Timestamp(year=dd.year, month=(dd.month - 1) // nmon * nmon + 1, day=1)
+    return mday.to_datetime64().astype('M8[D]')
+
+
+def CHUNK_END(date, chunk='M'):
+    """
+    last day of the chunk(month/quarter/year) which the date belongs to.
+    """
+    dd = pd.Timestamp(date)
+    nmon = XTUS_CHUNK_MONTHS[chunk]
+    mday = pd.Timestamp(year=dd.year, month=(dd.month - 1) // nmon * nmon + nmon, day=1)
+    mday = pd.Timestamp(year=mday.year, month=mday.month, day=mday.days_in_month)
+    return mday.to_datetime64().astype('M8[D]')
+
+
 # from pytz import UTC
 
 def _compute_all_minutes(opens_in_ns, closes_in_ns, periods, sections):
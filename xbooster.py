@@ -25,17 +25,20 @@ class XcTusBooster(XcReaderBasic, XcReaderFinance, XcReaderPrice):
 
     @lazyval
     def netloader(self) -> TusNetLoader:
-        return netloader_init()
+        return netloader_init(self.master_db.name)
 
-    def __init__(self, last_day=None, dbtype=DBTYPE.DB_LMDB):
+    def __init__(self, last_day=None, dbtype=DBTYPE.DB_LMDB, db_name=None, readonly=False, keyspace=None):
         """
         :param last_day: Tushare last date with data available,
                             we assume yesterday's data is available in today.
+        :param db_name: path of the database, default LMDB_NAME
+        :param readonly: open the database readonly, only cached data can be read(worker processes, ...)
+        :param keyspace: KEYSPACE of the database, default LMDB_KEYSPACE
         """
         if dbtype == DBTYPE.DB_LMDB:
-            self.master_db = XcLMDB(LMDB_NAME, readonly=False)
+            self.master_db = XcLMDB(db_name or LMDB_NAME, readonly=readonly, keyspace=keyspace, tables=SDB_TABLES)
             self.acc = XcLMDBAccessor
-            self.facc = partial(XcLMDBAccessor, self.master_db)
+            self.facc = self.master_db.accessor
 
             # , write_buffer_size = 0x400000, block_size = 0x4000,
             # max_file_size = 0x1000000, lru_cache_size = 0x100000, bloom_filter_bits = 0
@@ -0,0 +1,168 @@
+"""
+In-process LRU caches of decoded chunks and assembled results.
+
+Backtest loops read overlapping windows of the same codes again and again, every read decodes(decompress, fixed-point,
+unpickle legacy values) the same chunks. Readonly accessors keep the decoded ndarray of TPV_DFRAME values here, keyed
+by (database, sub-database path, db key), total size limited by a byte budget, the least recently used ones are evicted.
+The database is the path of the environment(XcLMDB.name), databases opened in one process share the budget but not the
+values, entries of a database are dropped when it's closed.
+Cached arrays are readonly and shared by all readers, copy before modification.
+
+Writes through XcAccessor(save/save_many/remove) invalidate the keys, in the same process only: a long running reader
+doesn't see the updates of an updater process, call chunk_cache().clear() and result_cache().clear() after it.
+Every invalidation bumps the generation, decoded values read from a transaction begun before it are not cached,
+so the cache never returns a value older than the last write.
+
+The result cache keeps the rows assembled by range readers(get_price_daily, ...)
+per (database, sub-database path, columns), over the widest range read so far, see XcReaderPrice._read_chunks.
+"""
+import threading
+from collections import OrderedDict
+
+# default byte budget of the chunk cache
+CHUNK_CACHE_SIZE = 256 * 0x100000
+# default byte budget of the result cache
+RESULT_CACHE_SIZE = 256 * 0x100000
+
+
+class XcChunkCache(object):
+    """
+    byte budgeted LRU cache of readonly ndarray.
+    """
+
+    def __init__(self, budget=CHUNK_CACHE_SIZE):
+        """
+        :param budget: max bytes of cached arrays, 0 to disable.
+        """
+        self.budget = budget
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def sizeof(val):
+        return val.nbytes
+
+    def get(self, key):
+        """
+        :param key: (database, sdb path, db key)
+        :return: ndarray, None if not cached.
+        """
+        with self._lock:
+            val = self._items.get(key)
+            if val is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return val
+
+    def put(self, key, val, generation=None):
+        """
+        :param key: (database, sdb path, db key)
+        :param val: decoded ndarray, readonly.
+        :param generation: generation when the value was read, not cached if invalidated since then.
+        :return: val
+        """
+        nbytes = self.sizeof(val)
+        if nbytes > self.budget:
+            return val
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return val
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= self.sizeof(old)
+            self._items[key] = val
+            self.nbytes += nbytes
+            while self.nbytes > self.budget:
+                _, old = self._items.popitem(last=False)
+                self.nbytes -= self.sizeof(old)
+        return val
+
+    def invalidate(self, db, sdb, keys=None):
+        """
+        :param db: database, see XcAccessor.cache_db
+        :param sdb: sub-database path
+        :param keys: db keys, None for all keys of the sub-database.
+        """
+        with self._lock:
+            self.generation += 1
+            if keys is None:
+                keys = [key[-1] for key in self._items if key[:-1] == (db, sdb)]
+            for kk in keys:
+                old = self._items.pop((db, sdb, kk), None)
+                if old is not None:
+                    self.nbytes -= self.sizeof(old)
+
+    def drop(self, db):
+        """
+        remove the entries of a database, when it's closed.
+        :param db: database, see XcAccessor.cache_db
+        """
+        with self._lock:
+            self.generation += 1
+            for key in [key for key in self._items if key[0] == db]:
+                self.nbytes -= self.sizeof(self._items.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._items.clear()
+            self.nbytes = 0
+
+    def resize(self, budget):
+        """
+        :param budget: max bytes, 0 to disable.
+        """
+        with self._lock:
+            self.budget = budget
+            while self.nbytes > self.budget:
+                _, old = self._items.popitem(last=False)
+                self.nbytes -= self.sizeof(old)
+
+    def stats(self):
+        """
+        :return: dict of budget, nbytes, entries, hits, misses
+        """
+        return dict(budget=self.budget, nbytes=self.nbytes, entries=len(self._items), hits=self.hits,
+                    misses=self.misses)
+
+
+class XcResultCache(XcChunkCache):
+    """
+    values are (first row, readonly ndarray of rows), keyed by (database, sdb path, columns).
+    """
+
+    @staticmethod
+    def sizeof(val):
+        return val[1].nbytes
+
+
+_cache = None
+_result_cache = None
+
+
+def chunk_cache():
+    """
+    the chunk cache shared by all accessors of the process.
+    :return: XcChunkCache
+    """
+    global _cache
+    if _cache is None:
+        _cache = XcChunkCache()
+    return _cache
+
+
+def result_cache():
+    """
+    the result cache of range readers.
+    :return: XcResultCache
+    """
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = XcResultCache(RESULT_CACHE_SIZE)
+    return _result_cache
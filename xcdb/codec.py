@@ -0,0 +1,404 @@
+"""
+Value codecs for cache database.
+
+Price, adj factor and daily info chunks are fixed dtype blocks ('f8'), pickle them is unnecessary.
+The raw codec stores a small header (layout version, dtype, shape) followed by the contiguous array bytes,
+so decoding is just np.frombuffer over the database buffer, no unpickling and no extra copy.
+
+Array data can be compressed (zlib/lzma, per sub-database, see layout.py 'compress'), optionally with a byte-shuffle
+pre-pass: bytes of the same significance of every element are grouped together, for float price data the exponent
+and high mantissa bytes are nearly constant, which compress much better after shuffle.
+
+The fixed-point codec is for OHLCV blocks: A-share prices are quoted to 0.01 yuan, so price columns are stored as
+int32 ticks and volume/amount as int64 (see layout.py 'fixed_point'), delta encoded along time, NaN (suspended bars)
+in a bit mask. It decodes back to float, if a block can't be represented exactly, raw codec is used instead.
+
+Every value stored by XcAccessor carries the header (self-describing), including pickled objects and the NOT_EXIST
+marker, the version byte selects the reader in _readers. Values without header are the legacy format (version 0, pickle
+or b'NA'), they are still readable, and can be re-encoded online by XcLMDBAccessor.migrate (cmdline 'migrate').
+When the format changes, bump CODEC_VERSION and register a reader of the new version, keep the older ones.
+
+Record layout:
+    | magic(3) | version(1) | codec(1) | ndim(1) | dtype_len(1) | flags(1) | dtype str | shape(uint32 * ndim) |
+    | padding to 8 bytes | array data |
+    flags: bit0-3 compressor, bit4 byte-shuffle
+    array data of fixed-point codec:
+    | (itemsize(uint8), scale(int64)) * ncols | nan mask bits | deltas of column 0 | deltas of column 1 | ...
+"""
+import lzma
+import pickle
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+
+import numpy as np
+
+CODEC_MAGIC = b'\x93XC'
+CODEC_VERSION = 1
+
+_HEAD = struct.Struct('<3sBBBBB')
+_FIXED_COL = struct.Struct('<Bq')
+_int_dtypes = {n: np.dtype('<i{}'.format(n)) for n in (1, 2, 4, 8)}
+_SHAPE_FMT = ['<{}I'.format(n) for n in range(33)]
+_ALIGN = 8
+
+# dtype kinds which can be stored as raw bytes: bool, int, uint, float, complex, timedelta, datetime, unicode.
+_RAW_KINDS = 'biufcmMU'
+
+
+class CODEC(IntEnum):
+    CD_RAW = 1  # header + raw contiguous ndarray bytes
+    CD_FIXED = 2  # header + fixed-point integer deltas, decode to float
+    CD_PICKLE = 3  # header + pickle, objects and ndarray of object dtype
+    CD_NA = 4  # header only, value not exist (NOT_EXIST)
+
+
+class COMPRESS(IntEnum):
+    CP_NONE = 0
+    CP_ZLIB = 1
+    CP_LZMA = 2
+
+
+FLAG_SHUFFLE = 0x10
+_COMPRESS_MASK = 0x0f
+
+_compressors = {
+    COMPRESS.CP_ZLIB: (lambda b: zlib.compress(b, 6), zlib.decompress),
+    COMPRESS.CP_LZMA: (lambda b: lzma.compress(b, preset=1), lzma.decompress),
+}
+
+_pool = None
+
+
+def codec_pool():
+    """
+    thread pool to encode values of bulk writes, zlib/lzma release the GIL while compressing.
+    :return:
+    """
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=4)
+    return _pool
+
+
+def byte_shuffle(arr):
+    """
+    group the bytes of same significance together.
+    :param arr: contiguous ndarray
+    :return: bytes
+    """
+    raw = arr.reshape(-1).view(np.uint8).reshape(-1, arr.dtype.itemsize)
+    return raw.T.tobytes()
+
+
+def byte_unshuffle(buf, dtype, count):
+    """
+    reverse of byte_shuffle
+    :param buf:
+    :param dtype:
+    :param count: elements number
+    :return: ndarray, 1D
+    """
+    raw = np.frombuffer(buf, dtype=np.uint8, count=count * dtype.itemsize).reshape(dtype.itemsize, count)
+    return raw.T.copy().view(dtype).reshape(-1)
+
+
+def raw_codec_support(dtype):
+    """
+    check if the dtype can be encoded by raw codec.
+    :param dtype:
+    :return:
+    """
+    dtype = np.dtype(dtype)
+    return dtype.kind in _RAW_KINDS and not dtype.hasobject
+
+
+def is_coded(buf):
+    """
+    check if the db value is written by codec (has codec header).
+    :param buf: bytes or memoryview
+    :return:
+    """
+    return buf[:3] == CODEC_MAGIC
+
+
+def value_version(buf):
+    """
+    :param buf: db value
+    :return: format version, 0 for legacy values without header.
+    """
+    if is_coded(buf):
+        return buf[3]
+    return 0
+
+
+_dtype_cache = {}
+
+
+def _to_dtype(dtstr):
+    """
+    np.dtype() is slow compared with decoding a small chunk, cache it.
+    """
+    dtype = _dtype_cache.get(dtstr)
+    if dtype is None:
+        dtype = _dtype_cache[dtstr] = np.dtype(dtstr.decode())
+    return dtype
+
+
+def _pack_head(codec, dtype, shape, flags):
+    """
+    :return: header bytes, padded to 8 bytes alignment.
+    """
+    dtstr = dtype.str.encode() if dtype is not None else b''
+    head = _HEAD.pack(CODEC_MAGIC, CODEC_VERSION, codec, len(shape), len(dtstr), flags)
+    shape = struct.pack(_SHAPE_FMT[len(shape)], *shape)
+    size = len(head) + len(dtstr) + len(shape)
+    return b''.join([head, dtstr, shape, b'\x00' * (-size % _ALIGN)])
+
+
+def encode_ndarray(arr, compress=COMPRESS.CP_NONE, shuffle=False):
+    """
+    encode ndarray to header + raw bytes.
+    :param arr: ndarray, dtype must be supported by raw codec.
+    :param compress: COMPRESS
+    :param shuffle: byte-shuffle before compress, only used if compress.
+    :return: bytes
+    """
+    arr = np.ascontiguousarray(arr)
+    flags = 0
+    if compress != COMPRESS.CP_NONE:
+        flags = int(compress)
+        if shuffle and arr.dtype.itemsize > 1:
+            flags |= FLAG_SHUFFLE
+            data = byte_shuffle(arr)
+        else:
+            data = arr.tobytes()
+        data = _compressors[compress][0](data)
+    else:
+        data = arr.tobytes()
+
+    return _pack_head(CODEC.CD_RAW, arr.dtype, arr.shape, flags) + data
+
+
+def encode_fixed(arr, spec, compress=COMPRESS.CP_NONE):
+    """
+    encode float block to fixed-point integer deltas.
+    :param arr: 1D or 2D float ndarray, rows along time.
+    :param spec: list of (int dtype, scale) of columns, e.g. [('i4', 100), ..., ('i8', 1000)]
+    :param compress: COMPRESS
+    :return: bytes, None if arr can't be represented exactly with spec.
+    """
+    if len(arr) == 0 or arr.ndim > 2:
+        return None
+    cols = arr.reshape(len(arr), -1)
+    if cols.shape[1] != len(spec):
+        return None
+    mask = np.isnan(cols)
+    pieces = [_FIXED_COL.pack(np.dtype(dt).itemsize, scale) for dt, scale in spec]
+    pieces.append(np.packbits(mask.reshape(-1)).tobytes())
+    for n, (dt, scale) in enumerate(spec):
+        col = cols[:, n]
+        vld = ~mask[:, n]
+        ticks = np.zeros(len(col), dtype=np.int64)
+        if vld.any():
+            scaled = col[vld] * scale
+            if not np.isfinite(scaled).all() or np.abs(scaled).max() >= np.iinfo(np.int64).max // 2:
+                return None
+            ticks[vld] = np.round(scaled)
+            if not (ticks[vld] / scale == col[vld]).all():
+                # not exact, e.g. price with 3 decimals.
+                return None
+            # NaN repeats the previous value, so its delta is 0.
+            idx = np.where(vld, np.arange(len(col)), 0)
+            np.maximum.accumulate(idx, out=idx)
+            ticks = ticks[idx]
+        deltas = np.diff(ticks, prepend=0)
+        info = np.iinfo(dt)
+        if deltas.max() > info.max or deltas.min() < info.min:
+            return None
+        pieces.append(deltas.astype(dt).tobytes())
+
+    data = b''.join(pieces)
+    flags = 0
+    if compress != COMPRESS.CP_NONE:
+        flags = int(compress)
+        data = _compressors[compress][0](data)
+    return _pack_head(CODEC.CD_FIXED, arr.dtype, arr.shape, flags) + data
+
+
+def _decode_fixed(data, offset, dtype, shape):
+    """
+    :param data: decompressed record
+    :param offset: start of array data
+    :return: float ndarray
+    """
+    count = shape[0]
+    ncols = shape[1] if len(shape) > 1 else 1
+    spec = struct.unpack_from('<' + 'Bq' * ncols, data, offset)
+    offset += _FIXED_COL.size * ncols
+    nmask = (count * ncols + 7) // 8
+    mask = np.frombuffer(data, dtype=np.uint8, count=nmask, offset=offset)
+    offset += nmask
+    out = np.empty((ncols, count), dtype=dtype)
+    # decode runs of columns with the same int type together
+    start = 0
+    while start < ncols:
+        itemsize = spec[2 * start]
+        end = start + 1
+        while end < ncols and spec[2 * end] == itemsize:
+            end += 1
+        deltas = np.frombuffer(data, dtype=_int_dtypes[itemsize], count=count * (end - start), offset=offset)
+        offset += deltas.nbytes
+        ticks = np.cumsum(deltas.reshape(end - start, count), axis=1, dtype=np.int64)
+        # divide (not multiply by 1/scale), so ticks / scale gives back exactly the encoded float.
+        np.divide(ticks, np.array(spec[2 * start + 1:2 * end:2])[:, None], out=out[start:end])
+        start = end
+    if mask.any():
+        out[np.unpackbits(mask)[:count * ncols].view(bool).reshape(count, ncols).T] = np.nan
+    out = np.ascontiguousarray(out.T)
+    return out.reshape(shape)
+
+
+NA_VALUE = _pack_head(CODEC.CD_NA, None, (), 0)
+LEGACY_NA = b'NA'
+
+
+def is_na(buf):
+    """
+    check if the db value is the value not exist marker.
+    :param buf:
+    :return:
+    """
+    return buf == NA_VALUE or buf == LEGACY_NA
+
+
+def decode_ndarray(buf, copy=False):
+    """
+    decode ndarray from header + raw bytes.
+    Note: if not copy and not compressed, the output array is a readonly view of buf, it is only valid while buf
+        is alive. (for lmdb buffers, until the transaction end.)
+    :param buf: bytes or memoryview
+    :param copy: copy data out of buf.
+    :return: ndarray
+    """
+    magic, version, codec, ndim, dtlen, flags = _HEAD.unpack_from(buf, 0)
+    if magic != CODEC_MAGIC or codec not in (CODEC.CD_RAW, CODEC.CD_FIXED):
+        raise ValueError('Unknown codec: {}-{}'.format(version, codec))
+    offset = _HEAD.size
+    dtype = _to_dtype(bytes(buf[offset:offset + dtlen]))
+    offset += dtlen
+    shape = struct.unpack_from(_SHAPE_FMT[ndim], buf, offset)
+    offset += 4 * ndim
+    offset += -offset % _ALIGN
+    count = 1
+    for nn in shape:
+        count *= nn
+    compress = flags & _COMPRESS_MASK
+    if codec == CODEC.CD_FIXED:
+        if compress != COMPRESS.CP_NONE:
+            return _decode_fixed(_compressors[compress][1](buf[offset:]), 0, dtype, shape)
+        return _decode_fixed(buf, offset, dtype, shape)
+    if compress != COMPRESS.CP_NONE:
+        data = _compressors[compress][1](buf[offset:])
+        if flags & FLAG_SHUFFLE:
+            arr = byte_unshuffle(data, dtype, count)
+        else:
+            arr = np.frombuffer(data, dtype=dtype, count=count)
+    else:
+        arr = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+
+    arr = arr.reshape(shape)
+    if copy and not arr.flags.writeable:
+        arr = arr.copy()
+    return arr
+
+
+def pack_object(obj):
+    """
+    serialize python object by pickle, with codec header.
+    :param obj:
+    :return:
+    """
+    return _pack_head(CODEC.CD_PICKLE, None, (), 0) + pickle.dumps(obj)
+
+
+def pack_array(arr, compress=COMPRESS.CP_NONE, shuffle=False, fixed=None):
+    """
+    serialize ndarray, use fixed-point/raw codec if possible, else pickle.
+    :param arr:
+    :param compress:
+    :param shuffle:
+    :param fixed: fixed-point spec of columns, see encode_fixed.
+    :return:
+    """
+    if fixed is not None and arr.dtype.kind == 'f':
+        buf = encode_fixed(arr, fixed, compress)
+        if buf is not None:
+            return buf
+    if raw_codec_support(arr.dtype):
+        return encode_ndarray(arr, compress, shuffle)
+    return pack_object(arr)
+
+
+_readers = {}
+
+
+def register_reader(version):
+    """
+    register reader function(buf, copy) of a format version.
+    """
+    def deco(func):
+        _readers[version] = func
+        return func
+    return deco
+
+
+@register_reader(0)
+def _read_legacy(buf, copy):
+    if buf == LEGACY_NA:
+        return None
+    return pickle.loads(buf)
+
+
+@register_reader(1)
+def _read_v1(buf, copy):
+    codec = buf[4]
+    if codec == CODEC.CD_PICKLE:
+        return pickle.loads(buf[_HEAD.size:])
+    if codec == CODEC.CD_NA:
+        return None
+    return decode_ndarray(buf, copy)
+
+
+def unpack_value(buf, copy=False):
+    """
+    deserialize value which is serialized by pack_array/pack_object, or in legacy format.
+    :param buf:
+    :param copy: copy data out of buf for raw codec.
+    :return: None for NOT_EXIST marker.
+    """
+    version = value_version(buf)
+    reader = _readers.get(version)
+    if reader is None:
+        raise ValueError('Unknown value format version: {}'.format(version))
+    return reader(buf, copy)
+
+
+def repack_value(buf):
+    """
+    re-encode db value to current format, without metadata (no compress/fixed point).
+    :param buf:
+    :return: bytes, None if already in current format.
+    """
+    if value_version(buf) == CODEC_VERSION:
+        return None
+    val = unpack_value(buf, copy=True)
+    if val is None:
+        return NA_VALUE
+    if isinstance(val, np.ndarray) and raw_codec_support(val.dtype):
+        return encode_ndarray(val)
+    if value_version(buf) == 0:
+        # keep the original pickle
+        return _pack_head(CODEC.CD_PICKLE, None, (), 0) + bytes(buf)
+    return pack_object(val)
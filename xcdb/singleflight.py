@@ -0,0 +1,107 @@
+"""
+Single-flight fetches of missed chunks.
+
+Readers sharing one booster(e.g. a research server at market open) miss the same chunks at the same time, each of them
+would fetch the chunk from network, spend the quota and write the same key. The missed keys are claimed here per
+(sub-database path, db key) before fetching: a caller fetches the keys nobody else is fetching, and waits for the
+results of the keys in flight. Overlapping ranges are merged this way, the second reader only fetches the chunks out
+of the first one's range.
+
+Only the fetches in flight are shared, a reader which missed the key just before the fetch finished fetches it again.
+"""
+import threading
+
+# max seconds to wait for a fetch of another reader, then fetch it again
+SF_TIMEOUT = 120
+
+
+class _Flight(object):
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class XcSingleFlight(object):
+    """
+    registry of the keys in flight.
+    """
+
+    def __init__(self, timeout=SF_TIMEOUT):
+        self.timeout = timeout
+        self.leads = 0
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def run(self, sdb, keys, fetch):
+        """
+        :param sdb: sub-database path
+        :param keys: missed db keys
+        :param fetch: fetch(idx), values of [keys[n] for n in idx], idx is the positions claimed by the caller.
+        :return: list of values of keys
+        """
+        flights = []
+        mine = []
+        with self._lock:
+            for n, kk in enumerate(keys):
+                fl = self._flights.get((sdb, kk))
+                if fl is None:
+                    fl = self._flights[(sdb, kk)] = _Flight()
+                    mine.append(n)
+                flights.append(fl)
+            self.leads += len(mine)
+            self.shared += len(keys) - len(mine)
+
+        vals = [None] * len(keys)
+        if mine:
+            try:
+                for n, vv in zip(mine, fetch(mine)):
+                    vals[n] = flights[n].value = vv
+            except BaseException as e:
+                for n in mine:
+                    flights[n].error = e
+                raise
+            finally:
+                with self._lock:
+                    for n in mine:
+                        del self._flights[(sdb, keys[n])]
+                for n in mine:
+                    flights[n].event.set()
+
+        # fetch our own keys first, then wait for the others, no reader waits while holding keys.
+        mine = set(mine)
+        late = []
+        for n, fl in enumerate(flights):
+            if n in mine:
+                continue
+            if not fl.event.wait(self.timeout):
+                late.append(n)
+                continue
+            if fl.error is not None:
+                raise fl.error
+            vals[n] = fl.value
+        if late:
+            for n, vv in zip(late, fetch(late)):
+                vals[n] = vv
+        return vals
+
+    def stats(self):
+        """
+        :return: dict of keys fetched by the callers(leads), keys waited for(shared), keys in flight
+        """
+        return dict(leads=self.leads, shared=self.shared, inflight=len(self._flights))
+
+
+# created on import, readers of different threads must share one registry
+_single_flight = XcSingleFlight()
+
+
+def single_flight():
+    """
+    the single-flight registry of the process.
+    :return: XcSingleFlight
+    """
+    return _single_flight
@@ -0,0 +1,249 @@
+"""
+Write-behind queue of LMDB writes.
+LMDB has one writer at a time, parallel updater threads(cmdline cntus_update_*) each begin a write transaction per code
+and serialize on the writer lock, every commit syncs the map. With the queue, the threads encode(compress) the records
+in their own accessor and push them to the queue on commit(), one writer thread applies them in batched write
+transactions, committed by size(batch_bytes) or age(interval) of the pending records.
+
+A queued commit() returns before the records are in the database, readers see them after the batch is committed,
+call flush() before reading back(e.g. building cross sections from the updated prices).
+Validity bitmap updates and the chunk check are applied by the writer in the transaction of the records, like the
+direct accessors.
+Durability: every batch commit is synced unless the environment is opened with sync=False, then the writer syncs
+every sync_interval seconds and on flush(sync=True), a crash loses at most the records after the last sync.
+"""
+import atexit
+import queue
+import threading
+import time
+
+from logbook import Logger
+
+from .chunkcache import chunk_cache, result_cache
+from .xcdb import XcAccessor
+
+log = Logger('wqueue')
+
+# bytes of pending records to commit in one write transaction
+WQ_BATCH_BYTES = 16 * 0x100000
+# max seconds a record waits in the queue before committed
+WQ_INTERVAL = 0.5
+# max units(commits of queued accessors) in the queue, producers block when the writer is behind
+WQ_MAX_PENDING = 1024
+
+
+class XcQueuedAccessor(XcAccessor):
+    """
+    write only accessor, records are queued on commit(), see XcWriteQueue.accessor.
+    """
+
+    def __init__(self, wqueue, sdb, metadata=None):
+        self.wqueue = wqueue
+        self.master = wqueue.master
+        self.sdb_path = sdb
+        self.metadata = metadata
+        self._ops = []
+        self._nbytes = 0
+
+    def _db_put(self, key, val):
+        self._ops.append((key, bytes(val)))
+        self._nbytes += len(key) + len(val)
+
+    def _db_delete(self, key):
+        self._ops.append((key, None))
+        self._nbytes += len(key)
+
+    def _invalidate(self, dbkeys):
+        # invalidated by the writer after the batch is committed
+        pass
+
+    def set_validity(self, keys, valid=True):
+        """
+        the bitmap is read-modify-write, applied in the writer transaction.
+        """
+        if not self.track_validity or len(keys) == 0:
+            return
+        self._ops.append((None, (self.metadata, list(keys), valid)))
+
+    def check_chunk(self, record=False):
+        """
+        checked and recorded by the writer, in the transaction of the records.
+        """
+
+    def _db_get(self, key):
+        raise NotImplementedError('queued accessor is write only')
+
+    def _db_empty(self):
+        raise NotImplementedError('queued accessor is write only')
+
+    def load_range(self, kstart, kend, raw_mode):
+        raise NotImplementedError('queued accessor is write only')
+
+    def commit(self):
+        if self._ops:
+            self.wqueue.put((self.sdb_path, self.metadata, self._ops, self._nbytes))
+        self._ops = []
+        self._nbytes = 0
+
+
+class XcWriteQueue(object):
+    """
+    single writer of queued records, e.g.
+    wq = XcWriteQueue(master_db)
+    updater.facc = wq.accessor
+    ... parallel updates ...
+    wq.close()
+    """
+
+    def __init__(self, master, batch_bytes=WQ_BATCH_BYTES, interval=WQ_INTERVAL, sync_interval=None):
+        """
+        :param master: XcLMDB, writable
+        :param batch_bytes: commit when the pending records exceed it
+        :param interval: commit when the first pending record waits longer than it, seconds
+        :param sync_interval: for environment opened with sync=False, sync it every sync_interval seconds.
+        """
+        self.master = master
+        self.batch_bytes = batch_bytes
+        self.interval = interval
+        self.sync_interval = sync_interval
+        self.submitted = 0
+        self.committed = 0
+        self.batches = 0
+        self._queue = queue.Queue(WQ_MAX_PENDING)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._error = None
+        self._synced = time.time()
+
+    def accessor(self, sdb, metadata=None, readonly=False):
+        """
+        facc of updaters, readonly accessors read the database directly.
+        """
+        if readonly:
+            return self.master.accessor(sdb, metadata, readonly=True)
+        return XcQueuedAccessor(self, sdb, metadata)
+
+    def put(self, unit):
+        """
+        :param unit: (sdb path, metadata, records, bytes of records)
+        """
+        self._check()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='xcdb-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            self.submitted += 1
+        self._queue.put(unit)
+
+    def flush(self, sync=True, timeout=None):
+        """
+        wait until all queued records are committed.
+        :param sync: sync the environment to disk after, for environment opened with sync=False
+        :param timeout: seconds
+        :return: False if timed out
+        """
+        if self._thread is not None:
+            done = threading.Event()
+            self._queue.put(done)
+            if not done.wait(timeout):
+                return False
+        self._check()
+        if sync:
+            self.master.env.sync(True)
+            self._synced = time.time()
+        return True
+
+    def close(self, sync=True):
+        """
+        flush and stop the writer thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            atexit.unregister(self.close)
+            self._queue.put(None)
+            thread.join()
+        self._check()
+        if sync:
+            self.master.env.sync(True)
+
+    def stats(self):
+        """
+        :return: dict of submitted, committed units, batches, pending units
+        """
+        return dict(submitted=self.submitted, committed=self.committed, batches=self.batches,
+                    pending=self._queue.qsize())
+
+    def _check(self):
+        if self._error is not None:
+            raise RuntimeError('write queue failed: {}'.format(self._error))
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            units, nbytes, events = [], 0, []
+            deadline = time.time() + self.interval
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    # flush
+                    events.append(item)
+                    break
+                units.append(item)
+                nbytes += item[3]
+                timeout = deadline - time.time()
+                if nbytes >= self.batch_bytes or timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if units:
+                self._commit(units)
+            for ev in events:
+                ev.set()
+
+    def _commit(self, units):
+        """
+        apply the units in one write transaction.
+        """
+        if self._error is not None:
+            # records after a failed batch are dropped, the error is raised to the producers
+            return
+        acc = self.master.accessor(units[0][0], units[0][1])
+        try:
+            for sdb, metadata, ops, _ in units:
+                acc.metadata = metadata
+                acc.select(sdb)
+                if acc.track_validity and metadata['validity'] not in acc.meta_dbs:
+                    acc.meta_dbs[metadata['validity']] = acc._open_sdb(metadata['validity'])
+                if any(key is not None and val is not None for key, val in ops):
+                    acc.check_chunk(record=True)
+                for key, val in ops:
+                    if key is None:
+                        acc.set_validity(val[1], val[2])
+                    elif val is None:
+                        acc._db_delete(key)
+                    else:
+                        acc._db_put(key, val)
+            acc.commit()
+        except Exception as e:
+            log.error('write queue: batch of {} units failed: {}'.format(len(units), e))
+            self._error = e
+            acc.abort()
+            return
+
+        for sdb, metadata, ops, _ in units:
+            keys = [key for key, _ in ops if key is not None]
+            if keys:
+                chunk_cache().invalidate(self.master.name, sdb, keys)
+                result_cache().invalidate(self.master.name, sdb)
+        self.committed += len(units)
+        self.batches += 1
+        if self.sync_interval is not None and time.time() - self._synced >= self.sync_interval:
+            self.master.env.sync(True)
+            self._synced = time.time()
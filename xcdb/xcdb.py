@@ -3,6 +3,7 @@ numpy对象，做序列化（pickle）的时候，f4, f8, RAW, Unicode类型操
     object类型效率很低，原因可能是object是对象的引用，因此需要两层解析。
     结构体类型效率narray, 低于单一类型。
     pickle对structed_narray的读写效率，也略高于对recarray的效率(10%左右的提升)
+固定dtype的numpy对象(价格等)，不再pickle, 使用raw codec(header+原始数据)存储，读取时np.frombuffer直接解码。
 """
 import pickle
 from abc import abstractmethod
@@ -13,6 +14,9 @@ import pandas as pd
 from logbook import Logger
 from enum import IntEnum
 
+from .chunkcache import chunk_cache, result_cache
+from .codec import COMPRESS, NA_VALUE, codec_pool, is_na, pack_array, pack_object, repack_value, unpack_value
+
 log = Logger('xcdb')
 
 DBS_OPENED = {}
@@ -95,10 +99,73 @@ class IOFLAG(IntEnum):
     # UPDATE_ALL = 23  # Update all data
 
 
+class ChunkMissingError(LookupError):
+    """
+    chunks of the range are not stored in the database, read with IOFLAG.READ_DBONLY.
+    """
+
+
+class VLAYOUT(IntEnum):
+    VL_ROW = 0  # one value per key, 2D block of all columns
+    VL_COLUMN = 1  # one value per (key, field), 1D array of the column
+
+
+class KEYSPACE(IntEnum):
+    """
+    how sub-database paths are laid out in the backend
+    """
+    KS_SDB = 0  # one sub-database per path, e.g. 'ts:daily_price:000001.SZ'
+    KS_TABLE = 1  # one sub-database per table(path prefix, e.g. 'ts:daily_price:'), keys are code + KEY_SEP + key
+
+
+# separator of the code and the key in KS_TABLE, sorts before any char of codes, keys of a code are contiguous.
+KEY_SEP = b'\x00'
+
+
+"""
+if value not exist, use this valid to indicate.
+legacy marker b'NA' written by older version is also recognized, see codec.is_na
+"""
+NOT_EXIST = NA_VALUE
+
+"""
+validity bitmap of date keyed sub-database, bit n is set if the value of key n is stored and validated,
+n counts months(chunk keyed, META 'chunk') or days since VALIDITY_EPOCH.
+bitmaps are np.packbits uint8 arrays stored in sub-database META['validity'], keyed by the data sub-database path.
+"""
+VALIDITY_EPOCH = '1990-01-01'
+
 """
-if value not exist, use this valid to indicate 
+chunk of chunk keyed sub-database(META 'chunk'), recorded in sub-database META['validity'] with key
+sub-database path + CHUNK_KEY_SUFFIX when its values are first saved, values saved before the record are monthly.
+keys of another chunk are not compatible, e.g. the monthly value of 2020-01-01 would be read as the first quarter.
 """
-NOT_EXIST = b'NA'
+CHUNK_KEY_SUFFIX = b'#chunk'
+
+
+def validity_seq(keys, unit='D'):
+    """
+    positions of date keys in validity bitmap.
+    :param keys: datetime64 ndarray, or list of date keys(str/bytes)
+    :param unit: 'M' for chunk keyed, 'D' for daily keyed
+    :return: int64 ndarray
+    """
+    if not (isinstance(keys, np.ndarray) and keys.dtype.kind == 'M'):
+        keys = pd.to_datetime([force_string(kk) for kk in keys]).values
+    return (keys.astype('M8[{}]'.format(unit)) - np.datetime64(VALIDITY_EPOCH, unit)).astype(np.int64)
+
+
+def validity_test(bitmap, seqs):
+    """
+    :param bitmap: bool ndarray
+    :param seqs: positions, see validity_seq
+    :return: bool ndarray, False if out of bitmap
+    """
+    seqs = np.asarray(seqs)
+    out = np.zeros(seqs.shape, dtype=bool)
+    inside = (seqs >= 0) & (seqs < len(bitmap))
+    out[inside] = bitmap[seqs[inside]]
+    return out
 
 
 class XcAccessor(object):
@@ -114,6 +181,12 @@ class XcAccessor(object):
     _metadata = None
     tpkey = KVTYPE.TPK_RAW
     tpval = KVTYPE.TPV_DFRAME
+    colstore = False
+    master = None  # the database(XCacheDB) of the accessor
+    sdb_path = None  # path of the sub-database, key of its validity bitmap
+    readonly = False
+    cache_gen = None  # generation of chunk cache when the read transaction begins, see chunkcache.py
+    _dirty = ()  # db keys written in this transaction
 
     @property
     def metadata(self):
@@ -122,10 +195,121 @@ class XcAccessor(object):
     @metadata.setter
     def metadata(self, val):
         self._metadata = val
+        if val is None:
+            # unknown layout, values can only be accessed as raw db values(migrate)
+            return
         self.tpkey = val['tpk']
         self.tpval = val['tpv']
+        self.colstore = (self.tpval == KVTYPE.TPV_DFRAME and val.get('vlayout') == VLAYOUT.VL_COLUMN)
         return
 
+    @property
+    def track_validity(self):
+        """
+        if the validity bitmap is maintained, see META 'validity'
+        """
+        return self.metadata is not None and self.metadata.get('validity') is not None and self.sdb_path is not None
+
+    def load_validity(self):
+        """
+        :return: validity bitmap, bool ndarray
+        """
+        val = self._meta_get(self.metadata['validity'], force_bytes(self.sdb_path))
+        if not val or is_na(val):
+            return np.zeros((0,), dtype=bool)
+        return np.unpackbits(unpack_value(val)).astype(bool)
+
+    def _validity_seq(self, keys):
+        return validity_seq(keys, 'M' if self.metadata.get('chunk') else 'D')
+
+    def get_validity(self, keys):
+        """
+        :param keys: date keys, datetime64 ndarray or list of str
+        :return: bool ndarray, if the values of keys are stored and validated.
+        """
+        if not self.track_validity:
+            return np.zeros((len(keys),), dtype=bool)
+        self.check_chunk()
+        return validity_test(self.load_validity(), self._validity_seq(keys))
+
+    def set_validity(self, keys, valid=True):
+        """
+        mark keys in validity bitmap, in the same transaction of the data.
+        :param keys: date keys
+        :param valid: bool, or bool list aligned with keys
+        :return:
+        """
+        if not self.track_validity or len(keys) == 0:
+            return
+        seqs = self._validity_seq(keys)
+        flags = np.broadcast_to(np.asarray(valid, dtype=bool), seqs.shape)
+        bitmap = self.load_validity()
+        # bits out of bitmap are False already.
+        sel = (seqs >= 0) & (flags | (seqs < len(bitmap)))
+        seqs, flags = seqs[sel], flags[sel]
+        if len(seqs) == 0 or np.array_equal(validity_test(bitmap, seqs), flags):
+            return
+        if seqs.max() >= len(bitmap):
+            bitmap = np.concatenate([bitmap, np.zeros((seqs.max() + 1 - len(bitmap),), dtype=bool)])
+        bitmap[seqs] = flags
+        self._meta_put(self.metadata['validity'], force_bytes(self.sdb_path), pack_array(np.packbits(bitmap)))
+
+    def check_chunk(self, record=False):
+        """
+        check the chunk of META 'chunk' with the chunk the sub-database is saved in, see CHUNK_KEY_SUFFIX.
+        :param record: record the chunk if not yet, called before values are saved.
+        :raise ValueError: if the sub-database is saved in another chunk
+        """
+        chunk = self.metadata.get('chunk') if self.metadata is not None else None
+        if chunk is None or not self.track_validity:
+            return
+        key = force_bytes(self.sdb_path) + CHUNK_KEY_SUFFIX
+        val = self._meta_get(self.metadata['validity'], key)
+        if val and not is_na(val):
+            stored = force_string(unpack_value(val).tobytes())
+        elif len(self.load_validity()) or not self._db_empty():
+            # saved before the chunk is recorded
+            stored = 'M'
+        else:
+            stored = None
+        if stored is not None and stored != chunk:
+            raise ValueError('{} is saved in chunk {}, opened in chunk {}, erase it to change the chunk'.format(
+                self.sdb_path, stored, chunk))
+        if record and not val:
+            self._meta_put(self.metadata['validity'], key, pack_array(np.frombuffer(force_bytes(chunk), dtype='u1')))
+
+    def field_index(self, fields):
+        """
+        column positions of fields in metadata columns.
+        :param fields: list of column names
+        :return:
+        """
+        cols = self.metadata['columns']
+        return [cols.index(ff) for ff in fields]
+
+    def pack_array(self, arr, col=None):
+        """
+        serialize ndarray with compress/fixed_point options of metadata.
+        :param arr:
+        :param col: column position if arr is one column of columnar layout.
+        :return:
+        """
+        fixed = self.metadata.get('fixed_point')
+        if fixed is not None and col is not None:
+            fixed = fixed[col:col + 1]
+        return pack_array(arr, self.metadata.get('compress', COMPRESS.CP_NONE), self.metadata.get('shuffle', False),
+                          fixed)
+
+    @staticmethod
+    def to_col_key(key, field):
+        """
+        db key of one column in columnar layout: key|field
+        :param key: db key (bytes)
+        :param field:
+        :return:
+        """
+        return key + b'|' + force_bytes(field)
+
     def to_db_key(self, key):
         """
 
@@ -163,7 +347,7 @@ class XcAccessor(object):
                     dbval = val.values
                     if 'dtype' in self.metadata.keys():
                         dbval = dbval.astype(self.metadata['dtype'])
-                    return pickle.dumps(dbval), val
+                    return self.pack_array(dbval), val
                 else:
                     return None, pd.DataFrame(columns=self.metadata['columns'])
             else:
@@ -174,7 +358,7 @@ class XcAccessor(object):
                     dbval = val.values
                     if 'dtype' in self.metadata.keys():
                         dbval = dbval.astype(self.metadata['dtype'])
-                    return pickle.dumps(dbval), dbval
+                    return self.pack_array(dbval), dbval
                 else:
                     return None, pd.DataFrame(columns=self.metadata['columns'])
         elif self.tpval == KVTYPE.TPV_SERIES:
@@ -184,7 +368,7 @@ class XcAccessor(object):
                 dbval = val.values
                 if 'dtype' in self.metadata.keys():
                     dbval = dbval.astype(self.metadata['dtype'])
-                return pickle.dumps(dbval), val
+                return self.pack_array(dbval), val
         elif self.tpval == KVTYPE.TPV_INDEX:
             if isinstance(val, pd.Index):
                 val = val.values
@@ -193,9 +377,9 @@ class XcAccessor(object):
                     return NOT_EXIST, val
                 if 'dtype' in self.metadata.keys():
                     val = val.astype(self.metadata['dtype'])
-                return pickle.dumps(val), val
+                return self.pack_array(val), val
         elif self.tpval == KVTYPE.TPV_OBJECT:
-            return pickle.dumps(val), val
+            return pack_object(val), val
         else:
             return force_bytes(val), val
 
@@ -204,56 +388,379 @@ class XcAccessor(object):
     def to_val_out(self, val, raw_mode=False):
         """
 
-        :param val:
-        :param raw_mode: if use ndarray as app_val for output
+        :param val: bytes, or memoryview of database buffer.
+        :param raw_mode: if use ndarray as app_val for output,
+            Note: ndarray decoded in raw_mode may be a readonly view of val(zero copy).
         :return:
         """
         realval = val
         if self.tpval == KVTYPE.TPV_DFRAME:
             cols = self.metadata['columns']
             if not raw_mode:
-                if val == NOT_EXIST:
+                if is_na(val):
                     realval = pd.DataFrame(columns=cols)
                 else:
-                    dbval = pickle.loads(val)
+                    dbval = unpack_value(val, copy=True)
                     realval = pd.DataFrame(data=dbval, columns=cols)
             else:
-                if val == NOT_EXIST:
+                if is_na(val):
                     realval = np.empty((0, len(cols)))
                 else:
-                    dbval = pickle.loads(val)
+                    dbval = unpack_value(val)
                     realval = dbval
         elif self.tpval == KVTYPE.TPV_SERIES:
-            if val == NOT_EXIST:
+            if is_na(val):
                 realval = pd.Series()
             else:
-                dbval = pickle.loads(val)
+                dbval = unpack_value(val, copy=True)
                 realval = pd.Series(data=dbval)
         elif self.tpval == KVTYPE.TPV_INDEX:
-            if val == NOT_EXIST:
+            if is_na(val):
                 realval = np.empty((0,))
             else:
-                realval = pickle.loads(val)
+                realval = unpack_value(val, copy=not raw_mode)
         elif self.tpval == KVTYPE.TPV_OBJECT:
-            realval = pickle.loads(val)
+            realval = unpack_value(val)
 
         return realval
 
-    @abstractmethod
-    def load(self, key, raw_mode=False):
+    def repack(self, val):
+        """
+        re-encode db value to current format and metadata options(compress, fixed_point, ...).
+        :param val: db value
+        :return: bytes, None if nothing changed.
+        """
+        if self.metadata is None or self.colstore:
+            return repack_value(val)
+        dbval, appval = self.to_val_in(self.to_val_out(val))
+        if dbval is None or dbval == val:
+            return None
+        return dbval
+
+    @property
+    def cache_db(self):
+        """
+        database part of the chunk/result cache keys, the path of the environment.
+        """
+        return getattr(self.master, 'name', None)
+
+    @property
+    def cached(self):
+        """
+        if decoded values are kept in chunk cache, only for readonly accessors of TPV_DFRAME values.
+        """
+        return self.readonly and self.tpval == KVTYPE.TPV_DFRAME and self.sdb_path is not None and \
+            chunk_cache().budget > 0
+
+    def load(self, key, raw_mode=False, fields=None):
         """
 
         :param key:
         :param raw_mode: override value type for output.
+        :param fields: column projection for TPV_DFRAME values, None for all columns.
         :return:
         """
+        key = self.to_db_key(key)
+        if not key:
+            return None
+        if self.cached:
+            return self._load_cached([key], raw_mode, fields)[0]
+        if self.colstore:
+            return self._load_columns(key, raw_mode, fields, self._db_get)
+        return self._decode(self._db_get(key), raw_mode, fields)
+
+    def load_many(self, keys, raw_mode=False, fields=None):
+        """
+        read values of many keys, backends read them in one cursor sweep(see _db_get_many).
+        :param keys: list of keys, ascending order is the fastest.
+        :param raw_mode:
+        :param fields:
+        :return: list of values aligned with keys, None if the key not exist.
+        """
+        keys = [self.to_db_key(kk) for kk in keys]
+        if self.cached:
+            return self._load_cached(keys, raw_mode, fields)
+        if self.colstore:
+            cols = self.metadata['columns'] if fields is None else fields
+            dbkeys = [self.to_col_key(kk, ff) for kk in keys if kk for ff in cols]
+            vals = dict(zip(dbkeys, self._db_get_many(dbkeys)))
+            return [self._load_columns(kk, raw_mode, fields, vals.get) if kk else None for kk in keys]
+
+        dbkeys = [kk for kk in keys if kk]
+        vals = dict(zip(dbkeys, self._db_get_many(dbkeys)))
+        return [self._decode(vals[kk], raw_mode, fields) if kk else None for kk in keys]
+
+    def _load_cached(self, keys, raw_mode, fields):
+        """
+        load_many through chunk cache.
+        :param keys: db keys
+        """
+        cols = self.metadata['columns'] if fields is None else fields
+        if self.colstore:
+            dbkeys = [self.to_col_key(kk, ff) for kk in keys if kk for ff in cols]
+        else:
+            dbkeys = [kk for kk in keys if kk]
+        arrs = dict(zip(dbkeys, self._cached_arrays(dbkeys)))
+        out = []
+        for kk in keys:
+            val = None
+            if not kk:
+                pass
+            elif self.colstore:
+                vals = [arrs[self.to_col_key(kk, ff)] for ff in cols]
+                if all(vv is not None for vv in vals):
+                    val = vals[0].reshape(-1, 1) if len(vals) == 1 else np.column_stack(vals)
+            elif arrs[kk] is not None:
+                val = arrs[kk] if fields is None else arrs[kk][:, self.field_index(fields)]
+            if val is not None and not raw_mode:
+                val = pd.DataFrame(data=np.array(val), columns=cols)
+            out.append(val)
+        return out
+
+    def _cached_arrays(self, dbkeys):
+        """
+        decoded ndarray of db keys, the missed ones are read in one sweep and cached.
+        :return: list of readonly ndarray aligned with dbkeys, None if not exist.
+        """
+        cache = chunk_cache()
+        gen = cache.generation if self.cache_gen is None else self.cache_gen
+        db = self.cache_db
+        out = [cache.get((db, self.sdb_path, kk)) for kk in dbkeys]
+        missed = [n for n, vv in enumerate(out) if vv is None]
+        if missed:
+            for n, val in zip(missed, self._db_get_many([dbkeys[n] for n in missed])):
+                if not val:
+                    continue
+                if is_na(val):
+                    arr = np.empty((0,) if self.colstore else (0, len(self.metadata['columns'])))
+                else:
+                    arr = unpack_value(val, copy=True)
+                arr.flags.writeable = False
+                out[n] = cache.put((db, self.sdb_path, dbkeys[n]), arr, gen)
+        return out
+
+    def _invalidate(self, dbkeys):
+        """
+        drop written keys from chunk cache and the results of the sub-database from result cache,
+        again after the transaction is committed(see invalidate_dirty).
+        """
+        if self.tpval != KVTYPE.TPV_DFRAME or self.sdb_path is None or not dbkeys:
+            return
+        chunk_cache().invalidate(self.cache_db, self.sdb_path, dbkeys)
+        result_cache().invalidate(self.cache_db, self.sdb_path)
+        self._dirty = list(self._dirty) + list(dbkeys)
+
+    def invalidate_dirty(self):
+        """
+        called by backends after commit, readers may have cached the old values before the commit.
+        """
+        if self._dirty:
+            chunk_cache().invalidate(self.cache_db, self.sdb_path, self._dirty)
+            result_cache().invalidate(self.cache_db, self.sdb_path)
+            self._dirty = ()
+
+    def _decode(self, val, raw_mode, fields):
+        """
+        db value to app value with column projection.
+        """
+        if not val:
+            return None
+        val = self.to_val_out(val, raw_mode)
+        if fields is not None and self.tpval == KVTYPE.TPV_DFRAME:
+            if raw_mode:
+                val = val[:, self.field_index(fields)]
+            else:
+                val = val.loc[:, fields]
+        return val
+
+    def _load_columns(self, key, raw_mode, fields, get):
+        """
+        columnar layout, only decode the requested fields.
+        :param get: db value getter of column keys
+        """
+        if fields is None:
+            fields = self.metadata['columns']
+        vals = []
+        for ff in fields:
+            val = get(self.to_col_key(key, ff))
+            if not val:
+                return None
+            if is_na(val):
+                vals.append(np.empty((0,)))
+            else:
+                vals.append(unpack_value(val, copy=not raw_mode))
+        if len(vals) == 1:
+            dbval = vals[0].reshape(-1, 1)
+        else:
+            dbval = np.column_stack(vals)
+        if raw_mode:
+            return dbval
+        return pd.DataFrame(data=dbval, columns=fields)
+
+    def save(self, key, val, raw_mode=False):
+        """
+
+        :param key:
+        :param val:
+        :param raw_mode: if to use ndarray as app_val for output
+        :return: app_val
+        """
+        if val is None:
+            return
+        self.check_chunk(record=True)
+        dbvals, appval = self._encode(key, val, raw_mode)
+        for kk, vv in dbvals:
+            self._db_put(kk, vv)
+        if dbvals:
+            self._invalidate([kk for kk, _ in dbvals])
+            self.set_validity([key], False)
+        return appval
+
+    def save_many(self, items, raw_mode=False, valid=None):
+        """
+        bulk write, values are encoded(compressed) in the codec thread pool, then written in order.
+        :param items: dict/list of (key, val)
+        :param raw_mode:
+        :param valid: keys of items which are validated, marked in validity bitmap, the others are cleared.
+        :return: list of app_val
+        """
+        if isinstance(items, dict):
+            items = list(items.items())
+        items = [(kk, vv) for kk, vv in items if vv is not None]
+        if items:
+            self.check_chunk(record=True)
+        if self.metadata.get('compress', COMPRESS.CP_NONE) != COMPRESS.CP_NONE and len(items) > 1:
+            encoded = list(codec_pool().map(lambda x: self._encode(x[0], x[1], raw_mode), items))
+        else:
+            encoded = [self._encode(kk, vv, raw_mode) for kk, vv in items]
+
+        out = []
+        for dbvals, appval in encoded:
+            for kk, vv in dbvals:
+                self._db_put(kk, vv)
+            self._invalidate([kk for kk, _ in dbvals])
+            out.append(appval)
+
+        valid = set() if valid is None else set(valid)
+        self.set_validity([kk for kk, _ in items], [kk in valid for kk, _ in items])
+        return out
+
+    def _encode(self, key, val, raw_mode):
+        """
+        :return: list of (db_key, db_val) to write, app_val
+        """
+        key = self.to_db_key(key)
+        if self.colstore:
+            return self._encode_columns(key, val, raw_mode)
+        dbval, appval = self.to_val_in(val, raw_mode)
+        if key and dbval:
+            return [(key, dbval)], appval
+        return [], appval
+
+    def _encode_columns(self, key, val, raw_mode):
+        """
+        columnar layout, split the 2D block to one value per field.
+        """
+        cols = self.metadata['columns']
+        if not isinstance(val, pd.DataFrame):
+            return [], pd.DataFrame(columns=cols)
+        if val.empty:
+            dbvals = [(self.to_col_key(key, ff), NOT_EXIST) for ff in cols]
+            if raw_mode:
+                return dbvals, np.empty((0, len(cols)))
+            return dbvals, pd.DataFrame(columns=cols)
+
+        val = val.reindex(columns=cols)
+        dbval = val.values
+        if 'dtype' in self.metadata.keys():
+            dbval = dbval.astype(self.metadata['dtype'])
+        dbvals = [(self.to_col_key(key, ff), self.pack_array(dbval[:, n], n)) for n, ff in enumerate(cols)]
+        if raw_mode:
+            return dbvals, dbval
+        return dbvals, val
+
+    def remove(self, key):
+        """"""
+        key = self.to_db_key(key)
+        if key:
+            if self.colstore:
+                dbkeys = [self.to_col_key(key, ff) for ff in self.metadata['columns']]
+            else:
+                dbkeys = [key]
+            for kk in dbkeys:
+                self._db_delete(kk)
+            self._invalidate(dbkeys)
+            self.set_validity([key], False)
+
+    @abstractmethod
+    def _db_get(self, key):
+        """
+        :param key: db key, bytes
+        :return: db value, bytes or memoryview. None if not exist.
+        """
+
+    def _db_get_many(self, keys):
+        """
+        :param keys: list of db keys
+        :return: list of db values aligned with keys, None if not exist.
+        """
+        return [self._db_get(kk) for kk in keys]
 
     @abstractmethod
-    def save(self, key, val, raw_mode=None):
+    def _db_put(self, key, val):
         """"""
 
     @abstractmethod
-    def remove(self, key):
+    def _db_delete(self, key):
+        """"""
+
+    @abstractmethod
+    def _db_empty(self):
+        """
+        :return: True if no value is stored in the sub-database.
+        """
+
+    @abstractmethod
+    def select(self, sdb):
+        """
+        switch the accessor to another sub-database of the same META, in the same transaction if supported.
+        :param sdb: sub-database path
+        :return: False if the sub-database not exist.
+        """
+
+    def writer(self):
+        """
+        write accessor of the same sub-database, for readers on a readonly accessor to save the missed values.
+        the readonly snapshot is kept, values loaded from it are still valid; commit() the writer after saving.
+        :return: XcAccessor
+        """
+        return type(self)(self.master, self.sdb_path, self.metadata, readonly=False)
+
+    def save_through(self, key, val, raw_mode=False):
+        """
+        save() in a short write transaction of writer(), the missed value of a readonly accessor is cached
+        without holding the writer lock for the whole read.
+        :return: app_val
+        """
+        wdb = self.writer()
+        appval = wdb.save(key, val, raw_mode)
+        wdb.commit()
+        return appval
+
+    @abstractmethod
+    def _meta_get(self, sdb, key):
+        """
+        :param sdb: path of metadata sub-database(validity bitmap, ...)
+        :param key: bytes
+        :return: db value, None if not exist.
+        """
+
+    @abstractmethod
+    def _meta_put(self, sdb, key, val):
+        """"""
+
+    @abstractmethod
+    def _meta_delete(self, sdb, key):
         """"""
 
     @abstractmethod
@@ -29,6 +29,8 @@ class XcLevelDB(XCacheDB):
         self.db = DBS_OPENED[self.name]
 
     def close(self):
+        chunk_cache().drop(self.name)
+        result_cache().drop(self.name)
         if isinstance(self.db, plyvel.DB):
             self.db.close()
         else:
@@ -87,62 +89,77 @@ class XcLevelDBAccessor(XcAccessor):
 
     def __init__(self, master_db: XcLevelDB, sdb: str, metadata=None, readonly=False):
         self.master = master_db
+        self.sdb_path = sdb
         self.db = master_db.get_sdb(sdb)
         self.tpkey = metadata['tpk']
         self.tpval = metadata['tpv']
         self.metadata = metadata
+        self.readonly = readonly
         return
 
+    def select(self, sdb):
+        """
+        switch to another sub-database.
+        """
+        self.db = self.master.get_sdb(sdb)
+        self.sdb_path = sdb
+        return True
+
     def __del__(self):
         """"""
 
 
-    def load(self, key, vtype=None):
-        """
+    def _db_get(self, key):
+        """"""
+        return self.db.get(key)
 
-        :param key:
-        :param vtype: override value type for output.
-        :return:
+    def _db_get_many(self, keys):
         """
-        key = self.to_db_key(key)
-        if key:
-            val = self.db.get(key)
-            if val:
-                return self.to_val_out(val, vtype)
-        return None
-
-    def save(self, key, val, vtype=None):
+        one iterator sweep over [min(keys), max(keys)].
+        """
+        wanted = set(keys)
+        vals = {}
+        if wanted:
+            for kk, vv in self.db.iterator(start=min(wanted), stop=max(wanted), include_stop=True):
+                if kk in wanted:
+                    vals[kk] = vv
+        return [vals.get(kk) for kk in keys]
+
+    def _db_put(self, key, val):
         """"""
-        key = self.to_db_key(key)
-        dbval, appval = self.to_val_in(val, vtype)
-        if key and dbval:
-            self.db.put(key, dbval)
-        return appval
+        self.db.put(key, val)
 
-    def remove(self, key):
+    def _db_delete(self, key):
         """"""
-        key = self.to_db_key(key)
-        if key:
-            self.db.delete(key)
+        self.db.delete(key)
 
-    def commit(self):
+    def _db_empty(self):
+        """"""
+        for _ in self.db.iterator(include_value=False):
+            return False
+        return True
+
+    def _meta_get(self, sdb, key):
         """"""
+        return self.master.get_sdb(sdb).get(key)
 
-    def load_range(self, kstart, kend, vtype):
+    def _meta_put(self, sdb, key, val):
         """"""
-        # out = {}
-        # with self.txn.cursor(self.db) as cur:
-        #     bstr = cur.set_range(force_bytes(kstart))
-        #     if bstr:
-        #         while True:
-        #             k, v = cur.item()
-        #             sk = force_string(k)
-        #             out[sk] = self.to_val_out(v, vtype)
-        #             if sk >= kend:
-        #                 break
-        #             vld = cur.next()
-        #             if not vld:
-        #                 break
-        #     cur.close()
-        #
-        # return out
+        self.master.get_sdb(sdb).put(key, val)
+
+    def _meta_delete(self, sdb, key):
+        """"""
+        self.master.get_sdb(sdb).delete(key)
+
+    def commit(self):
+        """"""
+
+    def load_range(self, kstart, kend, raw_mode):
+        """
+        values of keys in [kstart, kend], one iterator sweep.
+        :return: dict
+        """
+        out = {}
+        for k, v in self.db.iterator(start=force_bytes(kstart), stop=force_bytes(kend), include_stop=True):
+            out[force_string(k)] = self.to_val_out(v, raw_mode)
+        return out
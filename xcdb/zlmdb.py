@@ -1,3 +1,6 @@
+import threading
+from collections import OrderedDict
+
 import lmdb
 from .xcdb import *
 from logbook import Logger
@@ -6,28 +9,121 @@ log = Logger('lmdb')
 
 LMDB_NAME = 'D:/Database/stock_db/TusDBv2'
 
+# idle accessors kept per thread, see XcLMDB.accessor
+ACCESSOR_POOL_SIZE = 32
+
+# keyspace of the database, see KEYSPACE. existing databases are converted by cntus_migrate_keyspace.
+LMDB_KEYSPACE = KEYSPACE.KS_SDB
+# max_dbs of KS_TABLE, the tables and other sub-databases. LMDB allocates and scans the DBI table of max_dbs.
+TABLE_MAX_DBS = 1024
+# sub-database recording the keyspace of the database
+KEYSPACE_SDB = 'xcdb:keyspace'
+
 
 class XcLMDB(XCacheDB):
     """
     Database for caching.
     """
 
-    def __init__(self, name, readonly=True, **kwargs):
+    def __init__(self, name, readonly=True, keyspace=None, tables=(), **kwargs):
+        """
+        :param keyspace: KEYSPACE, default LMDB_KEYSPACE. must be the keyspace the database was created with.
+        :param tables: path prefixes of the tables in KS_TABLE, e.g. layout.SDB_TABLES
+        """
         global DBS_OPENED
         self.name = name
+        self.readonly = readonly
+        self.keyspace = LMDB_KEYSPACE if keyspace is None else keyspace
+        # longest first, a table may be the prefix of another
+        self.tables = sorted(tables, key=len, reverse=True)
+        # sub-database path -> (sub-database name, key prefix), see split_path
+        self._paths = {}
+        # sub-database path -> (DBI handle, dbi_seq), a handle is valid for the environment once opened(see get_sdb)
+        self._dbis = {}
+        # number of handles registered, transactions begun before a handle is registered can't use it
+        self.dbi_seq = 0
+        self._dbi_lock = threading.Lock()
+        self._local = threading.local()
         log.info('LMDB version: {}'.format(lmdb.version()))
-        if not self.name in DBS_OPENED.keys():
+        shared = self.name in DBS_OPENED.keys()
+        if not shared:
             log.info('Open DB: {}'.format(self.name))
+            kwargs.setdefault('max_dbs', TABLE_MAX_DBS if self.keyspace == KEYSPACE.KS_TABLE else 1000000)
             DBS_OPENED[self.name] = lmdb.open(
-                self.name, create=True, max_dbs=1000000, readonly=readonly, map_size=64 * 0x40000000, **kwargs)
+                self.name, create=True, readonly=readonly, map_size=64 * 0x40000000, **kwargs)
         else:
             log.info("Already Opened, use exist one")
             # raise FileExistsError('Already opened')
 
         self.env = DBS_OPENED[self.name]
+        try:
+            self._check_keyspace()
+        except ValueError:
+            if shared:
+                # don't close the environment of other instances
+                self.env = None
+            raise
         self.show()
 
+    def _check_keyspace(self):
+        """
+        the keyspace is recorded when the database is created, the values would all be missed in another keyspace.
+        """
+        item = self.find_sdb(KEYSPACE_SDB, None)
+        if item is not None:
+            with self.env.begin(write=False) as txn:
+                stored = KEYSPACE(int(txn.get(b'keyspace', db=item[0])))
+        elif self.sdb_names():
+            # created before keyspaces were introduced
+            stored = KEYSPACE.KS_SDB
+        else:
+            stored = None
+
+        if stored is None:
+            if not self.readonly:
+                sdb = self.get_sdb(KEYSPACE_SDB)
+                with self.env.begin(write=True) as txn:
+                    txn.put(b'keyspace', str(int(self.keyspace)).encode(), db=sdb)
+        elif stored != self.keyspace:
+            raise ValueError('{} is {}, opened as {}, run cntus_migrate_keyspace to convert it'.format(
+                self.name, stored.name, self.keyspace.name))
+
+    def split_path(self, sdb_path):
+        """
+        :param sdb_path: sub-database path, e.g. 'ts:daily_price:000001.SZ'
+        :return: (name of the sub-database in the keyspace, key prefix), e.g. ('ts:daily_price:', b'000001.SZ\\x00')
+        """
+        out = self._paths.get(sdb_path)
+        if out is None:
+            out = (sdb_path, b'')
+            if self.keyspace == KEYSPACE.KS_TABLE:
+                for table in self.tables:
+                    if len(sdb_path) > len(table) and sdb_path.startswith(table):
+                        out = (table, force_bytes(sdb_path[len(table):]) + KEY_SEP)
+                        break
+            self._paths[sdb_path] = out
+        return out
+
+    def path_of(self, name, key):
+        """
+        inverse of split_path.
+        :param name: name of the sub-database in the keyspace
+        :param key: bytes, raw key in it
+        :return: (sub-database path, key)
+        """
+        if self.keyspace == KEYSPACE.KS_TABLE and name in self.tables and KEY_SEP in key:
+            code, key = key.split(KEY_SEP, 1)
+            return name + force_string(code), key
+        return name, key
+
     def close(self):
+        self._dbis = {}
+        self._local = threading.local()
+        if self.env is None:
+            return
+        # cached values of a closed environment are stale once it's reopened
+        chunk_cache().drop(self.name)
+        result_cache().drop(self.name)
         if isinstance(self.env, lmdb.Environment):
             self.env.close()
             self.env = None
@@ -87,21 +183,176 @@ class XcLMDB(XCacheDB):
         total_size = total_size // 0x100000
         log.info('Used space: {}MB, Percentage: {}%'.format(total_size, total_size*100//db_map_size))
 
+    def sdb_names(self):
+        """
+        names of all sub-databases(tables in KS_TABLE).
+        :return: list of str
+        """
+        names = []
+        with self.env.begin(db=None, write=False) as txn:
+            for k in txn.cursor().iternext(values=False):
+                if k != force_bytes(KEYSPACE_SDB):
+                    names.append(force_string(k))
+        return names
+
+    def copy_to(self, dst, batch_size=1000):
+        """
+        copy all values to another database, keys are laid out in the keyspace of dst. used to convert keyspace.
+        :param dst: XcLMDB
+        :param batch_size: values per write transaction of dst
+        :return: number of values
+        """
+        total = 0
+        wtxn, wname, nput = None, None, 0
+        for name in self.sdb_names():
+            sdb = self.find_sdb(name, None)[0]
+            with self.env.begin(write=False, buffers=True) as txn:
+                for kk, vv in txn.cursor(sdb).iternext():
+                    path, key = self.path_of(name, bytes(kk))
+                    dname, prefix = dst.split_path(path)
+                    if wtxn is not None and (dname != wname or nput >= batch_size):
+                        wtxn.commit()
+                        wtxn = None
+                    if wtxn is None:
+                        # handle opened before the write transaction, get_sdb() would wait for it
+                        dsdb = dst.get_sdb(dname)
+                        wtxn, wname, nput = dst.env.begin(write=True), dname, 0
+                    wtxn.put(prefix + key, vv, db=dsdb)
+                    nput += 1
+                    total += 1
+        if wtxn is not None:
+            wtxn.commit()
+        return total
+
     @staticmethod
-    def _get_sdb(master_db, sdb_path: str):
-        cur_db = master_db.open_db(force_bytes(sdb_path), create=True)
+    def _get_sdb(master_db, sdb_path: str, create=True, lock=None):
+        """
+        open the handle in a short transaction of its own.
+        py-lmdb resets a read-only transaction on commit, a handle opened in it is closed then. so the handle is opened
+        in a write transaction if the environment is writable(by open_db() in a read-only environment), an existing
+        sub-database is looked up in a read transaction first, readers never wait for writers to find it not exist.
+        :param lock: held by open_db() and the commit only, LMDB doesn't allow concurrent open_db() of an environment.
+                     the write transaction is begun out of it.
+        :return: DBI handle, lmdb.NotFoundError if create is False and the sub-database not exist.
+        """
+        lock = lock or threading.Lock()
+        name = force_bytes(sdb_path)
+        if master_db.flags()['readonly']:
+            with lock:
+                return master_db.open_db(name, create=False)
+        if not create:
+            with master_db.begin(write=False) as txn:
+                if txn.get(name) is None:
+                    raise lmdb.NotFoundError('sub-database not exist: {}'.format(sdb_path))
+        # open_db() without txn waits for the writer lock holding the GIL, the writer could never finish
+        txn = master_db.begin(write=True)
+        try:
+            with lock:
+                cur_db = master_db.open_db(name, txn=txn, create=create)
+                txn.commit()
+        except BaseException:
+            txn.abort()
+            raise
         return cur_db
 
-    def get_sdb(self, sdb_path: str):
+    def _register_sdb(self, sdb_path, opener):
+        """
+        open the handle and register it, a transaction begun before can't use it(see dbi_seq).
+        _dbi_lock is not held by opener() waiting for a write transaction, see _get_sdb.
+        """
+        item = self._dbis.get(sdb_path)
+        if item is None:
+            sdb = opener()
+            with self._dbi_lock:
+                # opened by another thread meanwhile, both are handles of the same DBI
+                item = self._dbis.get(sdb_path)
+                if item is None:
+                    self.dbi_seq += 1
+                    item = self._dbis[sdb_path] = (sdb, self.dbi_seq)
+        return item
+
+    def get_sdb(self, sdb_path: str, txn=None):
+        """
+        DBI handle of the sub-database, created if not exist.
+        open_db() takes a write transaction, handles are opened once and kept in the registry.
+        :param txn: write transaction of the caller, open_db() would wait for it. the handle opened in it is not
+                    registered, it's closed if the transaction aborts.
+        """
+        item = self._dbis.get(sdb_path)
+        if item is not None:
+            # registered handles always predate a write transaction, writers are serialized
+            return item[0]
+        if txn is not None:
+            return self.env.open_db(force_bytes(sdb_path), txn=txn, create=True)
         try:
             # log.info('>>SDB>>{}'.format(sdb_path))
-            sdb = self._get_sdb(self.env, sdb_path)
+            return self._register_sdb(sdb_path, lambda: self._get_sdb(self.env, sdb_path, lock=self._dbi_lock))[0]
         except Exception as e:
             print(e)
             print('sdb_path not exist: {}'.format(sdb_path))
             raise ValueError('create sdb error')
 
-        return sdb
+    def find_sdb(self, sdb_path: str, txn):
+        """
+        DBI handle of an existing sub-database for readers.
+        LMDB requires the transaction opening a handle to finish before other transactions use it, so handles are
+        opened in a short transaction(once per sub-database, see _get_sdb) and registered, _dbi_lock is not held while
+        waiting for writers.
+        if the thread holds a write transaction, it's opened in the read transaction txn and not registered.
+        :return: (DBI handle, dbi_seq), None if the sub-database not exist.
+        """
+        item = self._dbis.get(sdb_path)
+        if item is not None:
+            return item
+        try:
+            if not self.readonly and getattr(self._local, 'writing', 0):
+                return self.env.open_db(force_bytes(sdb_path), txn=txn, create=False), 0
+            return self._register_sdb(sdb_path,
+                                      lambda: self._get_sdb(self.env, sdb_path, create=False, lock=self._dbi_lock))
+        except lmdb.NotFoundError:
+            return None
+
+    def writing(self, n):
+        """
+        count write transactions of the thread, see find_sdb.
+        """
+        self._local.writing = getattr(self._local, 'writing', 0) + n
+
+    def forget_sdb(self, sdb_path: str):
+        """
+        remove the handle of a dropped sub-database from the registry.
+        """
+        with self._dbi_lock:
+            self._dbis.pop(sdb_path, None)
+
+    def accessor(self, sdb: str, metadata=None, readonly=False):
+        """
+        pooled XcLMDBAccessor, idle accessors of the thread are reused after commit(), use it as facc.
+        don't touch the accessor after commit(), it may be handed out again.
+        """
+        pool = getattr(self._local, 'idle', None)
+        if pool is None:
+            pool = self._local.idle = OrderedDict()
+        acc = pool.pop((sdb, readonly), None)
+        if acc is None:
+            acc = XcLMDBAccessor(self, sdb, metadata, readonly)
+            acc.pooled = True
+        else:
+            acc.begin(metadata)
+        return acc
+
+    def release(self, acc):
+        """
+        return a committed pooled accessor to the idle pool of the thread.
+        """
+        pool = getattr(self._local, 'idle', None)
+        if pool is None:
+            pool = self._local.idle = OrderedDict()
+        # a finished read transaction keeps its reader slot until freed
+        acc.txn = None
+        pool[(acc.sdb_path, acc.readonly)] = acc
+        while len(pool) > ACCESSOR_POOL_SIZE:
+            pool.popitem(last=False)
 
 
 class XcLMDBAccessor(XcAccessor):
@@ -122,16 +373,91 @@ class XcLMDBAccessor(XcAccessor):
     del db/ db.commit()
 
     a Readonly transaction block can be reentrant by multi-thread, but a writeable txn-block cannot.
+
+    Values are read with buffers=True, for readonly transaction, raw_mode ndarray returned by load() is a zero copy
+    view of the LMDB map, it's only valid before commit(), copy it (np.vstack, etc.) if need to keep it.
     """
 
+    pooled = False  # created by XcLMDB.accessor, returned to the pool after commit
+
     def __init__(self, master_db: XcLMDB, sdb: str, metadata=None, readonly=False):
         self.master = master_db
-        self.db = master_db.get_sdb(sdb)
-        self.metadata = metadata
-        write_mode = not readonly
-        self.txn = self.master.env.begin(db=self.db, write=write_mode, parent=None)
+        self.sdb_path = sdb
+        self.readonly = readonly
+        self.begin(metadata)
         return
 
+    def begin(self, metadata=None):
+        """
+        begin the transaction, called by __init__, or by the pool to reuse the accessor.
+        """
+        if metadata is not self._metadata:
+            self.metadata = metadata
+        self.meta_dbs = {}
+        self._dirty = ()
+        # keys of the path are prefixed in KS_TABLE, all key access goes through _db_* with the prefix added
+        self.kprefix = self.master.split_path(self.sdb_path)[1]
+        if self.readonly:
+            self._begin_read()
+            # self.db is None if the sub-database not exist.
+            self.db = self._open_sdb(self.sdb_path)
+            if self.track_validity:
+                self.meta_dbs[metadata['validity']] = self._open_sdb(metadata['validity'])
+        else:
+            # metadata sub-databases are opened before the transaction, like self.db
+            self.db = self.master.get_sdb(self.master.split_path(self.sdb_path)[0])
+            if self.track_validity:
+                self.meta_dbs[metadata['validity']] = self.master.get_sdb(metadata['validity'])
+            self.txn = self.master.env.begin(db=self.db, write=True, parent=None, buffers=True)
+            self.master.writing(1)
+
+    def _begin_read(self):
+        self.cache_gen = chunk_cache().generation
+        self.dbi_seq = self.master.dbi_seq
+        # handles are opened out of the read transaction(find_sdb), a cache hit never waits for writers.
+        self.txn = self.master.env.begin(write=False, parent=None, buffers=True)
+
+    def _open_sdb(self, sdb):
+        """
+        handle of the sub-database(table of the path in KS_TABLE) for the transaction.
+        :return: None if the sub-database not exist(readonly).
+        """
+        sdb = self.master.split_path(sdb)[0]
+        if not self.readonly:
+            return self.master.get_sdb(sdb, self.txn)
+        item = self.master.find_sdb(sdb, self.txn)
+        if item is None:
+            return None
+        if item[1] > self.dbi_seq:
+            # registered after the transaction began, not visible to it
+            self.txn.commit()
+            self._begin_read()
+        return item[0]
+
+    def select(self, sdb):
+        """
+        switch to another sub-database in the same transaction, readers of many codes see one snapshot.
+        if the sub-database is first opened in the process after the read transaction began, the read transaction
+        is renewed, values loaded before(raw_mode) are invalid then, copy them before select().
+        :param sdb:
+        :return: False if the sub-database not exist(readonly).
+        """
+        db = self._open_sdb(sdb)
+        if db is None:
+            return False
+        self.db = db
+        self.sdb_path = sdb
+        self.kprefix = self.master.split_path(sdb)[1]
+        return True
+
+    def _db_buffer(self, val):
+        """
+        buffer of write transaction is invalid after next put/delete, so copy it out.
+        """
+        if self.readonly:
+            return val
+        return bytes(val)
+
     def stat(self):
         """
         :return: Dict
@@ -153,57 +479,116 @@ class XcLMDBAccessor(XcAccessor):
     def __del__(self):
         """"""
         try:
-            self.txn.commit()
+            self.pooled = False
+            self.commit()
         except:
             pass
 
-    def load(self, key, raw_mode=False):
-        """
+    def _db_get(self, key):
+        """"""
+        if self.db is None:
+            return None
+        val = self.txn.get(self.kprefix + key, db=self.db)
+        if val:
+            return self._db_buffer(val)
+        return None
 
-        :param key:
-        :param raw_mode: override value type for output.
-        :return:
+    def _db_get_many(self, keys):
         """
-        # self.txn = self.master.env.begin(db=self.db, write=True)
-        key = self.to_db_key(key)
-        if key:
-            val = self.txn.get(key)
-            if val:
-                return self.to_val_out(val, raw_mode)
+        one cursor sweep in key order, dense keys(chunks of one sub-database) are read by cursor next
+        instead of a B-tree search per key.
+        """
+        if self.db is None:
+            return [None] * len(keys)
+        if self.kprefix:
+            keys = [self.kprefix + kk for kk in keys]
+        vals = {}
+        with self.txn.cursor(self.db) as cur:
+            vld = False
+            for kk in sorted(set(keys)):
+                if vld and bytes(cur.key()) < kk:
+                    vld = cur.next()
+                    if not vld:
+                        break
+                if not vld or bytes(cur.key()) < kk:
+                    vld = cur.set_range(kk)
+                    if not vld:
+                        break
+                if bytes(cur.key()) == kk:
+                    vals[kk] = self._db_buffer(cur.value())
+        return [vals.get(kk) for kk in keys]
+
+    def _db_put(self, key, val):
+        """"""
+        self.txn.put(self.kprefix + key, val, db=self.db)
+
+    def _db_delete(self, key):
+        """"""
+        self.txn.delete(self.kprefix + key, db=self.db)
+
+    def _db_empty(self):
+        """"""
+        if self.db is None:
+            return True
+        with self.txn.cursor(self.db) as cur:
+            return not cur.set_range(self.kprefix) or not bytes(cur.key()).startswith(self.kprefix)
+
+    def _meta_get(self, sdb, key):
+        """"""
+        mdb = self.meta_dbs[sdb]
+        if mdb is None:
+            return None
+        val = self.txn.get(key, db=mdb)
+        if val:
+            return self._db_buffer(val)
         return None
 
-    def save(self, key, val, raw_mode=False):
+    def _meta_put(self, sdb, key, val):
         """"""
-        # self.txn = self.master.env.begin(db=self.db, write=True)
-        if val is None:
-            return
-        key = self.to_db_key(key)
-        dbval, appval = self.to_val_in(val, raw_mode)
-        if key and dbval:
-            self.txn.put(key, dbval)
-        return appval
+        self.txn.put(key, val, db=self.meta_dbs[sdb])
 
-    def remove(self, key):
+    def _meta_delete(self, sdb, key):
         """"""
-        key = self.to_db_key(key)
-        if key:
-            self.txn.delete(key)
+        self.txn.delete(key, db=self.meta_dbs[sdb])
 
     def commit(self):
         self.txn.commit()
+        if not self.readonly:
+            self.master.writing(-1)
+        self.invalidate_dirty()
+        if self.pooled:
+            self.master.release(self)
+
+    def abort(self):
+        """
+        discard the writes of the transaction, the accessor is not reused.
+        """
+        self.pooled = False
+        try:
+            self.txn.abort()
+        finally:
+            if not self.readonly:
+                self.master.writing(-1)
+            self._dirty = ()
 
     def load_range(self, kstart, kend, raw_mode):
         """"""
         out = {}
+        if self.db is None:
+            return out
+        plen = len(self.kprefix)
         with self.txn.cursor(self.db) as cur:
-            bstr = cur.set_range(force_bytes(kstart))
+            bstr = cur.set_range(self.kprefix + force_bytes(kstart))
             if bstr:
                 while True:
                     k, v = cur.item()
-                    sk = force_string(k)
-                    out[sk] = self.to_val_out(v, raw_mode)
-                    if sk >= kend:
+                    k = bytes(k)
+                    if not k.startswith(self.kprefix):
+                        break
+                    sk = force_string(k[plen:])
+                    if sk > kend:
                         break
+                    out[sk] = self.to_val_out(self._db_buffer(v), raw_mode)
                     vld = cur.next()
                     if not vld:
                         break
@@ -211,9 +596,104 @@ class XcLMDBAccessor(XcAccessor):
 
         return out
 
+    def load_range_all(self, kstart, kend, raw_mode):
+        """
+        load_range of all paths of the table, the accessor is opened on the table path(e.g. 'ts:daily_price:').
+        one cursor sweep in KS_TABLE, keys of other codes are skipped by seeking.
+        :return: {sub-database path: {key: value}}
+        """
+        out = {}
+        if self.master.keyspace != KEYSPACE.KS_TABLE:
+            state = (self.db, self.sdb_path, self.kprefix)
+            names = [name for name in self.master.sdb_names() if len(name) > len(state[1]) and
+                     name.startswith(state[1])]
+            if self.readonly:
+                # open the handles first, select() would renew the read transaction after values are loaded
+                for name in names:
+                    self.master.find_sdb(name, self.txn)
+                if self.master.dbi_seq > self.dbi_seq:
+                    self.txn.commit()
+                    self._begin_read()
+            for name in names:
+                if self.select(name):
+                    out[name] = self.load_range(kstart, kend, raw_mode)
+            self.db, self.sdb_path, self.kprefix = state
+            return out
+        if self.db is None:
+            return out
+        kstart, kend = force_bytes(kstart), force_bytes(kend)
+        with self.txn.cursor(self.db) as cur:
+            vld = cur.first()
+            while vld:
+                k = bytes(cur.key())
+                if KEY_SEP not in k:
+                    vld = cur.next()
+                    continue
+                code, key = k.split(KEY_SEP, 1)
+                if key < kstart:
+                    vld = cur.set_range(code + KEY_SEP + kstart)
+                elif key > kend:
+                    # the first key of the next code
+                    vld = cur.set_range(code + b'\x01')
+                else:
+                    path = self.sdb_path + force_string(code)
+                    out.setdefault(path, {})[force_string(key)] = self.to_val_out(self._db_buffer(cur.value()),
+                                                                                 raw_mode)
+                    vld = cur.next()
+        return out
+
+    def migrate(self, batch_size=1000):
+        """
+        re-encode all values of the sub-database(keys of the path in KS_TABLE) to current format (see repack), in place.
+        each batch is a short write transaction, readers keep working on their snapshots, and other writers are
+        only blocked for one batch.
+        :param batch_size: values per write transaction.
+        :return: number of values, number of values rewritten.
+        """
+        assert not self.readonly
+        total, changed = 0, 0
+        kstart = None
+        while True:
+            batch = []
+            with self.txn.cursor(self.db) as cur:
+                if kstart is None:
+                    vld = cur.set_range(self.kprefix) if self.kprefix else cur.first()
+                else:
+                    vld = cur.set_range(kstart)
+                while vld and len(batch) < batch_size and bytes(cur.key()).startswith(self.kprefix):
+                    batch.append((bytes(cur.key()), bytes(cur.value())))
+                    vld = cur.next()
+            for kk, vv in batch:
+                newval = self.repack(vv)
+                if newval is not None:
+                    self.txn.put(kk, newval)
+                    changed += 1
+            total += len(batch)
+            self.txn.commit()
+            self.txn = self.master.env.begin(db=self.db, write=True, parent=None, buffers=True)
+            if len(batch) < batch_size:
+                break
+            # the smallest key after the last one
+            kstart = batch[-1][0] + b'\x00'
+
+        return total, changed
+
     def drop(self):
         """
-        Drop the DB.
+        Drop the DB, only the keys of the path in KS_TABLE. The validity bitmap and the chunk of the path are removed
+        in the same transaction.
         :return:
         """
+        chunk_cache().invalidate(self.cache_db, self.sdb_path)
+        result_cache().invalidate(self.cache_db, self.sdb_path)
+        if self.track_validity:
+            self._meta_delete(self.metadata['validity'], force_bytes(self.sdb_path))
+            self._meta_delete(self.metadata['validity'], force_bytes(self.sdb_path) + CHUNK_KEY_SUFFIX)
+        if self.kprefix:
+            with self.txn.cursor(self.db) as cur:
+                vld = cur.set_range(self.kprefix)
+                while vld and bytes(cur.key()).startswith(self.kprefix):
+                    vld = cur.delete()
+            return
+        self.master.forget_sdb(self.sdb_path)
         return self.txn.drop(self.db, delete=True)
@@ -6,8 +6,12 @@ from .rdprice import XcReaderPrice
 from .layout import *
 from .utils.xcutils import *
 from .xcdb.zlmdb import *
+from .panel import PANEL_DATASETS
 from functools import partial
 
+# dataset name: (sub-database prefix, META), minute_price sub-database is prefix + code + freq.
+COVERAGE_DATASETS = dict(PANEL_DATASETS, minute_price=(TusSdbs.SDB_MINUTE_PRICE, EQUITY_MINUTE_PRICE_META))
+
 
 class XcDBChecker(XcReaderBasic, XcReaderPrice):
     master_db = None
@@ -18,9 +22,9 @@ class XcDBChecker(XcReaderBasic, XcReaderPrice):
                             we assume yesterday's data is available in today.
         """
         if dbtype == DBTYPE.DB_LMDB:
-            self.master_db = XcLMDB(LMDB_NAME, readonly=False)
+            self.master_db = XcLMDB(LMDB_NAME, readonly=False, tables=SDB_TABLES)
             self.acc = XcLMDBAccessor
-            self.facc = partial(XcLMDBAccessor, self.master_db)
+            self.facc = self.master_db.accessor
 
             # , write_buffer_size = 0x400000, block_size = 0x4000,
             # max_file_size = 0x1000000, lru_cache_size = 0x100000, bloom_filter_bits = 0
@@ -51,16 +55,19 @@ class XcDBChecker(XcReaderBasic, XcReaderPrice):
         super(XcDBChecker, self).init_domain()
         # dummy read here to create the tcalmap, or it may fail when parallel thread case.
         aa = self.suspend_info
+        aa = self.suspend_index
         aa = self.stock_info
         aa = self.index_info
         aa = self.fund_info
         aa = self.tcalmap_day
-        aa = self.tcalmap_mon
+        for chunk in XTUS_CHUNK_MONTHS.keys():
+            aa = self.tcalmap_chunk(chunk)
 
     def check_price_daily(self, code, start, end, astype, flag=IOFLAG.ERASE_INVALID):
         if astype is None:
             astype = self.asset_type(code)
-        mmdts = self.gen_keys_monthly(start, end, code, astype)
+        chunk = EQUITY_DAILY_PRICE_META['chunk']
+        mmdts = self.gen_keys_chunk(start, end, code, astype, chunk)
         if mmdts is None:
             return 0
 
@@ -73,11 +80,15 @@ class XcDBChecker(XcReaderBasic, XcReaderPrice):
                 db.remove(dtkey)
                 bvalid[n] = False
         elif flag == IOFLAG.ERASE_INVALID:
+            # keys marked in validity bitmap passed the full check already.
+            marked = db.get_validity(mmdts)
             for n, dd in enumerate(mmdts):
+                if marked[n]:
+                    continue
                 dtkey = dt64_to_strdt(dd)
-                val = db.load(dtkey, raw_mode=True)
+                val = db.load(dtkey, raw_mode=True, fields=['volume'])
                 if val is not None:
-                    vld1 = self.integrity_check_km_vday(dd, val[:, 4], code)
+                    vld1 = self.integrity_check_km_vday(dd, val[:, 0], code, chunk=chunk)
                     if not vld1:
                         db.remove(dtkey)
                         bvalid[n] = False
@@ -103,12 +114,15 @@ class XcDBChecker(XcReaderBasic, XcReaderPrice):
                 db.remove(dtkey)
                 bvalid[n] = False
         else:
+            marked = db.get_validity(mmdts)
             for n, dd in enumerate(mmdts):
+                if marked[n]:
+                    continue
                 dtkey = dt64_to_strdt(dd)
-                val = db.load(dtkey, raw_mode=True)
+                val = db.load(dtkey, raw_mode=True, fields=['volume'])
                 if val is not None:
-                    bvalid = self.integrity_check_kd_vmin(dd, val[:, 4], freq=freq, code=code)
-                    if not bvalid:
+                    vld1 = self.integrity_check_kd_vmin(dd, val[:, 0], freq=freq, code=code)
+                    if not vld1:
                         db.remove(dtkey)
                         bvalid[n] = False
         db.commit()
@@ -123,7 +137,8 @@ class XcDBChecker(XcReaderBasic, XcReaderPrice):
         :return:
         """
         astype = 'E'
-        mmdts = self.gen_keys_monthly(start, end, code, astype)
+        chunk = STOCK_DAILY_INFO_META['chunk']
+        mmdts = self.gen_keys_chunk(start, end, code, astype, chunk)
         if mmdts is None:
             return 0
 
@@ -135,12 +150,15 @@ class XcDBChecker(XcReaderBasic, XcReaderPrice):
                 db.remove(dtkey)
                 bvalid[n] = False
         else:
+            marked = db.get_validity(mmdts)
             for n, dd in enumerate(mmdts):
+                if marked[n]:
+                    continue
                 dtkey = dt64_to_strdt(dd)
-                val = db.load(dtkey, raw_mode=True)
+                val = db.load(dtkey, raw_mode=True, fields=['close'])
                 if val is not None:
-                    bvalid = self.integrity_check_km_vday(dd, val[:, 0], code)
-                    if not bvalid:
+                    vld1 = self.integrity_check_km_vday(dd, val[:, 0], code, chunk=chunk)
+                    if not vld1:
                         db.remove(dtkey)
                         bvalid[n] = False
         db.commit()
@@ -155,7 +173,8 @@ class XcDBChecker(XcReaderBasic, XcReaderPrice):
         :return:
         """
         astype = 'E'
-        mmdts = self.gen_keys_monthly(start, end, code, astype)
+        chunk = STOCK_ADJFACTOR_META['chunk']
+        mmdts = self.gen_keys_chunk(start, end, code, astype, chunk)
         if mmdts is None:
             return 0
 
@@ -168,17 +187,50 @@ class XcDBChecker(XcReaderBasic, XcReaderPrice):
                 db.remove(dtkey)
                 bvalid[n] = False
         else:
+            marked = db.get_validity(mmdts)
             for n, dd in enumerate(mmdts):
+                if marked[n]:
+                    continue
                 dtkey = dt64_to_strdt(dd)
-                val = db.load(dtkey, raw_mode=True)
+                val = db.load(dtkey, raw_mode=True, fields=['adj_factor'])
                 if val is not None:
-                    bvalid = self.integrity_check_km_vday(dd, val[:, 0], code)
-                    if not bvalid:
+                    vld1 = self.integrity_check_km_vday(dd, val[:, 0], code, chunk=chunk)
+                    if not vld1:
                         db.remove(dtkey)
                         bvalid[n] = False
         db.commit()
         return np.sum(~bvalid)
 
+    def coverage(self, dataset, start, end, codes=None, freq='1min'):
+        """
+        coverage report read from the validity bitmaps only, no data value is loaded.
+        :param dataset: see COVERAGE_DATASETS
+        :param start:
+        :param end:
+        :param codes: default all stocks
+        :param freq: minute_price only
+        :return: DataFrame, index: ts_code, columns: keys(expected), valid(keys marked valid), ratio
+        """
+        sdb, meta = COVERAGE_DATASETS[dataset]
+        suffix = freq if dataset == 'minute_price' else ''
+        if codes is None:
+            codes = self.stock_info.index
+        out = []
+        for code in codes:
+            if meta.get('chunk'):
+                keys = self.gen_keys_chunk(start, end, code, 'E', meta['chunk'])
+            else:
+                keys = self.gen_keys_daily(start, end, code, 'E')
+            if keys is None:
+                out.append((code, 0, 0))
+                continue
+            db = self.facc(sdb.value + code + suffix, meta, readonly=True)
+            out.append((code, len(keys), int(np.sum(db.get_validity(keys)))))
+            db.commit()
+        df = pd.DataFrame(out, columns=['ts_code', 'keys', 'valid']).set_index('ts_code')
+        df['ratio'] = df['valid'] / df['keys'].where(df['keys'] > 0)
+        return df
+
 
 g_checker: XcDBChecker = None
 
@@ -5,6 +5,7 @@ from .utils.xcutils import *
 # from .xcdb.xcdb import *
 # from .domain import XcDomain
 from .xcdb.zlmdb import *
+from .xcdb.writequeue import XcWriteQueue, WQ_BATCH_BYTES, WQ_INTERVAL
 from functools import partial
 from .rdbasic import XcReaderBasic
 from .rdprice import XcReaderPrice
@@ -21,20 +22,25 @@ class XcDBUpdater(XcReaderBasic, XcReaderPrice):
     """
 
     master_db = None
+    wqueue = None
 
     @lazyval
     def netloader(self) -> TusNetLoader:
-        return netloader_init()
+        return netloader_init(self.master_db.name)
 
-    def __init__(self, last_day=None, dbtype=DBTYPE.DB_LMDB):
+    def __init__(self, last_day=None, dbtype=DBTYPE.DB_LMDB, durable=True, sync_interval=None):
         """
         :param last_day: Tushare last date with data available,
                             we assume yesterday's data is available in today.
+        :param durable: sync every commit. False: commits are synced by write_behind queue(sync_interval, flush),
+                            a crash may lose the latest commits.
+        :param sync_interval: default sync_interval of start_write_behind, seconds. None: synced on flush only.
         """
+        self.sync_interval = sync_interval
         if dbtype == DBTYPE.DB_LMDB:
-            self.master_db = XcLMDB(LMDB_NAME, readonly=False)
+            self.master_db = XcLMDB(LMDB_NAME, readonly=False, tables=SDB_TABLES, sync=durable)
             self.acc = XcLMDBAccessor
-            self.facc = partial(XcLMDBAccessor, self.master_db)
+            self.facc = self.master_db.accessor
 
             # , write_buffer_size = 0x400000, block_size = 0x4000,
             # max_file_size = 0x1000000, lru_cache_size = 0x100000, bloom_filter_bits = 0
@@ -65,11 +71,101 @@ class XcDBUpdater(XcReaderBasic, XcReaderPrice):
         super(XcDBUpdater, self).init_domain()
         # dummy read here to create the tcalmap, or it may fail when parallel thread case.
         aa = self.suspend_info
+        aa = self.suspend_index
         aa = self.stock_info
         aa = self.index_info
         aa = self.fund_info
         aa = self.tcalmap_day
-        aa = self.tcalmap_mon
+        for chunk in XTUS_CHUNK_MONTHS.keys():
+            aa = self.tcalmap_chunk(chunk)
+
+    def start_write_behind(self, batch_bytes=WQ_BATCH_BYTES, interval=WQ_INTERVAL, sync_interval=None):
+        """
+        writes of update_* are queued to one writer thread, committed in batches, see xcdb/writequeue.py.
+        chunks fetched through the readers(get_price_daily of update_stock_xdxr, ...) are queued by facc too, the
+        save_through() of the basic/finance readers still writes directly, serialized with the writer by LMDB.
+        updated values are visible to readers after flush_writes().
+        :param sync_interval: default self.sync_interval
+        """
+        if sync_interval is None:
+            sync_interval = self.sync_interval
+        if self.wqueue is None:
+            self.wqueue = XcWriteQueue(self.master_db, batch_bytes, interval, sync_interval)
+            self.facc = self.wqueue.accessor
+
+    def flush_writes(self, sync=True):
+        """
+        wait until the queued writes are committed.
+        """
+        if self.wqueue is not None:
+            self.wqueue.flush(sync)
+
+    def stop_write_behind(self, sync=True):
+        """
+        commit the queued writes, back to direct write transactions.
+        """
+        if self.wqueue is not None:
+            wqueue, self.wqueue = self.wqueue, None
+            self.facc = self.master_db.accessor
+            wqueue.close(sync)
+            log.info('Write queue: {}'.format(wqueue.stats()))
+
+    def run_steps(self, steps):
+        """
+        run the steps of an update, network requests yielded by the steps are loaded by netloader and sent back.
+        aioloader.aio_update runs the steps of many updates by coroutines.
+        :param steps: generator yields (netloader method, args), e.g. steps_price_daily()
+        :return: result of the update
+        """
+        try:
+            req = next(steps)
+            while True:
+                req = steps.send(getattr(self.netloader, req[0])(*req[1]))
+        except StopIteration as e:
+            return e.value
+
+    def check_stored(self, db, mmdts, field, check, rollback, sealed):
+        """
+        integrity check of stored data, keys marked in the validity bitmap are valid without loading, except the
+        last rollback keys which are always loaded and fully checked.
+        :param db: readonly accessor of the dataset
+        :param mmdts: keys
+        :param field: column to check
+        :param check: integrity check, check(dt, dtval, check_mode=)
+        :param rollback:
+        :param sealed: bool ndarray, see key_sealed
+        :return: bvalid, keys passed the full check to be marked in the validity bitmap
+        """
+        marked = db.get_validity(mmdts)
+        ntail = len(mmdts) - rollback
+        bvalid = np.full((len(mmdts),), True, dtype=bool)
+        newly = []
+        for n, dd in enumerate(mmdts):
+            if marked[n] and n < ntail:
+                continue
+            dtkey = dt64_to_strdt(dd)
+            val = db.load(dtkey, raw_mode=True, fields=[field])
+            if val is None:
+                bvalid[n] = False
+                continue
+            bfull = check(dd, val[:, 0], check_mode=1)
+            if n >= ntail:
+                bvalid[n] = bfull
+            else:
+                bvalid[n] = bfull or check(dd, val[:, 0], check_mode=0)
+            if bfull and sealed[n] and not marked[n]:
+                newly.append(dtkey)
+        return bvalid, newly
+
+    def mark_valid(self, sdb, meta, keys):
+        """
+        set keys in the validity bitmap of sdb.
+        """
+        if len(keys) == 0:
+            return
+        db = self.facc(sdb, meta)
+        db.set_validity(keys, True)
+        db.commit()
 
     # def update_domain(self, force_mode=False):
     #     super(XcDBUpdater, self).update_domain(force_mode)
@@ -122,49 +218,56 @@ class XcDBUpdater(XcReaderBasic, XcReaderPrice):
         :param rollback:
         :return:
         """
+        return self.run_steps(self.steps_price_daily(code, start, end, astype, rollback))
+
+    def steps_price_daily(self, code, start, end, astype, rollback=3):
+        """
+        steps of update_price_daily, yields the network requests, see run_steps.
+        """
         if astype is None:
             astype = self.asset_type(code)
-        mmdts = self.gen_keys_monthly(start, end, code, astype)
+        chunk = EQUITY_DAILY_PRICE_META['chunk']
+        mmdts = self.gen_keys_chunk(start, end, code, astype, chunk)
         if mmdts is None:
             return 0
 
-        db = self.facc(TusSdbs.SDB_DAILY_PRICE.value + code, EQUITY_DAILY_PRICE_META, readonly=True)
-        bvalid = np.full((len(mmdts),), True, dtype=np.bool)
-
-        for n, dd in enumerate(mmdts):
-            dtkey = dt64_to_strdt(dd)
-            val = db.load(dtkey, raw_mode=True)
-            if val is not None:
-                if n >= len(mmdts) - rollback:
-                    bvalid[n] = self.integrity_check_km_vday(dd, val[:, 4], code, check_mode=1)
-                else:
-                    bvalid[n] = self.integrity_check_km_vday(dd, val[:, 4], code, check_mode=0)
-            else:
-                bvalid[n] = False
-            # TODO: 数据缓存中最后一个数据，也应进行完整性检查。
+        sdb = TusSdbs.SDB_DAILY_PRICE.value + code
+        check = partial(self.integrity_check_km_vday, code=code, astype=astype, chunk=chunk)
+        sealed = self.key_sealed(mmdts, chunk)
+        db = self.facc(sdb, EQUITY_DAILY_PRICE_META, readonly=True)
+        bvalid, newly = self.check_stored(db, mmdts, 'volume', check, rollback, sealed)
         db.commit()
+        self.mark_valid(sdb, EQUITY_DAILY_PRICE_META, newly)
         count = np.sum(~bvalid)
 
         # 每次最大获取5000条记录
-        max_units = 4700 // 23
+        max_units = 4700 // XTUS_CHUNK_DAYS[chunk]
         need_update = nadata_iter(bvalid, max_units)
         while True:
             tstart, tend = next(need_update)
             if tstart is None:
                 break
             dts_upd = mmdts[tstart: tend + 1]
-            data = self.netloader.set_price_daily(code, MONTH_START(dts_upd[0]), MONTH_END(dts_upd[-1]), astype)
+            data = yield 'set_price_daily', (code, CHUNK_START(dts_upd[0], chunk), CHUNK_END(dts_upd[-1], chunk),
+                                             astype)
             if data is None:
                 continue
             data = data.set_index('trade_date', drop=True)
             data.index = pd.to_datetime(data.index, format=DATE_FORMAT)
-            db = self.facc(TusSdbs.SDB_DAILY_PRICE.value + code, EQUITY_DAILY_PRICE_META)
-            for tt in dts_upd:
+            chunks = {}
+            valid = []
+            for tt, bseal in zip(dts_upd, sealed[tstart: tend + 1]):
                 dtkey = dt64_to_strdt(tt)
-                dayindex = self.gen_dindex_monthly(tt, tt)
+                dayindex = self.gen_dindex_chunk(tt, tt, chunk)
                 xxd = data.reindex(index=dayindex)
-                db.save(dtkey, xxd)
+                chunks[dtkey] = xxd
+                if bseal and check(tt, xxd['volume'].values, check_mode=1):
+                    valid.append(dtkey)
+            db = self.facc(sdb, EQUITY_DAILY_PRICE_META)
+            db.save_many(chunks, valid=valid)
             db.commit()
+            if astype == 'E':
+                self.stale_cross_section(dts_upd[0], dts_upd[-1], chunk)
         return count
 
     def update_price_minute(self, code, start, end, freq='1min', astype='E', rollback=10):
@@ -177,6 +280,12 @@ class XcDBUpdater(XcReaderBasic, XcReaderPrice):
         :param rollback:
         :return:
         """
+        return self.run_steps(self.steps_price_minute(code, start, end, freq, astype, rollback))
+
+    def steps_price_minute(self, code, start, end, freq='1min', astype='E', rollback=10):
+        """
+        steps of update_price_minute, yields the network requests, see run_steps.
+        """
         if freq not in XTUS_FREQS:
             return 0
 
@@ -186,20 +295,14 @@ class XcDBUpdater(XcReaderBasic, XcReaderPrice):
         if mmdts is None:
             return 0
 
-        bvalid = np.full((len(mmdts),), True, dtype=np.bool)
-        db = self.facc((TusSdbs.SDB_MINUTE_PRICE.value + code + freq), EQUITY_MINUTE_PRICE_META, readonly=True)
-        for n, dd in enumerate(mmdts):
-            dtkey = dt64_to_strdt(dd)
-            val = db.load(dtkey, raw_mode=True)
-            if val is not None:
-                if n >= len(mmdts) - rollback:
-                    bvalid[n] = self.integrity_check_kd_vmin(dd, val[:, 4], freq=freq, code=code, check_mode=1)
-                else:
-                    bvalid[n] = self.integrity_check_kd_vmin(dd, val[:, 4], freq=freq, code=code, check_mode=0)
-            else:
-                bvalid[n] = False
-        count = np.sum(~bvalid)
+        sdb = TusSdbs.SDB_MINUTE_PRICE.value + code + freq
+        check = partial(self.integrity_check_kd_vmin, freq=freq, code=code, astype=astype)
+        sealed = self.key_sealed(mmdts)
+        db = self.facc(sdb, EQUITY_MINUTE_PRICE_META, readonly=True)
+        bvalid, newly = self.check_stored(db, mmdts, 'volume', check, rollback, sealed)
         db.commit()
+        self.mark_valid(sdb, EQUITY_MINUTE_PRICE_META, newly)
+        count = np.sum(~bvalid)
 
         # 每次最大获取8000条记录
         cc = {'1min': 1, '5min': 5, '15min': 15, '30min': 30, '60min': 60}
@@ -210,20 +313,25 @@ class XcDBUpdater(XcReaderBasic, XcReaderPrice):
             if tstart is None:
                 break
             dts_upd = mmdts[tstart: tend + 1]
-            data = self.netloader.set_price_minute(code, dts_upd[0], dts_upd[-1], freq)
+            data = yield 'set_price_minute', (code, dts_upd[0], dts_upd[-1], freq)
             if data is None:
                 continue
             data = data.set_index('trade_time', drop=True)
             data.index = pd.to_datetime(data.index, format=DATETIME_FORMAT)
-            db = self.facc((TusSdbs.SDB_MINUTE_PRICE.value + code + freq), EQUITY_MINUTE_PRICE_META)
-            for tt in dts_upd:
+            chunks = {}
+            valid = []
+            for tt, bseal in zip(dts_upd, sealed[tstart: tend + 1]):
                 dtkey = dt64_to_strdt(tt)
                 minindex = self.gen_mindex_daily(tt, tt, freq)
                 xxd = data.reindex(index=minindex)
                 if (xxd.volume == 0.0).all():
                     # 如果全天无交易，vol == 0, 则清空df.
                     xxd.loc[:, :] = np.nan
-                db.save(dtkey, xxd)
+                chunks[dtkey] = xxd
+                if bseal and check(tt, xxd['volume'].values, check_mode=1):
+                    valid.append(dtkey)
+            db = self.facc(sdb, EQUITY_MINUTE_PRICE_META)
+            db.save_many(chunks, valid=valid)
             db.commit()
 
         return count
@@ -236,45 +344,50 @@ class XcDBUpdater(XcReaderBasic, XcReaderPrice):
         :param end:
         :return:
         """
-        mmdts = self.gen_keys_monthly(start, end, code, 'E')
+        return self.run_steps(self.steps_stock_adjfactor(code, start, end, rollback))
+
+    def steps_stock_adjfactor(self, code, start, end, rollback=3):
+        """
+        steps of update_stock_adjfactor, yields the network requests, see run_steps.
+        """
+        chunk = STOCK_ADJFACTOR_META['chunk']
+        mmdts = self.gen_keys_chunk(start, end, code, 'E', chunk)
         if mmdts is None:
             return 0
 
-        bvalid = np.full((len(mmdts),), True, dtype=np.bool)
-
-        db = self.facc((TusSdbs.SDB_STOCK_ADJFACTOR.value + code), STOCK_ADJFACTOR_META, readonly=True)
-        for n, dd in enumerate(mmdts):
-            dtkey = dt64_to_strdt(dd)
-            val = db.load(dtkey, raw_mode=True)
-            if val is not None:
-                if n >= len(mmdts) - rollback:
-                    bvalid[n] = self.integrity_check_km_vday(dd, val[:, 0], code, check_mode=1)
-                else:
-                    bvalid[n] = self.integrity_check_km_vday(dd, val[:, 0], code, check_mode=0)
-            else:
-                bvalid[n] = False
+        sdb = TusSdbs.SDB_STOCK_ADJFACTOR.value + code
+        check = partial(self.integrity_check_km_vday, code=code, chunk=chunk)
+        sealed = self.key_sealed(mmdts, chunk)
+        db = self.facc(sdb, STOCK_ADJFACTOR_META, readonly=True)
+        bvalid, newly = self.check_stored(db, mmdts, 'adj_factor', check, rollback, sealed)
         db.commit()
+        self.mark_valid(sdb, STOCK_ADJFACTOR_META, newly)
         count = np.sum(~bvalid)
 
         # 每次最大获取5000条记录
-        max_units = 4000 // 23
+        max_units = 4000 // XTUS_CHUNK_DAYS[chunk]
         need_update = nadata_iter(bvalid, max_units)
         while True:
             tstart, tend = next(need_update)
             if tstart is None:
                 break
             dts_upd = mmdts[tstart: tend + 1]
-            data = self.netloader.set_stock_adjfactor(code, MONTH_START(dts_upd[0]), MONTH_END(dts_upd[-1]))
+            data = yield 'set_stock_adjfactor', (code, CHUNK_START(dts_upd[0], chunk), CHUNK_END(dts_upd[-1], chunk))
             if data is None:
                 continue
             data = data.set_index('trade_date', drop=True)
             data.index = pd.to_datetime(data.index, format=DATE_FORMAT)
-            db = self.facc((TusSdbs.SDB_STOCK_ADJFACTOR.value + code), STOCK_ADJFACTOR_META)
-            for tt in dts_upd:
+            chunks = {}
+            valid = []
+            for tt, bseal in zip(dts_upd, sealed[tstart: tend + 1]):
                 dtkey = dt64_to_strdt(tt)
-                dayindex = self.gen_dindex_monthly(tt, tt)
+                dayindex = self.gen_dindex_chunk(tt, tt, chunk)
                 xxd = data.reindex(index=dayindex)
-                db.save(dtkey, xxd)
+                chunks[dtkey] = xxd
+                if bseal and check(tt, xxd['adj_factor'].values, check_mode=1):
+                    valid.append(dtkey)
+            db = self.facc(sdb, STOCK_ADJFACTOR_META)
+            db.save_many(chunks, valid=valid)
             db.commit()
         return count
 
@@ -286,48 +399,123 @@ class XcDBUpdater(XcReaderBasic, XcReaderPrice):
         :param end:
         :return:
         """
-        mmdts = self.gen_keys_monthly(start, end, code, 'E')
+        return self.run_steps(self.steps_stock_dayinfo(code, start, end, rollback))
+
+    def steps_stock_dayinfo(self, code, start, end, rollback=3):
+        """
+        steps of update_stock_dayinfo, yields the network requests, see run_steps.
+        """
+        chunk = STOCK_DAILY_INFO_META['chunk']
+        mmdts = self.gen_keys_chunk(start, end, code, 'E', chunk)
         if mmdts is None:
             return 0
 
-        db = self.facc((TusSdbs.SDB_STOCK_DAILY_INFO.value + code), STOCK_DAILY_INFO_META, readonly=True)
-        bvalid = np.full((len(mmdts),), True, dtype=np.bool)
-        for n, dd in enumerate(mmdts):
-            dtkey = dt64_to_strdt(dd)
-            val = db.load(dtkey, raw_mode=True)
-            if val is not None:
-                if n >= len(mmdts) - rollback:
-                    bvalid[n] = self.integrity_check_km_vday(dd, val[:, 0], code, check_mode=1)
-                else:
-                    bvalid[n] = self.integrity_check_km_vday(dd, val[:, 0], code, check_mode=0)
-            else:
-                bvalid[n] = False
+        sdb = TusSdbs.SDB_STOCK_DAILY_INFO.value + code
+        check = partial(self.integrity_check_km_vday, code=code, chunk=chunk)
+        sealed = self.key_sealed(mmdts, chunk)
+        db = self.facc(sdb, STOCK_DAILY_INFO_META, readonly=True)
+        bvalid, newly = self.check_stored(db, mmdts, 'close', check, rollback, sealed)
         db.commit()
+        self.mark_valid(sdb, STOCK_DAILY_INFO_META, newly)
         count = np.sum(~bvalid)
 
         # 每次最大获取5000条记录
-        max_units = 4700 // 23
+        max_units = 4700 // XTUS_CHUNK_DAYS[chunk]
         need_update = nadata_iter(bvalid, max_units)
         while True:
             tstart, tend = next(need_update)
             if tstart is None:
                 break
             dts_upd = mmdts[tstart: tend + 1]
-            data = self.netloader.set_stock_daily_info(code, MONTH_START(dts_upd[0]), MONTH_END(dts_upd[-1]))
+            data = yield 'set_stock_daily_info', (code, CHUNK_START(dts_upd[0], chunk),
+                                                  CHUNK_END(dts_upd[-1], chunk))
             if data is None:
                 continue
             data = data.set_index('trade_date', drop=True)
             data.index = pd.to_datetime(data.index, format=DATE_FORMAT)
-            db = self.facc((TusSdbs.SDB_STOCK_DAILY_INFO.value + code),
-                           STOCK_DAILY_INFO_META)
-            for tt in dts_upd:
+            chunks = {}
+            valid = []
+            for tt, bseal in zip(dts_upd, sealed[tstart: tend + 1]):
                 dtkey = dt64_to_strdt(tt)
-                dayindex = self.gen_dindex_monthly(tt, tt)
+                dayindex = self.gen_dindex_chunk(tt, tt, chunk)
                 xxd = data.reindex(index=dayindex)
-                db.save(dtkey, xxd)
+                chunks[dtkey] = xxd
+                if bseal and check(tt, xxd['close'].values, check_mode=1):
+                    valid.append(dtkey)
+            db = self.facc(sdb, STOCK_DAILY_INFO_META)
+            db.save_many(chunks, valid=valid)
             db.commit()
         return count
 
+    def stale_cross_section(self, start, end, chunk):
+        """
+        daily price chunks [start, end] of a stock are saved, remove the built mark(codes) of the cross sections of
+        their trading days, they are rebuilt by the next update_cross_section. get_cross_section returns None for
+        these dates until then.
+        :param start: first chunk
+        :param end: last chunk
+        :param chunk: chunk of EQUITY_DAILY_PRICE_META
+        """
+        db = self.facc(TusSdbs.SDB_XSECTION_CODES.value, XSECTION_CODES_META)
+        for dd in self.gen_dindex_chunk(start, end, chunk):
+            db.remove(dt64_to_strdt(dd))
+        db.commit()
+
+    def update_cross_section(self, start, end, rollback=3):
+        """
+        build the date-major cross sections (all stocks per trading date) from the daily price cache, so
+        update_price_daily of the codes should be done first.
+        dates already built are skipped, except the last rollback dates. update_price_daily removes the built mark of
+        the dates it saves(stale_cross_section), so back-filled or repaired prices are rebuilt too.
+        :param start:
+        :param end:
+        :param rollback:
+        :return: number of dates built
+        """
+        tdays = self.gen_keys_daily(start, end, None, None)
+        if tdays is None:
+            return 0
+
+        db = self.facc(TusSdbs.SDB_XSECTION_CODES.value, XSECTION_CODES_META, readonly=True)
+        bvalid = np.array([vv is not None for vv in db.load_many([dt64_to_strdt(dd) for dd in tdays])], dtype=bool)
+        db.commit()
+        if rollback > 0:
+            bvalid[-rollback:] = False
+        dts_upd = tdays[~bvalid]
+        if len(dts_upd) == 0:
+            return 0
+
+        codes = np.array(self.stock_info.index, dtype=XSECTION_CODES_META['dtype'])
+        cols = EQUITY_DAILY_PRICE_META['columns']
+        chunk = EQUITY_DAILY_PRICE_META['chunk']
+        mmdts = self.gen_keys_chunk(dts_upd[0], dts_upd[-1], None, None, chunk)
+        # about one year per batch, (days, codes, fields) block of a batch is ~50MB.
+        batch = max(1, 250 // XTUS_CHUNK_DAYS[chunk])
+        for idx in range(0, len(mmdts), batch):
+            keys = mmdts[idx: idx + batch]
+            alldays = self.gen_dindex_chunk(keys[0], keys[-1], chunk)
+            base, _ = self.chunk_pos(keys[0], chunk)
+            offsets = [(ss - base, ee - base) for ss, ee in (self.chunk_pos(dd, chunk) for dd in keys)]
+            panel = np.full((len(alldays), len(codes), len(cols)), np.nan)
+            # one readonly accessor select()s the codes in turn, see XcReaderPrice._fill_panel
+            self._fill_panel(panel, TusSdbs.SDB_DAILY_PRICE.value, EQUITY_DAILY_PRICE_META, codes, keys, offsets)
+
+            chunks, dcodes = {}, {}
+            for pos in np.nonzero(np.isin(alldays, dts_upd))[0]:
+                dtkey = dt64_to_strdt(alldays[pos])
+                vld = ~np.isnan(panel[pos]).all(axis=1)
+                chunks[dtkey] = pd.DataFrame(panel[pos][vld], columns=cols)
+                dcodes[dtkey] = codes[vld]
+            # codes are written last, they mark the date as built.
+            db = self.facc(TusSdbs.SDB_XSECTION_DAILY.value, XSECTION_DAILY_META)
+            db.save_many(chunks)
+            db.commit()
+            db = self.facc(TusSdbs.SDB_XSECTION_CODES.value, XSECTION_CODES_META)
+            db.save_many(dcodes)
+            db.commit()
+
+        return len(dts_upd)
+
     def update_stock_xdxr(self, code, start, end):
         """
         update the stock xdxr, fill the prev_close column.
@@ -365,10 +553,15 @@ class XcDBUpdater(XcReaderBasic, XcReaderPrice):
 g_updater: XcDBUpdater = None
 
 
-def tusupdater_init() -> XcDBUpdater:
+def tusupdater_init(durable=True, sync_interval=None) -> XcDBUpdater:
+    """
+    the updater of the process, options are taken by the first call.
+    :param durable: see XcDBUpdater
+    :param sync_interval: see XcDBUpdater
+    """
     global g_updater
     if g_updater is None:
-        g_updater = XcDBUpdater()
+        g_updater = XcDBUpdater(durable=durable, sync_interval=sync_interval)
         # try:
         g_updater.init_domain()
         # except: